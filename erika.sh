@@ -25,4 +25,8 @@
 # * real output
 # ./erika.sh render_ascii_art -p "COM3" -f ./tests/test_resources/test_ascii_art_small.txt
 # ./erika.sh render_ascii_art -p "/dev/ttyACM0" -f ./tests/test_resources/test_ascii_art_small.txt -s PerpendicularSpiralInward
+#
+# * compile once, print later
+# ./erika.sh compile -f ./tests/test_resources/test_image_color.bmp -s LineByLine -o image.erika
+# ./erika.sh replay -f image.erika -p "/dev/ttyACM0"
 python3 -m erika.cli $@
\ No newline at end of file
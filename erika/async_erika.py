@@ -0,0 +1,498 @@
+"""
+Erika for asyncio: awaitable print, move and read methods - no thread blocks on the serial port.
+
+The serial port is opened and configured by pyserial, as for Erika, but all reading and writing goes through
+SerialTransport: an asyncio transport on top of the port's file descriptor, driven by the event loop. That way, one
+event loop can serve network clients, keyboard input and printing at the same time.
+
+Commands are encoded by a plain Erika writing into an in-memory buffer - so the bytes sent are exactly the same as for
+Erika. The encoded bytes are put into a write queue; a writer task sends them to the port, one after another. Key
+presses are decoded by a reader and can be awaited one by one (read) or iterated over (keys). Code written for Erika
+(e.g. the menu) can use an AsyncErika from another thread through BlockingErika.
+
+Only works with event loops supporting add_reader / add_writer - i.e. not on Windows. Runs on Python 3.6, too - use
+run_until_complete instead of asyncio.run (Python 3.7+).
+"""
+import asyncio
+import io
+import os
+
+import serial
+
+from erika.erika import DEFAULT_DELAY
+from erika.erika import ERIKA_BAUDRATE
+from erika.erika import Erika
+
+# number of encoded commands that can be waiting for the writer task - awaiting a command blocks once it is full
+DEFAULT_WRITE_QUEUE_SIZE = 64
+
+# bytes per read from the serial port
+_READ_SIZE = 1024
+
+
+class ErikaConnectionClosedException(Exception):
+    pass
+
+
+def run_until_complete(coroutine):
+    """
+    Run the given coroutine on a new event loop, which is closed afterwards - like asyncio.run, which needs Python 3.7.
+
+    :return: the coroutine's result
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        try:
+            _cancel_remaining_tasks(loop)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+def _cancel_remaining_tasks(loop):
+    # asyncio.all_tasks is new in Python 3.7, Task.all_tasks is gone since 3.9
+    all_tasks = getattr(asyncio, 'all_tasks', None) or asyncio.Task.all_tasks
+    tasks = [task for task in all_tasks(loop) if not task.done()]
+    if not tasks:
+        return
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+
+class SerialTransport(asyncio.Transport):
+
+    def __init__(self, loop, file_descriptor, protocol):
+        """
+        Non-blocking transport for a serial port (or any other tty). Writes that do not go through at once are
+        buffered and sent as soon as the port is ready again. The protocol's writing is paused for as long as there
+        is anything buffered.
+
+        :param loop: the event loop to use
+        :param file_descriptor: file descriptor of the already opened and configured port
+        :param protocol: asyncio.Protocol to deliver the received data to
+        """
+        super().__init__()
+        self._loop = loop
+        self._file_descriptor = file_descriptor
+        self._protocol = protocol
+        self._write_buffer = bytearray()
+        self._protocol_paused = False
+        self._reading = True
+        self._closing = False
+        self._closed = False
+
+        os.set_blocking(file_descriptor, False)
+        self._loop.add_reader(file_descriptor, self._read_ready)
+        self._loop.call_soon(protocol.connection_made, self)
+
+    def get_protocol(self):
+        return self._protocol
+
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def is_closing(self):
+        return self._closing
+
+    def is_reading(self):
+        return self._reading and not self._closing
+
+    def pause_reading(self):
+        if self.is_reading():
+            self._loop.remove_reader(self._file_descriptor)
+            self._reading = False
+
+    def resume_reading(self):
+        if not self._reading and not self._closing:
+            self._loop.add_reader(self._file_descriptor, self._read_ready)
+            self._reading = True
+
+    def get_write_buffer_size(self):
+        return len(self._write_buffer)
+
+    def write(self, data):
+        if self._closing:
+            raise ErikaConnectionClosedException("Can not write to a closed serial port")
+        if not data:
+            return
+
+        if not self._write_buffer:
+            try:
+                written = os.write(self._file_descriptor, data)
+            except (BlockingIOError, InterruptedError):
+                written = 0
+            except OSError as error:
+                self._fatal_error(error)
+                return
+            data = data[written:]
+            if not data:
+                return
+            self._loop.add_writer(self._file_descriptor, self._write_ready)
+
+        self._write_buffer += data
+        if not self._protocol_paused:
+            self._protocol_paused = True
+            self._protocol.pause_writing()
+
+    def _write_ready(self):
+        try:
+            written = os.write(self._file_descriptor, self._write_buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as error:
+            self._fatal_error(error)
+            return
+
+        del self._write_buffer[:written]
+        if self._write_buffer:
+            return
+        self._loop.remove_writer(self._file_descriptor)
+        if self._protocol_paused:
+            self._protocol_paused = False
+            self._protocol.resume_writing()
+        if self._closing:
+            self._connection_lost(None)
+
+    def _read_ready(self):
+        try:
+            data = os.read(self._file_descriptor, _READ_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as error:
+            self._fatal_error(error)
+            return
+
+        if data:
+            self._protocol.data_received(data)
+        else:
+            self._fatal_error(None)
+
+    def close(self):
+        """Stop reading at once - buffered data is still written before the connection is closed."""
+        if self._closing:
+            return
+        self._closing = True
+        self._stop_reading()
+        if not self._write_buffer:
+            self._loop.call_soon(self._connection_lost, None)
+
+    def abort(self):
+        self._closing = True
+        self._stop_reading()
+        self._stop_writing()
+        self._loop.call_soon(self._connection_lost, None)
+
+    def _fatal_error(self, error):
+        # e.g. the device was unplugged
+        self._closing = True
+        self._stop_reading()
+        self._stop_writing()
+        self._loop.call_soon(self._connection_lost, error)
+
+    def _stop_reading(self):
+        if self._reading:
+            self._loop.remove_reader(self._file_descriptor)
+            self._reading = False
+
+    def _stop_writing(self):
+        if self._write_buffer:
+            self._loop.remove_writer(self._file_descriptor)
+            self._write_buffer.clear()
+
+    def _connection_lost(self, error):
+        if self._closed:
+            return
+        self._closed = True
+        self._protocol.connection_lost(error)
+
+
+class _ErikaProtocol(asyncio.Protocol):
+
+    def __init__(self, loop, key_queue, decode_key):
+        self._key_queue = key_queue
+        self._decode_key = decode_key
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.closed = loop.create_future()
+
+    def data_received(self, data):
+        for value in data:
+            self._key_queue.put_nowait(self._decode_key(value))
+
+    def pause_writing(self):
+        self._writable.clear()
+
+    def resume_writing(self):
+        self._writable.set()
+
+    async def wait_until_writable(self):
+        await self._writable.wait()
+
+    def connection_lost(self, error):
+        # wakes up anybody waiting for a key or for the port to become writable again
+        self._key_queue.put_nowait(None)
+        self._writable.set()
+        if not self.closed.done():
+            self.closed.set_result(error)
+
+
+class AsyncErika:
+
+    def __init__(self, com_port, rts_cts=True, connection=None, write_queue_size=DEFAULT_WRITE_QUEUE_SIZE,
+                 delay=DEFAULT_DELAY):
+        """
+        Use with an async with-statement - the port is opened on entering and closed (after sending everything) on
+        leaving.
+
+        :param com_port: serial device that connects to Erika
+        :param rts_cts: use hardware flow control - without it, bytes are sent one by one, with the given delay
+        :param connection: optional, already opened pyserial connection to use instead of opening com_port
+        :param write_queue_size: number of encoded commands that can be waiting to be sent
+        :param delay: pause after each byte when not using RTS/CTS [s]
+        """
+        self.com_port = com_port
+        self.use_rts_cts = rts_cts
+        self.connection = connection
+        self.write_queue_size = write_queue_size
+        self.delay = delay
+
+        # encodes the commands - everything written ends up in the sink
+        self._sink = io.BytesIO()
+        self._encoder = Erika(None, connection=self._sink)
+
+        self._transport = None
+        self._protocol = None
+        self._write_queue = None
+        self._key_queue = None
+        self._writer_task = None
+        self._write_error = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def open(self):
+        loop = asyncio.get_event_loop()
+        if self.connection is None:
+            self.connection = serial.Serial(self.com_port, ERIKA_BAUDRATE, rtscts=self.use_rts_cts, timeout=0)
+        self._write_queue = asyncio.Queue(self.write_queue_size)
+        self._key_queue = asyncio.Queue()
+        self._protocol = _ErikaProtocol(loop, self._key_queue, self._decode_key)
+        self._transport = SerialTransport(loop, self.connection.fileno(), self._protocol)
+        self._writer_task = loop.create_task(self._write_queued_bytes())
+
+    async def close(self):
+        """Send everything still queued, then close the port."""
+        if self._transport is None:
+            return
+        try:
+            if not self._transport.is_closing():
+                await self.flush()
+        finally:
+            self._writer_task.cancel()
+            self._transport.close()
+            await self._protocol.closed
+            self.connection.close()
+            self._transport = None
+
+    def _decode_key(self, value):
+        return self._encoder.ddr_ascii.try_decode("{:02X}".format(value))
+
+    # sending
+
+    async def flush(self, wait_until_sent=False):
+        """
+        Wait until all queued bytes have been handed over to the serial port.
+
+        :param wait_until_sent: wait until the serial port has actually sent them, too
+        """
+        await self._write_queue.join()
+        self._check_write_error()
+        if wait_until_sent:
+            await asyncio.get_event_loop().run_in_executor(None, self.connection.flush)
+
+    async def write_bytes(self, data):
+        """Queue raw bytes for sending, e.g. the payload of a job file or ErikaProgram.to_bytes()."""
+        self._check_write_error()
+        await self._write_queue.put(bytes(data))
+
+    async def _send_encoded(self):
+        self._encoder.flush()
+        data = self._sink.getvalue()
+        if data:
+            self._sink.seek(0)
+            self._sink.truncate()
+            await self.write_bytes(data)
+
+    async def _write_queued_bytes(self):
+        while True:
+            data = await self._write_queue.get()
+            try:
+                if self._write_error is not None:
+                    # nothing gets through anymore - just empty the queue
+                    continue
+                if self.use_rts_cts:
+                    await self._write_to_transport(data)
+                else:
+                    # the delay between bytes is all that keeps Erika from being overrun
+                    for i in range(len(data)):
+                        await self._write_to_transport(data[i:i + 1])
+                        await asyncio.sleep(self.delay)
+            except Exception as error:
+                # raised again by whoever sends next - without this task's frames, so clearing them (e.g. by
+                # unittest's assertRaises) can not break the task
+                self._write_error = error.with_traceback(None)
+            finally:
+                self._write_queue.task_done()
+
+    async def _write_to_transport(self, data):
+        self._transport.write(data)
+        await self._protocol.wait_until_writable()
+        if self._transport.is_closing():
+            raise ErikaConnectionClosedException("The connection to Erika was closed")
+
+    def _check_write_error(self):
+        # errors from sending show up where the caller can see them
+        if self._write_error is not None:
+            raise self._write_error
+
+    # reading
+
+    async def read(self):
+        """
+        Wait for the next key pressed on Erika - everything queued is sent before waiting.
+
+        :return: the key, decoded to ASCII
+        """
+        await self.flush()
+        key = await self._key_queue.get()
+        if key is None:
+            # keep the end marker for everybody else waiting
+            self._key_queue.put_nowait(None)
+            raise ErikaConnectionClosedException("The connection to Erika was closed")
+        return key
+
+    async def keys(self):
+        """Async iterator over the keys pressed on Erika - ends when the connection is closed."""
+        while True:
+            try:
+                yield await self.read()
+            except ErikaConnectionClosedException:
+                return
+
+    # commands - same as for Erika
+
+    async def alarm(self, duration):
+        self._encoder.alarm(duration)
+        await self._send_encoded()
+
+    async def print_ascii(self, text):
+        self._encoder.print_ascii(text)
+        await self._send_encoded()
+
+    async def delete_ascii(self, reversed_text):
+        self._encoder.delete_ascii(reversed_text)
+        await self._send_encoded()
+
+    async def print_ascii_reversed(self, reversed_text):
+        self._encoder.print_ascii_reversed(reversed_text)
+        await self._send_encoded()
+
+    async def move_up(self):
+        self._encoder.move_up()
+        await self._send_encoded()
+
+    async def move_down(self):
+        self._encoder.move_down()
+        await self._send_encoded()
+
+    async def move_left(self):
+        self._encoder.move_left()
+        await self._send_encoded()
+
+    async def move_right(self):
+        self._encoder.move_right()
+        await self._send_encoded()
+
+    async def move_down_microstep(self):
+        self._encoder.move_down_microstep()
+        await self._send_encoded()
+
+    async def move_up_microstep(self):
+        self._encoder.move_up_microstep()
+        await self._send_encoded()
+
+    async def move_right_microsteps(self, num_steps=1):
+        self._encoder.move_right_microsteps(num_steps)
+        await self._send_encoded()
+
+    async def move_left_microsteps(self, num_steps=1):
+        self._encoder.move_left_microsteps(num_steps)
+        await self._send_encoded()
+
+    async def crlf(self):
+        self._encoder.crlf()
+        await self._send_encoded()
+
+    async def set_keyboard_echo(self, value):
+        self._encoder.set_keyboard_echo(value)
+        await self._send_encoded()
+
+    async def demo(self):
+        self._encoder.demo()
+        await self._send_encoded()
+
+    async def print_pixel(self):
+        self._encoder.print_pixel()
+        await self._send_encoded()
+
+    async def delete_pixel(self):
+        self._encoder.delete_pixel()
+        await self._send_encoded()
+
+
+class BlockingErika:
+
+    def __init__(self, async_erika, loop):
+        """
+        Erika-like, blocking view of an AsyncErika - for code written for Erika (e.g. Menu) running in a thread of its
+        own, not in the event loop's thread. Each call waits until the AsyncErika's method is done.
+
+        :param async_erika: AsyncErika - or anything else with the same awaitable methods
+        :param loop: the event loop the AsyncErika runs in
+        """
+        self.async_erika = async_erika
+        self.loop = loop
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        # the connection belongs to whoever opened the AsyncErika
+        pass
+
+    def __getattr__(self, name):
+        method = getattr(self.async_erika, name)
+
+        def call(*args, **kwargs):
+            return asyncio.run_coroutine_threadsafe(method(*args, **kwargs), self.loop).result()
+
+        return call
+
+    # same as Erika's - used by TicTacToe
+
+    def _cursor_down(self, n=1):
+        for i in range(n):
+            self.move_down()
+
+    def _cursor_back(self, n=1):
+        for i in range(n):
+            self.move_left()
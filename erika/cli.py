@@ -11,16 +11,30 @@
 
 import argcomplete
 
-from erika.TicTacToe import TicTacToe
-from erika.menu import Menu
 from erika.erika import Erika
-from erika.erika_image_renderer import *
-from erika.erika_mock import *
+from erika.image_options import DEFAULT_CACHE_DIRECTORY
+from erika.image_options import DITHERING_METHODS
+from erika.image_options import DITHERING_THRESHOLD
+from erika.image_options import PAGE_WIDTH_MICROSTEPS
+from erika.strategy_registry import AUTO_STRATEGY
+from erika.strategy_registry import strategies_help
+from erika.strategy_registry import strategy_names
+
+# Everything else (rendering, images, NumPy, Pillow, ...) is imported by the commands that need it - creating the
+# argument parser has to be fast, it runs for every call and for every auto-completion.
 
 DRY_RUN_WIDTH = 60
 DRY_RUN_HEIGHT = 40
 DRY_RUN_DELAY = 0.005
 
+RENDERING_STRATEGIES = strategy_names() + [AUTO_STRATEGY]
+
+RENDERING_STRATEGIES_HELP = """Rendering strategy to apply. The value must be one of the following: 
+{}
+    {}
+        * try out all of the above (in parallel, without printing) and use the one that prints fastest
+        * strategies that take too long to try out are skipped""".format(strategies_help(), AUTO_STRATEGY)
+
 
 def create_argument_parser():
     parser = ArgumentParser(prog='erika.sh',
@@ -31,6 +45,9 @@ def create_argument_parser():
     add_render_ascii_art_parser(command_parser)
     add_run_tic_tac_toe_parser(command_parser)
     add_run_menu_parser(command_parser)
+    add_compile_parser(command_parser)
+    add_replay_parser(command_parser)
+    add_estimate_parser(command_parser)
     argcomplete.autocomplete(parser, always_complete_options=True)
     return parser
 
@@ -96,24 +113,48 @@ def add_render_ascii_art_parser(command_parser):
 New: If an image file is referenced instead, will do a monochrome print using "." character and microsteps.
 """)
     render_ascii_art_file_parser.add_argument('--strategy', '-s',
-                                              choices=['LineByLine', 'Interlaced', 'PerpendicularSpiralInward',
-                                                       'RandomDotFill', 'ArchimedeanSpiralOutward'],
+                                              choices=RENDERING_STRATEGIES,
                                               default='LineByLine',
-                                              help="""Rendering strategy to apply. The value must be one of the following: 
-    LineByLine 
-        * render the given image line by line
-        * default option
-    Interlaced
-        * render the given image, every even line first (starting count at 0), every odd line later
-    PerpendicularSpiralInward ##
-        * render the given image, spiralling inward to the middle while going parallel to X or Y axis all the time
-    RandomDotFill
-        * render the given image, printing one random letter at a time
-    ArchimedeanSpiralOutward
-        * render the given image, starting from the middle, following an Archimedean spiral as closely as possible""")
+                                              help=RENDERING_STRATEGIES_HELP)
+    render_ascii_art_file_parser.add_argument('--strip-height', type=int, metavar='ROWS',
+                                              help="""Image files only: read and render the image strip by strip, ROWS rows at a time.
+For images too big to fit into memory - supported by the strategies LineByLine, Interlaced and Boustrophedon.""")
+    add_image_conversion_params(render_ascii_art_file_parser)
+
+
+def add_image_conversion_params(argument_parser):
+    argument_group = argument_parser.add_argument_group('image files')
+    argument_group.add_argument('--dithering', choices=DITHERING_METHODS, default=DITHERING_THRESHOLD,
+                                help="""How to turn shades of gray into dots - default: threshold (no dithering).
+floyd-steinberg and atkinson work best for photos, bayer gives a regular pattern.""")
+    argument_group.add_argument('--fit-to-page', action='store_true',
+                                help='Resize the image to the width of the page ({} microsteps)'
+                                .format(PAGE_WIDTH_MICROSTEPS))
+    argument_group.add_argument('--glyphs', action='store_true',
+                                help="""Print the image as ASCII art: each character cell is printed as the character
+that matches it best, instead of dot by dot - a lot faster, but coarser.""")
+    argument_group.add_argument('--no-cache', action='store_true',
+                                help="""Don't cache converted images - by default, they are cached in {}
+so rendering the same image again (e.g. with another strategy) skips the conversion.""".format(DEFAULT_CACHE_DIRECTORY))
+
+
+def image_options_for_given_args(args):
+    """:return: keyword arguments for WrappedImage, see ErikaImageRenderer - only the ones that differ from the defaults"""
+    image_options = {}
+    if args.dithering != DITHERING_THRESHOLD:
+        image_options['dithering'] = args.dithering
+    if args.fit_to_page:
+        image_options['width'] = PAGE_WIDTH_MICROSTEPS
+    if args.glyphs:
+        image_options['glyph_halftone'] = True
+    if not args.no_cache:
+        image_options['cache_directory'] = DEFAULT_CACHE_DIRECTORY
+    return image_options
 
 
 def print_ascii_art(args):
+    from erika.erika_image_renderer import ErikaImageRenderer
+
     strategy_string = args.strategy
     file_path = args.file
     try:
@@ -123,9 +164,12 @@ def print_ascii_art(args):
             lines = read_lines_from_stdin_non_blocking()
             renderer.render_lines(lines)
         else:
-            erika = get_erika_for_given_args(args)
-            renderer = ErikaImageRenderer(erika, strategy_string)
-            renderer.render_file(file_path)
+            erika = get_erika_for_given_args(args, is_character_based=args.glyphs)
+            renderer = ErikaImageRenderer(erika, strategy_string, image_options_for_given_args(args))
+            if args.strip_height:
+                renderer.render_file_in_strips(file_path, strip_height=args.strip_height)
+            else:
+                renderer.render_file(file_path)
     finally:
         if erika:
             erika.wait_for_user_if_simulated()
@@ -135,19 +179,170 @@ def print_ascii_art(args):
             erika.__exit__()
 
 
+def add_compile_parser(command_parser):
+    argument_parser = command_parser.add_parser('compile',
+                                                formatter_class=RawTextHelpFormatter,
+                                                help='Render ASCII art (or a normal image file) into a job file, '
+                                                     'for printing it later using the "replay" command',
+                                                description='Render ASCII art (or a normal image file) into a job '
+                                                            'file, for printing it later using the "replay" command')
+    argument_parser.set_defaults(func=compile_job_file)
+    argument_parser.add_argument('--file', '-f', required=True, metavar='FILEPATH',
+                                 help='File path to the ASCII art or image file to render')
+    argument_parser.add_argument('--strategy', '-s',
+                                 choices=RENDERING_STRATEGIES,
+                                 default='LineByLine',
+                                 help=RENDERING_STRATEGIES_HELP)
+    argument_parser.add_argument('--output', '-o', required=True, metavar='JOB_FILEPATH',
+                                 help='File path to write the job file to')
+    add_image_conversion_params(argument_parser)
+
+
+def add_replay_parser(command_parser):
+    argument_parser = command_parser.add_parser('replay',
+                                                formatter_class=RawTextHelpFormatter,
+                                                help='Print a job file created by the "compile" command',
+                                                description='Print a job file created by the "compile" command')
+    argument_parser.set_defaults(func=replay_job_file)
+    argument_parser.add_argument('--file', '-f', required=True, metavar='JOB_FILEPATH',
+                                 help='File path to the job file to print')
+    argument_parser.add_argument('--serial-port', '-p', required=True, metavar='SERIAL_PORT',
+                                 help='Serial communications port for communicating with the Erika machine.')
+
+
+def add_estimate_parser(command_parser):
+    argument_parser = command_parser.add_parser('estimate',
+                                                formatter_class=RawTextHelpFormatter,
+                                                help='Estimate how long printing a file would take',
+                                                description='Estimate how long printing ASCII art, an image file or '
+                                                            'a job file would take')
+    argument_parser.set_defaults(func=print_estimate)
+    argument_parser.add_argument('--file', '-f', required=True, metavar='FILEPATH',
+                                 help='File path to the ASCII art, image or job file')
+    argument_parser.add_argument('--strategy', '-s',
+                                 choices=RENDERING_STRATEGIES,
+                                 default='LineByLine',
+                                 help=RENDERING_STRATEGIES_HELP + """
+
+Ignored for job files - the strategy was chosen when compiling them.""")
+    argument_parser.add_argument('--calibration', '-c', metavar='CALIBRATION_FILEPATH',
+                                 help="""JSON file with measured print jobs to calibrate the cost model with:
+a list of [job file path, seconds] pairs - relative paths are resolved against the calibration file.
+Without it, the estimate uses uncalibrated default weights.""")
+    add_image_conversion_params(argument_parser)
+
+
+def print_estimate(args):
+    from erika.erika_cost_model import ErikaCostModel
+    from erika.erika_cost_model import extract_cost_features
+    from erika.erika_cost_model import format_duration
+    from erika.erika_image_renderer import ErikaImageRenderer
+    from erika.erika_job_file import ErikaJobFile
+    from erika.erika_job_file import NotAJobFileException
+
+    if args.calibration:
+        cost_model = ErikaCostModel.calibrated(read_calibration_file(args.calibration))
+    else:
+        cost_model = ErikaCostModel()
+
+    try:
+        with ErikaJobFile(args.file) as job_file:
+            features = extract_cost_features(job_file.payload)
+    except NotAJobFileException:
+        renderer = ErikaImageRenderer(None, args.strategy, image_options_for_given_args(args))
+        if args.strategy == AUTO_STRATEGY:
+            selection = renderer.select_strategy(file_path=args.file, cost_model=cost_model)
+            print_strategy_selection(selection)
+            program = selection.program
+        else:
+            program = renderer.compile_file(args.file)
+        features = extract_cost_features(program.to_bytes())
+
+    print("Estimated duration: {}{}".format(format_duration(cost_model.estimate_for_features(features)),
+                                            "" if args.calibration else " (uncalibrated default weights)"))
+    print("  bytes to send: {}".format(features.bytes))
+    print("  typed characters: {}".format(features.characters + features.repeated_characters))
+    print("  carriage travel: {} microsteps".format(features.horizontal_travel))
+    print("  paper travel: {} microsteps".format(features.vertical_travel))
+    print("  line feeds: {}".format(features.line_feeds))
+    print("  mode switches: {}".format(features.mode_switches))
+
+
+def read_calibration_file(file_path):
+    """
+    :param file_path: JSON file with a list of [job file path, measured seconds] pairs
+    :return: list of (payload, seconds) tuples, as expected by ErikaCostModel.calibrated
+    """
+    import json
+    from erika.erika_job_file import ErikaJobFile
+
+    with open(file_path, 'r') as calibration_file:
+        measured_jobs = json.load(calibration_file)
+
+    measurements = []
+    for job_file_path, seconds in measured_jobs:
+        with ErikaJobFile(os.path.join(os.path.dirname(file_path), job_file_path)) as job_file:
+            measurements.append((bytes(job_file.payload), seconds))
+    return measurements
+
+
+def print_strategy_selection(selection):
+    from erika.erika_cost_model import format_duration
+
+    print("Tried out rendering strategies in {:.1f} s:".format(selection.simulation_seconds))
+    for strategy_string, estimate in sorted(selection.estimates.items(), key=lambda item: item[1]):
+        print("  {}: {}".format(strategy_string, format_duration(estimate)))
+    print("Using {}".format(selection.strategy_string))
+
+
+def compile_job_file(args):
+    from erika.erika_image_renderer import ErikaImageRenderer
+    from erika.erika_job_file import write_job_file
+
+    renderer = ErikaImageRenderer(None, args.strategy, image_options_for_given_args(args))
+    strategy_string = args.strategy
+    if strategy_string == AUTO_STRATEGY:
+        selection = renderer.select_strategy(file_path=args.file)
+        print_strategy_selection(selection)
+        program, strategy_string = selection.program, selection.strategy_string
+    else:
+        program = renderer.compile_file(args.file)
+    metadata = {"file": args.file, "strategy": strategy_string, "dithering": args.dithering,
+                "fit_to_page": args.fit_to_page, "glyphs": args.glyphs}
+    write_job_file(args.output, program, metadata=metadata)
+
+
+def replay_job_file(args):
+    from erika.erika_job_file import ErikaJobFile
+
+    with ErikaJobFile(args.file) as job_file:
+        with Erika(args.serial_port) as erika:
+            job_file.replay(erika)
+
+
 def run_tic_tac_toe(args):
+    from erika.TicTacToe import TicTacToe
+
     erika = get_erika_for_given_args(args, is_character_based=True)
     with TicTacToe(erika) as game:
         game.start_game()
 
 
 def run_menu(args):
+    from erika.menu import Menu
+
     erika = get_erika_for_given_args(args, is_character_based=True)
     with Menu(erika) as menu:
         menu.start_menu()
 
 
 def get_erika_for_given_args(args, is_character_based=False):
+    from erika.erika_mock import CharacterBasedErikaMock
+    from erika.erika_mock import MicrostepBasedErikaMock
+    from erika.image_converter import ImageStrips
+    from erika.image_converter import NotAnImageException
+    from erika.image_converter import WrappedImage
+
     is_dry_run = args.dry_run
     com_port = args.serial_port
 
@@ -159,7 +354,11 @@ def get_erika_for_given_args(args, is_character_based=False):
             # a bit hacky, as I'm mirroring behavior from ErikaImageRenderer - this kindof goes against the now-beautiful architecture :(
             try:
                 # hacky: use exception to determine image type
-                image_for_provoking_exception = WrappedImage(args.file)
+                if getattr(args, 'strip_height', None):
+                    # only reads the image size - decoding the whole image is what rendering in strips avoids
+                    image_for_provoking_exception = ImageStrips(args.file, args.strip_height)
+                else:
+                    image_for_provoking_exception = WrappedImage(args.file)
                 erika = MicrostepBasedErikaMock(DRY_RUN_WIDTH, DRY_RUN_HEIGHT, delay_after_each_step=DRY_RUN_DELAY)
             except NotAnImageException:
                 erika = CharacterBasedErikaMock(DRY_RUN_WIDTH, DRY_RUN_HEIGHT, delay_after_each_step=DRY_RUN_DELAY)
@@ -1,10 +1,38 @@
 import json
 
+# fallback policies for characters that are not part of the conversion table
+FALLBACK_STRICT = "strict"
+FALLBACK_IGNORE = "ignore"
+
+
+class UnknownCharacterException(Exception):
+    pass
+
 
 def transpose_dict(dictionary):
     return {value: key for key, value in dictionary.items()}
 
 
+class _TranslationTable(dict):
+    """
+    Mapping for str.translate: code point -> single character carrying the DDR byte value (so the translated string
+    can be turned into bytes by encoding it as latin-1). Characters missing from the table are handled according to
+    the fallback policy - the result is cached, so every unknown character is looked at only once.
+    """
+
+    def __init__(self, code_point_to_byte, fallback, fallback_replacement=None):
+        super().__init__(code_point_to_byte)
+        self.fallback = fallback
+        self.fallback_replacement = fallback_replacement
+
+    def __missing__(self, code_point):
+        if self.fallback == FALLBACK_STRICT:
+            # must not be a LookupError - str.translate would silently keep the character in that case
+            raise UnknownCharacterException("Character '{}' can not be printed by Erika".format(chr(code_point)))
+        self[code_point] = self.fallback_replacement
+        return self.fallback_replacement
+
+
 class DDR_ASCII:
     CONVERSION_TABLE_PATH = "./erika/charTranslation.json"
 
@@ -14,9 +42,43 @@ def __init__(self, *args, **kwargs):
             self.ascii_2_ddr = json.load(f)
         self.ddr_2_ascii = transpose_dict(self.ascii_2_ddr)
 
+        # only single characters can be handled by str.translate
+        self._code_point_2_byte = {ord(character): chr(int(key_id, 16))
+                                   for character, key_id in self.ascii_2_ddr.items()
+                                   if len(character) == 1}
+        self._translation_tables = {}
+
     def encode(self, data):
         return self.ascii_2_ddr[data]
 
+    def encode_bytes(self, text, fallback=FALLBACK_STRICT):
+        """
+        Encode a whole string at once.
+
+        :param text: text to encode
+        :param fallback: what to do about characters Erika can not print: FALLBACK_STRICT raises an
+        UnknownCharacterException, FALLBACK_IGNORE drops them, any other value is used as a replacement character
+        (which must be printable itself)
+        :return: the DDR ASCII encoded text as bytes, ready to be sent to Erika
+        """
+        return text.translate(self._get_translation_table(fallback)).encode("latin-1")
+
+    def _get_translation_table(self, fallback):
+        table = self._translation_tables.get(fallback)
+        if table is None:
+            if fallback == FALLBACK_STRICT:
+                table = _TranslationTable(self._code_point_2_byte, FALLBACK_STRICT)
+            elif fallback == FALLBACK_IGNORE:
+                # None makes str.translate delete the character
+                table = _TranslationTable(self._code_point_2_byte, FALLBACK_IGNORE)
+            else:
+                if len(fallback) != 1 or ord(fallback) not in self._code_point_2_byte:
+                    raise UnknownCharacterException(
+                        "Fallback character '{}' can not be printed by Erika".format(fallback))
+                table = _TranslationTable(self._code_point_2_byte, fallback, self._code_point_2_byte[ord(fallback)])
+            self._translation_tables[fallback] = table
+        return table
+
     def try_encode(self, data, input_as_default=True):
         default = data if input_as_default else None
         return self.ascii_2_ddr.get(data, default)
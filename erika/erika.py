@@ -18,6 +18,22 @@
 # confirmed experimentally
 MICROSTEPS_PER_CHARACTER_HEIGHT = 20
 
+"""page dimensions for Erika"""
+# tested manually - the cursor will no longer move if a key is pressed
+ERIKA_PAGE_WIDTH_CHARACTERS_HARD_LIMIT_AT_12_CHARS_PER_INCH = 74
+# tested manually - thee will be a warning "beep" on the next pressed key
+ERIKA_PAGE_WIDTH_CHARACTERS_SOFT_LIMIT_AT_12_CHARS_PER_INCH = 65
+
+ERIKA_PAGE_HEIGHT_CHARACTERS = 150
+
+ERIKA_PAGE_WIDTH_MICROSTEPS_HARD_LIMIT_AT_12_CHARS_PER_INCH = ERIKA_PAGE_WIDTH_CHARACTERS_HARD_LIMIT_AT_12_CHARS_PER_INCH * MICROSTEPS_PER_CHARACTER_WIDTH
+ERIKA_PAGE_WIDTH_MICROSTEPS_SOFT_LIMIT_AT_12_CHARS_PER_INCH = ERIKA_PAGE_WIDTH_CHARACTERS_SOFT_LIMIT_AT_12_CHARS_PER_INCH * MICROSTEPS_PER_CHARACTER_WIDTH
+
+ERIKA_PAGE_HEIGHT_MICROSTEPS = ERIKA_PAGE_HEIGHT_CHARACTERS * MICROSTEPS_PER_CHARACTER_HEIGHT
+
+# number of encoded bytes collected before they are sent to the serial port in a single write
+WRITE_BUFFER_SIZE = 512
+
 
 # command characters should be mapped to enum constants like directions in this case
 class Direction(Enum):
@@ -123,15 +139,36 @@ def delete_pixel(self):
     def delete_ascii(self, reversed_text):
         pass
 
+    @enforcedmethod
+    def print_ascii_reversed(self, reversed_text):
+        pass
+
+    # not enforced: only needed by implementations that buffer their output
+    def flush(self):
+        """
+        Send any buffered output to the device. Output is sent on its own at line breaks (crlf, or a newline in
+        printed text), before reading a key, on __exit__ and whenever the buffer is full - callers that need anything
+        else on paper right away (e.g. text written without a trailing newline, like by erika_fs) must flush.
+        """
+        pass
+
 
 class Erika(AbstractErika):
 
-    def __init__(self, com_port, rts_cts=True, *args, **kwargs):
-        """Set comport to serial device that connects to Erika typewriter."""
+    def __init__(self, com_port, rts_cts=True, *args, connection=None, **kwargs):
+        """
+        Set comport to serial device that connects to Erika typewriter.
+
+        :param connection: optional, already opened connection to use instead of opening com_port - anything with
+        write / read / close methods will do, e.g. io.BytesIO for capturing the bytes that would be sent
+        """
         self.com_port = com_port
-        self.connection = serial.Serial(com_port, ERIKA_BAUDRATE, rtscts=rts_cts)
+        if connection is None:
+            connection = serial.Serial(com_port, ERIKA_BAUDRATE, rtscts=rts_cts)
+        self.connection = connection
         self.ddr_ascii = DDR_ASCII()
         self.use_rts_cts = rts_cts
+        self._write_buffer = bytearray()
 
     ## resource manager stuff
 
@@ -139,6 +176,7 @@ def __enter__(self):
         return self
 
     def __exit__(self, *args):
+        self.flush()
         self.connection.close()
 
     ##########################
@@ -147,25 +185,29 @@ def alarm(self, duration):
         """Sound alarm for given duration [s]"""
         assert duration <= 5.1, "duration must be less than or equal to 5.1 seconds"
         duration /= 0.02
-        duration_hex = hex(round(duration))
         self._write_byte("AA")
-        self._write_byte(duration_hex[1:])
+        self._write_byte("{:02X}".format(round(duration)))
         # self.connection.write(b"\xaa\xff")
 
     def read(self):
         """Read a character data from the Erika typewriter and try to decode it.
         Returns: ASCII encoded character
         """
+        # make sure everything up to now got printed before waiting for the user
+        self.flush()
         key_id = self.connection.read()
         return self.ddr_ascii.try_decode(key_id.hex().upper())
 
     def print_ascii(self, text, esc_sequences=False):
-        """Print given string on the Erika typewriter."""
+        """
+        Print given string on the Erika typewriter - with RTS/CTS, text after the last newline stays buffered until
+        the next line break, read or flush (see AbstractErika.flush).
+        """
         if esc_sequences:
             self.decode(text)
-        for c in text:
-            key_id = self.ddr_ascii.encode(c)
-            self._write_byte(key_id)
+        self._write_bytes(self.ddr_ascii.encode_bytes(text))
+        if "\n" in text:
+            self.flush()
 
     def _set_reverse_printing_mode(self, value):
         if value:
@@ -194,6 +236,13 @@ def delete_ascii(self, reversed_text):
         self._set_reverse_printing_mode(False)
         self._set_correction_mode(False)
 
+    def print_ascii_reversed(self, reversed_text):
+        """Print given string on the Erika typewriter, going backwards - just like delete_ascii, but with the normal
+        tape."""
+        self._set_reverse_printing_mode(True)
+        self.print_ascii(reversed_text)
+        self._set_reverse_printing_mode(False)
+
     def move_up(self):
         self._cursor_up()
 
@@ -245,6 +294,7 @@ def delete_pixel(self):
 
     def crlf(self):
         self._write_byte("77")
+        self.flush()
 
     def set_keyboard_echo(self, value):
         if value:
@@ -255,35 +305,9 @@ def set_keyboard_echo(self, value):
     def demo(self):
         self.crlf()
         # self._print_smiley()
-        self._print_demo_rectangle()
+        print_demo_rectangle(self)
         self._advance_paper()
 
-    def _print_demo_rectangle(self):
-
-        for i in range(0, 10):
-            self.print_ascii(".")
-            self.move_left_microsteps(MICROSTEPS_PER_CHARACTER_WIDTH - 1)
-
-        self.move_left_microsteps(1)
-
-        for i in range(0, 5):
-            self.move_down_microstep()
-            self.print_ascii(".")
-            self.move_left_microsteps(MICROSTEPS_PER_CHARACTER_WIDTH)
-
-        self.move_left_microsteps(1)
-
-        for i in range(0, 10):
-            self.print_ascii(".")
-            self.move_left_microsteps(MICROSTEPS_PER_CHARACTER_WIDTH + 1)
-
-        self.move_right_microsteps(1)
-
-        for i in range(0, 5):
-            self.move_up_microstep()
-            self.print_ascii(".")
-            self.move_left_microsteps(MICROSTEPS_PER_CHARACTER_WIDTH)
-
     def _print_precision_test(self):
         self.crlf()
         self.crlf()
@@ -312,12 +336,38 @@ def _print_smiley(self):
         self._write_byte('13')
         self._write_byte('1F')
 
+    def flush(self):
+        """Send all buffered bytes to the serial port in a single write."""
+        if self._write_buffer:
+            data = bytes(self._write_buffer)
+            self._write_buffer.clear()
+            self.connection.write(data)
+
     def _write_byte(self, data, delay=DEFAULT_DELAY):
         """prints base16 formated data"""
-        self.connection.write(bytes.fromhex(data))
+        self._write_bytes(bytes.fromhex(data), delay)
+
+    def _write_bytes(self, data, delay=DEFAULT_DELAY):
+        """
+        Queue raw bytes for sending.
 
+        With RTS/CTS, the serial driver throttles the transfer for us, so bytes are collected and written in bulk.
+        Without it, the delay between bytes is all that keeps Erika from being overrun - so write byte by byte.
+        """
         if not self.use_rts_cts:
-            time.sleep(delay)
+            for i in range(len(data)):
+                self.connection.write(data[i:i + 1])
+                time.sleep(delay)
+            return
+
+        if not self._write_buffer and len(data) >= WRITE_BUFFER_SIZE:
+            # big chunks are sent as they are - no need to copy them to the buffer first
+            self.connection.write(data)
+            return
+
+        self._write_buffer += data
+        if len(self._write_buffer) >= WRITE_BUFFER_SIZE:
+            self.flush()
 
     def _move_erika(self, direction: Direction, n=1):
         """
@@ -326,7 +376,16 @@ def _move_erika(self, direction: Direction, n=1):
         :param direction: direction to move: Direction
         :param n: number of full steps to move
         """
-        self._write_byte(direction.value * (2 * n))
+        self._move_half_steps(direction, 2 * n)
+
+    def _move_half_steps(self, direction: Direction, n=1):
+        """
+        Moves n half steps (half a character) in the given direction - one byte each.
+
+        :param direction: direction to move: Direction
+        :param n: number of half steps to move
+        """
+        self._write_byte(direction.value * n)
 
     def _cursor_up(self, n=1):
         self._move_erika(Direction.UP, n)
@@ -390,3 +449,34 @@ def _restore_cursor_position(self):
 
     def wait_for_user_if_simulated(self):
         pass
+
+
+def print_demo_rectangle(erika):
+    """
+    Print a rectangle of dots with microstep moves - the demo sequence shared by Erika and its simulations.
+
+    :param erika: any AbstractErika
+    """
+    for i in range(0, 10):
+        erika.print_ascii(".")
+        erika.move_left_microsteps(MICROSTEPS_PER_CHARACTER_WIDTH - 1)
+
+    erika.move_left_microsteps(1)
+
+    for i in range(0, 5):
+        erika.move_down_microstep()
+        erika.print_ascii(".")
+        erika.move_left_microsteps(MICROSTEPS_PER_CHARACTER_WIDTH)
+
+    erika.move_left_microsteps(1)
+
+    for i in range(0, 10):
+        erika.print_ascii(".")
+        erika.move_left_microsteps(MICROSTEPS_PER_CHARACTER_WIDTH + 1)
+
+    erika.move_right_microsteps(1)
+
+    for i in range(0, 5):
+        erika.move_up_microstep()
+        erika.print_ascii(".")
+        erika.move_left_microsteps(MICROSTEPS_PER_CHARACTER_WIDTH)
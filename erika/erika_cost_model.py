@@ -0,0 +1,169 @@
+"""
+Estimate how long Erika needs for a stream of commands (the raw bytes, as sent over the serial port).
+
+The stream is broken down (with NumPy, not byte by byte) into a few features: byte count, typed characters, carriage
+travel, paper travel, line feeds and mode switches. The estimate is a weighted sum of these features - with weights
+that can be calibrated from measured print jobs (see ErikaCostModel.calibrated).
+"""
+import datetime
+from collections import namedtuple
+
+import numpy as np
+
+from erika.erika import ERIKA_BAUDRATE
+from erika.erika import MICROSTEPS_PER_CHARACTER_HEIGHT
+from erika.erika import MICROSTEPS_PER_CHARACTER_WIDTH
+
+# one start bit, 8 data bits, one stop bit
+BITS_PER_BYTE_ON_THE_WIRE = 10
+SECONDS_PER_BYTE = BITS_PER_BYTE_ON_THE_WIRE / ERIKA_BAUDRATE
+
+# Default weights: the character timings were taken from logic_recordings/Hello_World_Erika.sr and
+# logic_recordings/first_session_erika.sr (time from receiving a character until RTS signals "ready" again):
+# 108 - 148 ms for a new character (the daisy wheel has to turn), about 20 ms when typing the same character again.
+# Carriage and paper movement were not part of the recordings - these weights are rough guesses, calibrate them
+# using ErikaCostModel.calibrated (or "estimate --calibration") once there are measurements.
+DEFAULT_SECONDS_PER_CHARACTER = 0.12
+DEFAULT_SECONDS_PER_REPEATED_CHARACTER = 0.02
+DEFAULT_SECONDS_PER_HORIZONTAL_MICROSTEP = 0.002
+DEFAULT_SECONDS_PER_VERTICAL_MICROSTEP = 0.01
+DEFAULT_SECONDS_PER_LINE_FEED = 0.3
+DEFAULT_SECONDS_PER_MODE_SWITCH = 0.2
+
+# byte values of the commands the estimate depends on
+_SPACE = 0x71
+_HALF_STEP_RIGHT = 0x73
+_HALF_STEP_LEFT = 0x74
+_HALF_STEP_DOWN = 0x75
+_HALF_STEP_UP = 0x76
+_CRLF = 0x77
+_MICROSTEP_DOWN = 0x81
+_MICROSTEP_UP = 0x82
+_CORRECTION_MODE_OFF = 0x8B
+_CORRECTION_MODE_ON = 0x8C
+_REVERSE_PRINTING_MODE_OFF = 0x8D
+_REVERSE_PRINTING_MODE_ON = 0x8E
+_MICROSTEPS_HORIZONTAL = 0xA5
+_ALARM = 0xAA
+_LAST_PRINTABLE_CHARACTER = 0x70
+
+_HALF_STEP_WIDTH = MICROSTEPS_PER_CHARACTER_WIDTH // 2
+_HALF_STEP_HEIGHT = MICROSTEPS_PER_CHARACTER_HEIGHT // 2
+
+# horizontal microsteps per command - except for A5, which takes them from its argument
+_STEPS = np.zeros(256, dtype=np.int64)
+_STEPS[:_LAST_PRINTABLE_CHARACTER + 1] = MICROSTEPS_PER_CHARACTER_WIDTH
+_STEPS[_SPACE] = MICROSTEPS_PER_CHARACTER_WIDTH
+_STEPS[_HALF_STEP_RIGHT] = _HALF_STEP_WIDTH
+_STEPS[_HALF_STEP_LEFT] = -_HALF_STEP_WIDTH
+_REVERSE_PRINTING_STEPS = _STEPS.copy()
+_REVERSE_PRINTING_STEPS[:_LAST_PRINTABLE_CHARACTER + 1] = -MICROSTEPS_PER_CHARACTER_WIDTH
+_REVERSE_PRINTING_STEPS[_SPACE] = -MICROSTEPS_PER_CHARACTER_WIDTH
+
+CostFeatures = namedtuple('CostFeatures', ['bytes', 'characters', 'repeated_characters', 'horizontal_travel',
+                                           'vertical_travel', 'line_feeds', 'mode_switches', 'alarm_seconds'])
+
+
+def extract_cost_features(data):
+    """
+    :param data: bytes as sent to Erika
+    :return: CostFeatures - travel is measured in microsteps
+    """
+    values = np.frombuffer(data, dtype=np.uint8)
+    commands, arguments = _split_commands(values)
+    counts = np.bincount(commands, minlength=256)
+
+    typed = commands[commands <= _LAST_PRINTABLE_CHARACTER]
+    repeated_characters = int(np.count_nonzero(typed[1:] == typed[:-1]))
+    characters = len(typed) - repeated_characters
+
+    # reverse printing mode is whatever the last 8D / 8E command before a character switched to
+    reverse_switches = (commands == _REVERSE_PRINTING_MODE_OFF) | (commands == _REVERSE_PRINTING_MODE_ON)
+    last_reverse_switch = np.maximum.accumulate(np.where(reverse_switches, np.arange(len(commands)), -1))
+    reverse_printing = (last_reverse_switch >= 0) & (commands[last_reverse_switch] == _REVERSE_PRINTING_MODE_ON)
+
+    steps = np.where(reverse_printing, _REVERSE_PRINTING_STEPS[commands], _STEPS[commands])
+    horizontal = commands == _MICROSTEPS_HORIZONTAL
+    steps[horizontal] = arguments[horizontal].view(np.int8)
+
+    # CRLF returns the carriage from wherever the steps since the previous CRLF took it
+    position_at_line_feeds = np.diff(np.cumsum(steps)[commands == _CRLF], prepend=0)
+    horizontal_travel = int(np.abs(steps).sum() + np.abs(position_at_line_feeds).sum())
+
+    vertical_travel = int(_HALF_STEP_HEIGHT * (counts[_HALF_STEP_DOWN] + counts[_HALF_STEP_UP])
+                          + counts[_MICROSTEP_DOWN] + counts[_MICROSTEP_UP])
+    mode_switches = int(counts[_CORRECTION_MODE_OFF:_REVERSE_PRINTING_MODE_ON + 1].sum())
+    alarm_seconds = int(arguments[commands == _ALARM].sum(dtype=np.int64)) * 0.02
+
+    return CostFeatures(len(values), characters, repeated_characters, horizontal_travel, vertical_travel,
+                        int(counts[_CRLF]), mode_switches, alarm_seconds)
+
+
+def _split_commands(values):
+    """
+    Separate the commands from the argument bytes of A5 (horizontal microsteps) and AA (alarm).
+
+    An argument byte may have any value, including A5 / AA - so within a run of A5 / AA bytes commands and arguments
+    alternate, starting with a command. An A5 / AA at the very end of the stream gets 0 as its argument, which makes
+    it a no-op.
+
+    :param values: uint8 array
+    :return: (commands, arguments) - uint8 arrays of the same length, the argument is 0 for commands without one
+    """
+    takes_argument = (values == _MICROSTEPS_HORIZONTAL) | (values == _ALARM)
+    indices = np.arange(len(values))
+    run_starts = takes_argument.copy()
+    run_starts[1:] &= ~takes_argument[:-1]
+    offset_in_run = indices - np.maximum.accumulate(np.where(run_starts, indices, 0))
+    with_argument = takes_argument & (offset_in_run % 2 == 0)
+    with_argument[-1:] = False
+
+    is_command = np.ones(len(values), dtype=bool)
+    is_command[1:] = ~with_argument[:-1]
+    arguments = np.zeros(len(values), dtype=np.uint8)
+    arguments[with_argument] = values[indices[with_argument] + 1]
+    return values[is_command], arguments[is_command]
+
+
+class ErikaCostModel:
+
+    def __init__(self,
+                 seconds_per_byte=SECONDS_PER_BYTE,
+                 seconds_per_character=DEFAULT_SECONDS_PER_CHARACTER,
+                 seconds_per_repeated_character=DEFAULT_SECONDS_PER_REPEATED_CHARACTER,
+                 seconds_per_horizontal_microstep=DEFAULT_SECONDS_PER_HORIZONTAL_MICROSTEP,
+                 seconds_per_vertical_microstep=DEFAULT_SECONDS_PER_VERTICAL_MICROSTEP,
+                 seconds_per_line_feed=DEFAULT_SECONDS_PER_LINE_FEED,
+                 seconds_per_mode_switch=DEFAULT_SECONDS_PER_MODE_SWITCH):
+        # same order as CostFeatures - alarms are taken as they are
+        self.weights = np.array([seconds_per_byte, seconds_per_character, seconds_per_repeated_character,
+                                 seconds_per_horizontal_microstep, seconds_per_vertical_microstep,
+                                 seconds_per_line_feed, seconds_per_mode_switch, 1.0])
+
+    @classmethod
+    def calibrated(cls, measurements):
+        """
+        Fit the weights to measured print jobs (least squares, no negative weights).
+
+        :param measurements: list of (data, seconds) tuples - bytes sent to Erika and the wall-clock time it took
+        :return: a new ErikaCostModel
+        """
+        features = np.array([extract_cost_features(data) for data, seconds in measurements], dtype=float)
+        alarm_seconds = features[:, -1]
+        seconds = np.array([seconds for data, seconds in measurements], dtype=float) - alarm_seconds
+        weights, residuals, rank, singular_values = np.linalg.lstsq(features[:, :-1], seconds, rcond=None)
+        return cls(*np.clip(weights, 0, None))
+
+    def estimate(self, data):
+        """
+        :param data: bytes as sent to Erika, e.g. ErikaProgram.to_bytes() or the payload of a job file
+        :return: estimated duration [s]
+        """
+        return self.estimate_for_features(extract_cost_features(data))
+
+    def estimate_for_features(self, features):
+        return float(np.dot(self.weights, features))
+
+
+def format_duration(seconds):
+    return str(datetime.timedelta(seconds=round(seconds)))
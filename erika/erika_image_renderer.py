@@ -1,459 +1,239 @@
-import math
-import random
-from enum import Enum
-
+import os
+import queue
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from erika import strategy_registry
+from erika.erika import MICROSTEPS_PER_CHARACTER_HEIGHT
+from erika.erika import MICROSTEPS_PER_CHARACTER_WIDTH
+from erika.erika_cost_model import ErikaCostModel
+from erika.erika_optimizer import MovementCoalescingErika
+from erika.erika_program import RecordingErika
+from erika.glyph_halftone import image_to_glyph_lines
+from erika.image_converter import DEFAULT_STRIP_HEIGHT
+from erika.image_converter import DITHERING_THRESHOLD
+from erika.image_converter import ImageStrips
+from erika.image_converter import LUMINANCE_AVERAGE
 from erika.image_converter import WrappedImage, NotAnImageException
+from erika.strategy_registry import AUTO_STRATEGY
 
+# Trying out all strategies must not take longer than this share of the printing time it is about to save -
+# strategies that are not done by then are not considered (but at least AUTO_MIN_SIMULATION_SECONDS are spent).
+AUTO_SIMULATION_BUDGET_SHARE = 0.02
+AUTO_MIN_SIMULATION_SECONDS = 5
 
-class Direction(Enum):
-    NORTHEAST = 1
-    NORTHWEST = 2
-    SOUTHEAST = 3
-    SOUTHWEST = 4
+StrategySelection = namedtuple('StrategySelection', ['strategy_string', 'program', 'estimates', 'simulation_seconds'])
 
 
 class ErikaImageRenderer:
-    def __init__(self, some_erika, rendering_strategy_string):
+    def __init__(self, some_erika, rendering_strategy_string, image_options=None):
+        """
+        :param image_options: dictionary of keyword arguments for converting image files, see WrappedImage - e.g.
+        dithering, width or cache_directory - and glyph_halftone, see ErikaAndInputFacadeFactory.create_for_path
+        """
         self.erika = some_erika
         self.strategy_string = rendering_strategy_string
+        self.image_options = image_options or {}
 
     def render_file(self, file_path):
+        if self.strategy_string == AUTO_STRATEGY:
+            self.select_strategy(file_path=file_path).program.replay(self.erika)
+            return
         strategy = self.create_strategy()
         self.render_file_for_fixed_strategy(file_path, strategy)
 
     def render_file_for_fixed_strategy(self, file_path, strategy):
-        erika_image_abstraction = ErikaAndInputFacadeFactory.create_for_path(self.erika, file_path)
+        optimized_erika = MovementCoalescingErika(self.erika)
+        erika_image_abstraction = ErikaAndInputFacadeFactory.create_for_path(optimized_erika, file_path,
+                                                                             **self.image_options)
+        self._check_strategy_supports(erika_image_abstraction)
         strategy.render(erika_image_abstraction)
+        optimized_erika.flush()
+
+    def render_file_in_strips(self, file_path, strategy=None, strip_height=DEFAULT_STRIP_HEIGHT):
+        """
+        Render an image strip by strip, for images too big to be held in memory as a whole. Each strip is rendered on
+        its own, right below the previous one.
+
+        :param strategy: rendering strategy - only strategies that support rendering in strips, default: the current
+        strategy
+        :param strip_height: number of image rows per strip
+        """
+        strategy = strategy or self.create_strategy()
+        if not any(info.supports_rendering_in_strips
+                   for info in strategy_registry.strategy_infos_for_class(type(strategy))):
+            raise Exception("Rendering strategy {} can not render an image strip by strip"
+                            .format(type(strategy).__name__))
+        # dithering and resizing need the neighbouring rows - caching would need the whole image
+        if self.image_options.get('dithering', DITHERING_THRESHOLD) != DITHERING_THRESHOLD \
+                or self.image_options.get('width') is not None or self.image_options.get('glyph_halftone'):
+            raise Exception("Dithering, resizing and printing as characters are not supported when rendering an image "
+                            "strip by strip")
+        strip_options = {name: value for name, value in self.image_options.items() if name in ('threshold', 'luminance')}
+
+        optimized_erika = MovementCoalescingErika(self.erika)
+        with ImageStrips(file_path, strip_height, **strip_options) as strips:
+            for top, strip in strips:
+                erika_image_abstraction = ErikaAndImageInputFacade(optimized_erika, strip)
+                strategy.render(erika_image_abstraction)
+                erika_image_abstraction.move_below()
+        optimized_erika.flush()
+
+    def compile_file(self, file_path):
+        """
+        Render the given file into an ErikaProgram instead of printing it.
+
+        :return: the optimized ErikaProgram - print it by calling its replay method
+        """
+        if self.strategy_string == AUTO_STRATEGY:
+            return self.select_strategy(file_path=file_path).program
+        recording_erika = RecordingErika()
+        ErikaImageRenderer(recording_erika, self.strategy_string, self.image_options).render_file(file_path)
+        return recording_erika.program.optimized()
+
+    def compile_lines(self, lines):
+        """Same as compile_file, for ASCII art given as text lines."""
+        if self.strategy_string == AUTO_STRATEGY:
+            return self.select_strategy(lines=lines).program
+        recording_erika = RecordingErika()
+        ErikaImageRenderer(recording_erika, self.strategy_string, self.image_options).render_lines(lines)
+        return recording_erika.program.optimized()
+
+    def select_strategy(self, file_path=None, lines=None, candidates=None, cost_model=None):
+        """
+        Compile the given file (or lines) with each of the candidate strategies - in parallel, one process each - and
+        pick the one that prints fastest.
+
+        :param candidates: names of the strategies to try out - default: auto_candidates
+        :param cost_model: ErikaCostModel for comparing the strategies - default weights if not given
+        :return: StrategySelection - the cheapest strategy, its compiled program and the estimates [s] for all
+        strategies that were done in time
+        """
+        # only needed for picking a strategy - not imported for plain rendering
+        import multiprocessing
+
+        candidates = list(candidates or auto_candidates(character_based=lines is not None))
+        cost_model = cost_model or ErikaCostModel()
+        started = time.monotonic()
+        results = queue.Queue()
+        best = None
+        estimates = {}
+        errors = []
+
+        pool = multiprocessing.Pool(min(len(candidates), os.cpu_count() or 1))
+        try:
+            for strategy_string in candidates:
+                pool.apply_async(_compile_candidate, (strategy_string, file_path, lines, self.image_options, cost_model),
+                                 callback=results.put, error_callback=results.put)
+            for i in range(len(candidates)):
+                timeout = None
+                if best is not None:
+                    budget = max(AUTO_MIN_SIMULATION_SECONDS, AUTO_SIMULATION_BUDGET_SHARE * best[1])
+                    timeout = max(0, started + budget - time.monotonic())
+                try:
+                    result = results.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if isinstance(result, BaseException):
+                    errors.append(result)
+                    continue
+                strategy_string, estimate, program = result
+                estimates[strategy_string] = estimate
+                # ties go to the strategy named first
+                if best is None or (estimate, candidates.index(strategy_string)) < (best[1], candidates.index(best[0])):
+                    best = result
+        finally:
+            pool.terminate()
+            pool.join()
+
+        if best is None:
+            raise errors[0]
+        return StrategySelection(best[0], best[2], estimates, time.monotonic() - started)
+
+    def estimate_duration(self, file_path, cost_model=None):
+        """
+        :param cost_model: ErikaCostModel to use - default weights if not given
+        :return: estimated time [s] for printing the given file using the current strategy
+        """
+        cost_model = cost_model or ErikaCostModel()
+        return cost_model.estimate(self.compile_file(file_path).to_bytes())
 
     def render_lines(self, lines):
+        if self.strategy_string == AUTO_STRATEGY:
+            self.select_strategy(lines=lines).program.replay(self.erika)
+            return
         strategy = self.create_strategy()
         self.render_lines_for_fixed_strategy(lines, strategy)
 
     def render_lines_for_fixed_strategy(self, lines, strategy):
-        erika_image_abstraction = ErikaAndInputFacadeFactory.create_for_lines(self.erika, lines)
+        optimized_erika = MovementCoalescingErika(self.erika)
+        erika_image_abstraction = ErikaAndInputFacadeFactory.create_for_lines(optimized_erika, lines)
+        self._check_strategy_supports(erika_image_abstraction)
         strategy.render(erika_image_abstraction)
+        optimized_erika.flush()
 
     def create_strategy(self):
-        strategies = {
-            'LineByLine': LineByLineErikaImageRenderingStrategy,
-            'Interlaced': InterlacedErikaImageRenderingStrategy,
-            'PerpendicularSpiralInward': PerpendicularSpiralInwardErikaImageRenderingStrategy,
-            'RandomDotFill': RandomDotFillErikaImageRenderingStrategy,
-            'ArchimedeanSpiralOutward': ArchimedeanSpiralOutwardErikaImageRenderingStrategy
-        }
-        return strategies[self.strategy_string]()
-
-
-class ErikaImageRenderingStrategy:
-
-    def __init__(self):
-        pass
-
-    def render(self, erika_image_abstraction):
-        raise Exception('Not implemented')
-
-    @staticmethod
-    def _generate_coordinates(range_x_upper, range_y_upper, range_x_lower=0, range_y_lower=0):
-        for x in range(range_x_lower, range_x_upper):
-            for y in range(range_y_lower, range_y_upper):
-                yield (x, y)
-
-    def _initialize_printed_characters_map(self, max_line_length, line_count):
-        self.printed = []
-        for y in range(line_count):
-            new_row = []
-            for x in range(max_line_length):
-                new_row.append(False)
-            self.printed.append(new_row)
-
-
-class LineByLineErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
-
-    def __init__(self):
-        ErikaImageRenderingStrategy.__init__(self)
-
-    def render(self, erika_image_abstraction):
-        for y in range(0, erika_image_abstraction.height()):
-            erika_image_abstraction.print_line_at(y)
-            erika_image_abstraction.crlf()
-
-
-class InterlacedErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
-
-    def __init__(self):
-        ErikaImageRenderingStrategy.__init__(self)
-
-    def render(self, erika_image_abstraction):
-        line_count = erika_image_abstraction.height()
-        moved = 0
-        for even in range(0, line_count, 2):
-            erika_image_abstraction.print_line_at(even)
-            erika_image_abstraction.crlf()
-            erika_image_abstraction.crlf()
-            moved += 2
-
-        # reset cursor to start of line
-        erika_image_abstraction.crlf()
-
-        # do not compensate the line that this adds - the extra line will position the cursor right where we want it
-        # erika_image_abstraction.move_up()
-
-        for lines_to_move_up in range(0, moved):
-            erika_image_abstraction.move_up()
-
-        for odd in range(1, line_count, 2):
-            erika_image_abstraction.print_line_at(odd)
-            erika_image_abstraction.crlf()
-            erika_image_abstraction.crlf()
-
-
-class PerpendicularSpiralInwardErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
-
-    def __init__(self):
-        ErikaImageRenderingStrategy.__init__(self)
-
-    def render(self, erika_image_abstraction):
-        line_count = erika_image_abstraction.height()
-        max_line_length = erika_image_abstraction.width()
-        self._print_spiral_recursively(erika_image_abstraction, 0, 0, max_line_length - 1, line_count - 1)
-
-    def _print_spiral_recursively(self, erika_image_abstraction,
-                                  upper_left_x, upper_left_y,
-                                  lower_right_x, lower_right_y):
-        """ASSUMPTION: current position is at (upper_left_x, upper_left_y)"""
-        if upper_left_x > lower_right_x or upper_left_y > lower_right_y:
-            return
-
-        # render one round of the spiral, clockwise
-
-        #
-        # =====>
-        #
-        for x in range(upper_left_x, lower_right_x + 1):
-            erika_image_abstraction.print_at(x, upper_left_y)
-
-        # edge case: this was the only last row
-        if upper_left_y == lower_right_y:
-            return
-
-        # reset to last cursor position
-        erika_image_abstraction.move_left()
-
-        # go down - do not print a character twice
-        erika_image_abstraction.move_down()
+        if self.strategy_string == AUTO_STRATEGY:
+            raise Exception("Strategy {} picks one of the others - it can't be used on its own".format(AUTO_STRATEGY))
+        return strategy_registry.create_strategy(self.strategy_string)
 
-        # ||
-        # ||
-        # \/
-        for y in range(upper_left_y + 1, lower_right_y):
-            erika_image_abstraction.print_at(lower_right_x, y)
-            erika_image_abstraction.move_down()
-            erika_image_abstraction.move_left()
-
-        # special handling of last character - smoothen transition
-        erika_image_abstraction.print_at(lower_right_x, lower_right_y)
-
-        # edge case: this was the only last column
-        if upper_left_x == lower_right_x:
+    def _check_strategy_supports(self, erika_image_abstraction):
+        # only strategies selected by name are known to the registry - strategy objects passed in are trusted
+        if self.strategy_string not in strategy_registry.strategy_names():
             return
+        info = strategy_registry.strategy_info(self.strategy_string)
+        if isinstance(erika_image_abstraction, ErikaAndImageInputFacade):
+            if not info.microstep_based:
+                raise Exception("Rendering strategy {} can not render images".format(self.strategy_string))
+        elif not info.character_based:
+            raise Exception("Rendering strategy {} can not render ASCII art".format(self.strategy_string))
 
-        # back to last printed character
-        erika_image_abstraction.move_left()
-        erika_image_abstraction.move_left()
-
-        #
-        # <=====
-        #
-        for x in range(lower_right_x - 1, upper_left_x, -1):
-            erika_image_abstraction.print_at(x, lower_right_y)
-            erika_image_abstraction.move_left()
-            erika_image_abstraction.move_left()
-
-        # make this a separate step - curses will fail if this would go off screen
-        for x in range(upper_left_x, upper_left_x - 1, -1):
-            erika_image_abstraction.print_at(x, lower_right_y)
-            erika_image_abstraction.move_left()
-
-        erika_image_abstraction.move_up()
-
-        # /\
-        # ||
-        # ||
-        for y in range(lower_right_y - 1, upper_left_y + 1, -1):
-            erika_image_abstraction.print_at(upper_left_x, y)
-            erika_image_abstraction.move_up()
-            erika_image_abstraction.move_left()
-
-        # special handling of last character - smoothen transition
-        if lower_right_y - 1 >= upper_left_y + 1:
-            erika_image_abstraction.print_at(upper_left_x, upper_left_y + 1)
-
-        # continue with smaller spiral - restart recursion
-        self._print_spiral_recursively(erika_image_abstraction,
-                                       upper_left_x + 1, upper_left_y + 1,
-                                       lower_right_x - 1, lower_right_y - 1)
-
-
-class RandomDotFillErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
-
-    def __init__(self):
-        ErikaImageRenderingStrategy.__init__(self)
-        self.current_x = 0
-        self.current_y = 0
-
-    def render(self, erika_image_abstraction):
-        self.current_x = 0
-        self.current_y = 0
-
-        line_count = erika_image_abstraction.height()
-        max_line_length = erika_image_abstraction.width()
-        self._initialize_printed_characters_map(max_line_length, line_count)
-        self._render_random_dots_naive(line_count, max_line_length, erika_image_abstraction)
-
-    # naive approach: generate random position, render if not yet printed there
-    # * this results in about 100 additional re-generation attempts for random numbers for the small test images
-    # * improvement idea:
-    # ** define a cut-off point (e.g. "if 100 letters left")
-    # ** add remaining dots to a list + use random.choice(list) on those instead of continuing to guess blindly
-    def _render_random_dots_naive(self, line_count, max_line_length, erika_image_abstraction):
-        # once more, assuming a square image
-        number_of_characters = line_count * max_line_length
-
-        for i in range(0, number_of_characters):
-            # generate random position
-            # look up if already printed - re-generate until empty space was found
-            position_x, position_y = self._generate_random_position(max_line_length, line_count)
-            while self.printed[position_y][position_x]:
-                position_x, position_y = self._generate_random_position(max_line_length, line_count)
-
-            # move there + print
-            self._move_to(erika_image_abstraction, position_x, position_y)
-
-            erika_image_abstraction.print_at(position_x, position_y)
-            self.current_x += 1
-            self.printed[position_y][position_x] = True
-            # repeat
-
-    @staticmethod
-    def _generate_random_position(exclusive_max_x, exclusive_max_y):
-        random1 = random.randint(0, exclusive_max_x - 1)
-        random2 = random.randint(0, exclusive_max_y - 1)
-        return random1, random2
-
-    def _move_to(self, erika_image_abstraction, position_x, position_y):
-        # naive: adjust X position first, then Y position
-        while self.current_x < position_x:
-            erika_image_abstraction.move_right()
-            self.current_x += 1
-
-        while position_x < self.current_x:
-            erika_image_abstraction.move_left()
-            self.current_x -= 1
-
-        while self.current_y < position_y:
-            erika_image_abstraction.move_down()
-            self.current_y += 1
 
-        while position_y < self.current_y:
-            erika_image_abstraction.move_up()
-            self.current_y -= 1
+def auto_candidates(character_based=False):
+    """
+    :param character_based: True to only include the strategies that can render ASCII art
+    :return: names of the strategies the Auto strategy tries out - the ones that are quick to try out first: with fewer
+    processors than strategies, the slow ones are the ones that are skipped when running out of time
+    """
+    infos = [strategy_registry.strategy_info(name) for name in strategy_registry.strategy_names()]
+    return [info.name for info in sorted(infos, key=lambda info: info.needs_random_access)
+            if info.character_based or not character_based]
 
 
-class ArchimedeanSpiralOutwardErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
-
-    # TODO mention "This is a reST style." in commit message + link to https://stackoverflow.com/a/24385103/1143126
-    def __init__(self, spiral_param_a=1, spiral_param_b=0.35, spiral_step_size=0.01, render_remaining_characters=True):
-        """
-        "...with real numbers a and b.
-
-        Changing the parameter a turns the spiral,
-
-        while b controls the distance between successive turnings."
-
-        https://en.wikipedia.org/wiki/Archimedean_spiral
-
-        :param spiral_param_a: turns the spiral
-        :param spiral_param_b: controls distance between spiral turns
-        :param spiral_step_size: step size between successive datapoints
-        :param render_remaining_characters: if False, will only render the spiral, not fill remaining gaps later
-        """
-        ErikaImageRenderingStrategy.__init__(self)
-
-        self.spiral_param_a = spiral_param_a
-        self.spiral_param_b = spiral_param_b
-
-        # round spiral:
-        # 1 / 20 * pi
-        # 1 / 10
-        #
-        # jagged spiral:
-        # 1
-        self.spiral_step_size = spiral_step_size
-
-        # tolerance around 45° angle (in all directions) to mark as area for cut-off
-        self.CUTOFF_ANGLE_TOLERANCE = 15
-
-        self.render_remaining_characters = render_remaining_characters
-
-        # init - only used later
-        self.current_x = 0
-        self.current_y = 0
-        self.spiral_offset_x = 0
-        self.spiral_offset_y = 0
-
-    def render(self, erika_image_abstraction):
-        self.current_x = 0
-        self.current_y = 0
-
-        line_count = erika_image_abstraction.height()
-        max_line_length = erika_image_abstraction.width()
-        self._initialize_printed_characters_map(max_line_length, line_count)
-
-        self._render_spiral(erika_image_abstraction, max_line_length, line_count)
-
-        if self.render_remaining_characters:
-            self._render_remaining(erika_image_abstraction, max_line_length, line_count)
-
-        self._reset_to_upper_left(erika_image_abstraction)
-
-    # Formula for Archimedean spiral:
-    # https://en.wikipedia.org/wiki/Archimedean_spiral
-    # r = a + b * phi
-    # (with phi replaced later by t = 0, 1, ...)
-    #
-    # from polar coordinates to cartesian coordinates:
-    # x = r * cos(phi)
-    # y = r * sin(phi)
-    #
-    # follows:
-    # r = x / cos(phi)
-    # x / cos(phi) = a + b * phi
-    # x = (a + b * phi) * cos(phi)
-    #
-    # r = y / sin(phi)
-    # y / sin(phi) = a + b * phi
-    # y = (a + b * phi) * sin(phi)
-    #
-    def _render_spiral(self, erika_image_abstraction, max_line_length, line_count):
-
-        max_x = max_line_length - 1
-        max_y = line_count - 1
-
-        i = 1
-        directions_out_of_bounds = {}
-        self.spiral_offset_x = math.floor(max_x / 2)
-        self.spiral_offset_y = math.floor(max_y / 2)
-        self._move_to(erika_image_abstraction, self.spiral_offset_x, self.spiral_offset_y)
-        while True:
-            t = i * self.spiral_step_size
-
-            x = (self.spiral_param_a + self.spiral_param_b * t) * math.cos(t) + self.spiral_offset_x
-            y = (self.spiral_param_a + self.spiral_param_b * t) * math.sin(t) + self.spiral_offset_y
-
-            # cut off: cut off if turtle is in the corner (close to 45 degree angle in all directions) + out of bounds
-            current_angle = (math.degrees(t) % 360)
-            if ((45 - self.CUTOFF_ANGLE_TOLERANCE <= current_angle)
-                    and (current_angle <= 45 + self.CUTOFF_ANGLE_TOLERANCE)):
-                self._note_if_out_of_bounds(directions_out_of_bounds, Direction.NORTHEAST, max_x, max_y, x, y)
-            if ((135 - self.CUTOFF_ANGLE_TOLERANCE <= current_angle)
-                    and (current_angle <= 135 + self.CUTOFF_ANGLE_TOLERANCE)):
-                self._note_if_out_of_bounds(directions_out_of_bounds, Direction.NORTHWEST, max_x, max_y, x, y)
-            if ((225 - self.CUTOFF_ANGLE_TOLERANCE <= current_angle)
-                    and (current_angle <= 225 + self.CUTOFF_ANGLE_TOLERANCE)):
-                self._note_if_out_of_bounds(directions_out_of_bounds, Direction.SOUTHEAST, max_x, max_y, x, y)
-            if ((315 - self.CUTOFF_ANGLE_TOLERANCE <= current_angle)
-                    and (current_angle <= 315 + self.CUTOFF_ANGLE_TOLERANCE)):
-                self._note_if_out_of_bounds(directions_out_of_bounds, Direction.SOUTHWEST, max_x, max_y, x, y)
-
-            # all 4 directions are out of bounds now
-            if len(directions_out_of_bounds) > 3:
-                break
-
-            rounded_x = math.floor(x)
-            rounded_y = math.floor(y)
-            # move to calculated next point + print
-            self._goto_and_print_if_in_bounds(erika_image_abstraction, max_x, max_y, rounded_x, rounded_y)
-
-            i += 1
-
-    @staticmethod
-    def _note_if_out_of_bounds(directions_out_of_bounds, direction, max_x, max_y, x, y):
-        if (x < 0) or (y < 0) or (max_x < x) or (max_y < y):
-            directions_out_of_bounds[direction] = 1
-
-    def _goto_and_print_if_in_bounds(self, erika_image_abstraction, max_x, max_y, x, y):
-        if (x < 0) or (y < 0) or (max_x < x) or (max_y < y):
-            return
-        self._goto_and_print(erika_image_abstraction, x, y)
-
-    def _goto_and_print(self, erika_image_abstraction, x, y):
-        if self.printed[y][x]:
-            return
-
-        self.printed[y][x] = True
-        self._move_to(erika_image_abstraction, x, y)
-        erika_image_abstraction.print_at(x, y)
-        self.current_x += 1
-
-    # TODO dry
-    def _move_to(self, erika_image_abstraction, position_x, position_y):
-        # naive: adjust X position first, then Y position
-        while self.current_x < position_x:
-            erika_image_abstraction.move_right()
-            self.current_x += 1
-
-        while position_x < self.current_x:
-            erika_image_abstraction.move_left()
-            self.current_x -= 1
-
-        while self.current_y < position_y:
-            erika_image_abstraction.move_down()
-            self.current_y += 1
-
-        while position_y < self.current_y:
-            erika_image_abstraction.move_up()
-            self.current_y -= 1
-
-    def _render_remaining(self, erika_image_abstraction, max_line_length, line_count):
-        # render remaining letters in ascending order of distance to middle point
-        found = True
-        while found:
-            found = False
-            min_distance = float("inf")
-            min_position_x = 0
-            min_position_y = 0
-
-            for x, y in self._generate_coordinates(max_line_length, line_count):
-                is_printed = self.printed[y][x]
-                is_new_min_distance = self._distance_to_spiral_center(x, y) < min_distance
-                if is_new_min_distance and not is_printed:
-                    found = True
-                    min_position_x = x
-                    min_position_y = y
-                    min_distance = self._distance_to_spiral_center(x, y)
-            if found:
-                self._goto_and_print(erika_image_abstraction, min_position_x, min_position_y)
-
-    def _distance_to_spiral_center(self, x, y):
-        delta_x = math.fabs(self.spiral_offset_x - x)
-        delta_y = math.fabs(self.spiral_offset_y - y)
-        return math.sqrt(delta_x * delta_x + delta_y * delta_y)
-
-    def _reset_to_upper_left(self, erika_image_abstraction):
-        self._move_to(erika_image_abstraction, 0, 0)
+def _compile_candidate(strategy_string, file_path, lines, image_options, cost_model):
+    """Runs in a worker process of ErikaImageRenderer.select_strategy."""
+    renderer = ErikaImageRenderer(None, strategy_string, image_options)
+    program = renderer.compile_file(file_path) if lines is None else renderer.compile_lines(lines)
+    return strategy_string, cost_model.estimate(program.to_bytes()), program
 
 
 class ErikaAndInputFacadeFactory:
 
     @classmethod
-    def create_for_path(cls, erika, file_path):
+    def create_for_path(cls, erika, file_path, glyph_halftone=False, **image_options):
+        """
+        :param glyph_halftone: if True, images are printed as ASCII art - one character per character cell, see
+        image_to_glyph_lines
+        :param image_options: keyword arguments for WrappedImage
+        """
         try:
-            image = WrappedImage(file_path)
+            if glyph_halftone:
+                return ErikaAndAsciiArtInputFacade(erika, cls._glyph_lines(file_path, **image_options))
+            image = WrappedImage(file_path, **image_options)
             return ErikaAndImageInputFacade(erika, image)
         except NotAnImageException:
             lines = _read_lines_without_trailing_newlines(file_path)
             return ErikaAndAsciiArtInputFacade(erika, lines)
 
+    @staticmethod
+    def _glyph_lines(file_path, luminance=LUMINANCE_AVERAGE, width=None, dithering=DITHERING_THRESHOLD, **ignored):
+        # characters are the halftone - there are no set pixels, so the threshold (and the cache for bitmaps) don't apply
+        if dithering != DITHERING_THRESHOLD:
+            raise Exception("Dithering is not supported when printing images as characters")
+        return image_to_glyph_lines(file_path, luminance, width)
+
     @classmethod
     def create_for_lines(cls, erika, lines):
         return ErikaAndAsciiArtInputFacade(erika, lines)
@@ -485,6 +265,30 @@ def print_line_at(self, y):
     def print_whole_line(self, line):
         pass
 
+    def move_by(self, delta_x, delta_y):
+        pass
+
+    def inked_extent(self, y):
+        pass
+
+    def print_segment_at(self, y, start_x, end_x):
+        pass
+
+    def print_segment_reversed_at(self, y, start_x, end_x):
+        pass
+
+    def inked_positions(self):
+        pass
+
+    def is_inked(self, x, y):
+        pass
+
+    def step_size(self):
+        pass
+
+    def with_erika(self, erika):
+        pass
+
 
 class ErikaAndAsciiArtInputFacade(ErikaAndInputFacade):
 
@@ -497,6 +301,10 @@ def __init__(self, erika, lines):
         self.erika = erika
         self.lines = lines
 
+    def with_erika(self, erika):
+        """:return: a new facade for the same ASCII art, printing on the given Erika - e.g. for recording a trial run"""
+        return ErikaAndAsciiArtInputFacade(erika, self.lines)
+
     def move_left(self):
         self.erika.move_left()
 
@@ -518,6 +326,45 @@ def print_at(self, x, y):
     def print_line_at(self, y):
         self.erika.print_ascii(self.lines[y])
 
+    def move_by(self, delta_x, delta_y):
+        for i in range(delta_x):
+            self.erika.move_right()
+        for i in range(-delta_x):
+            self.erika.move_left()
+        for i in range(delta_y):
+            self.erika.move_down()
+        for i in range(-delta_y):
+            self.erika.move_up()
+
+    def inked_extent(self, y):
+        """:return: (start_x, end_x) of the non-blank part of the given line - end_x is exclusive; None if blank"""
+        line = self.lines[y]
+        stripped_line = line.lstrip(" ")
+        if not stripped_line:
+            return None
+        start_x = len(line) - len(stripped_line)
+        return start_x, start_x + len(stripped_line.rstrip(" "))
+
+    def print_segment_at(self, y, start_x, end_x):
+        """ASSUMPTION: current position is at start_x - ends up at end_x"""
+        self.erika.print_ascii(self.lines[y][start_x:end_x])
+
+    def print_segment_reversed_at(self, y, start_x, end_x):
+        """ASSUMPTION: current position is at end_x - ends up at start_x"""
+        self.erika.print_ascii_reversed(self.lines[y][start_x:end_x][::-1])
+
+    def is_inked(self, x, y):
+        line = self.lines[y]
+        return x < len(line) and line[x] != " "
+
+    def inked_positions(self):
+        """:return: list of (x, y) tuples for all non-blank characters"""
+        return [(x, y) for y, line in enumerate(self.lines) for x, c in enumerate(line) if c != " "]
+
+    def step_size(self):
+        """:return: (width, height) of one step in microsteps"""
+        return MICROSTEPS_PER_CHARACTER_WIDTH, MICROSTEPS_PER_CHARACTER_HEIGHT
+
     def height(self):
         return len(self.lines)
 
@@ -539,7 +386,7 @@ def __init__(self, erika, wrapped_image):
         """
         Indirection for rendering ASCII art images - hiding the concrete type of image from the rendering strategy.
         :param erika an Erika instance (or test double)
-        :param wrapped_image a WrappedImage abstracting from the image data
+        :param wrapped_image a WrappedImage (or WrappedBitmap) abstracting from the image data
         """
         self.erika = erika
         self.wrapped_image = wrapped_image
@@ -547,6 +394,12 @@ def __init__(self, erika, wrapped_image):
         # because we can't rely on the crlf command, we need to keep track of
         # the position along the X axis for supporting "newline" for image output
         self.position_x = 0
+        # relative to the start position - for continuing right below the image, see move_below
+        self.position_y = 0
+
+    def with_erika(self, erika):
+        """:return: a new facade for the same image, printing on the given Erika - e.g. for recording a trial run"""
+        return ErikaAndImageInputFacade(erika, self.wrapped_image)
 
     def move_left(self):
         self.erika.move_left_microsteps(1)
@@ -558,14 +411,23 @@ def move_right(self):
 
     def move_up(self):
         self.erika.move_up_microstep()
+        self.position_y -= 1
 
     def move_down(self):
         self.erika.move_down_microstep()
+        self.position_y += 1
 
     def crlf(self):
-        self.erika.move_left_microsteps(self.position_x)
+        # nothing to move back after blank lines - consecutive blank lines only move the paper
+        if self.position_x != 0:
+            self.erika.move_left_microsteps(self.position_x)
         self.position_x = 0
         self.erika.move_down_microstep()
+        self.position_y += 1
+
+    def move_below(self):
+        """Move to the start of the line right below the image - no matter where the rendering strategy ended."""
+        self.move_by(-self.position_x, self.height() - self.position_y)
 
     def print_at(self, x, y):
         if self.wrapped_image.is_pixel_set(x, y):
@@ -575,8 +437,81 @@ def print_at(self, x, y):
         self.position_x += 1
 
     def print_line_at(self, y):
-        for x in range(0, self.wrapped_image.width()):
-            self.print_at(x, y)
+        """
+        Print the given line, starting at the current position: blank runs are skipped with one move each, and the
+        position stays behind the last printed pixel - crlf only moves back as far as needed.
+        """
+        start_position_x = self.position_x
+        for start_x, end_x in self.wrapped_image.runs(y):
+            blank_run_length = start_position_x + start_x - self.position_x
+            if blank_run_length > 0:
+                self.erika.move_right_microsteps(blank_run_length)
+            for x in range(start_x, end_x):
+                self.erika.print_pixel()
+            self.position_x = start_position_x + end_x
+
+    def move_by(self, delta_x, delta_y):
+        if delta_x > 0:
+            self.erika.move_right_microsteps(delta_x)
+        elif delta_x < 0:
+            self.erika.move_left_microsteps(-delta_x)
+        self.position_x += delta_x
+
+        for i in range(delta_y):
+            self.erika.move_down_microstep()
+        for i in range(-delta_y):
+            self.erika.move_up_microstep()
+        self.position_y += delta_y
+
+    def inked_extent(self, y):
+        """:return: (start_x, end_x) of the part of the given line with set pixels - end_x is exclusive; None if blank"""
+        runs = self.wrapped_image.runs(y)
+        if not runs:
+            return None
+        return runs[0][0], runs[-1][1]
+
+    def print_segment_at(self, y, start_x, end_x):
+        """ASSUMPTION: current position is at start_x - ends up at end_x"""
+        current_x = start_x
+        for run_start_x, run_end_x in self._runs_within(y, start_x, end_x):
+            self.move_by(run_start_x - current_x, 0)
+            for x in range(run_start_x, run_end_x):
+                self.erika.print_pixel()
+            self.position_x += run_end_x - run_start_x
+            current_x = run_end_x
+        self.move_by(end_x - current_x, 0)
+
+    def print_segment_reversed_at(self, y, start_x, end_x):
+        """
+        ASSUMPTION: current position is at end_x - ends up at start_x
+
+        Pixels are printed right to left - each one followed by a move back, which gets merged with the next move.
+        """
+        current_x = end_x
+        for run_start_x, run_end_x in reversed(self._runs_within(y, start_x, end_x)):
+            for x in range(run_end_x - 1, run_start_x - 1, -1):
+                self.move_by(x - current_x, 0)
+                self.erika.print_pixel()
+                self.position_x += 1
+                current_x = x + 1
+        self.move_by(start_x - current_x, 0)
+
+    def is_inked(self, x, y):
+        return self.wrapped_image.is_pixel_set(x, y)
+
+    def inked_positions(self):
+        """:return: list of (x, y) tuples for all set pixels"""
+        ys, xs = np.nonzero(self.wrapped_image.bitmap)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def step_size(self):
+        """:return: (width, height) of one step in microsteps"""
+        return 1, 1
+
+    def _runs_within(self, y, start_x, end_x):
+        return [(max(run_start_x, start_x), min(run_end_x, end_x))
+                for run_start_x, run_end_x in self.wrapped_image.runs(y)
+                if run_start_x < end_x and start_x < run_end_x]
 
     def height(self):
         return self.wrapped_image.height()
@@ -0,0 +1,130 @@
+"""
+Job files: a compiled ErikaProgram, stored ready to be sent to Erika.
+
+Layout:
+* magic bytes (JOB_FILE_MAGIC)
+* header length: 4 bytes, unsigned, little endian
+* header: UTF-8 encoded JSON - metadata, estimated duration, required page size, payload length
+* payload: the raw bytes for Erika
+
+Expensive conversions (image loading, rendering strategy) happen once, when the file is written. Replaying only maps
+the file into memory and streams the payload to the serial port in large slices - no parsing of the payload at all.
+"""
+import json
+import mmap
+import struct
+
+from erika.erika_cost_model import ErikaCostModel
+
+JOB_FILE_MAGIC = b"ERIKAJOB"
+JOB_FILE_VERSION = 1
+
+_HEADER_LENGTH_FORMAT = "<I"
+_HEADER_LENGTH_SIZE = struct.calcsize(_HEADER_LENGTH_FORMAT)
+
+# bytes per write when replaying - large enough to keep the per-call overhead negligible
+JOB_REPLAY_CHUNK_SIZE = 64 * 1024
+
+
+class NotAJobFileException(Exception):
+    pass
+
+
+def write_job_file(file_path, program, metadata=None, cost_model=None):
+    """
+    :param file_path: where to write the job file to
+    :param program: the ErikaProgram to store - ideally already optimized
+    :param metadata: dictionary with additional JSON serializable information, e.g. source file and strategy
+    :param cost_model: ErikaCostModel for estimating the duration - default weights if not given
+    """
+    cost_model = cost_model or ErikaCostModel()
+    payload = program.to_bytes()
+    page_width, page_height = program.extent()
+    header = {
+        "version": JOB_FILE_VERSION,
+        "metadata": metadata or {},
+        "estimated_duration": cost_model.estimate(payload),
+        "page_width_microsteps": page_width,
+        "page_height_microsteps": page_height,
+        "payload_length": len(payload),
+    }
+    encoded_header = json.dumps(header).encode("utf-8")
+
+    with open(file_path, "wb") as job_file:
+        job_file.write(JOB_FILE_MAGIC)
+        job_file.write(struct.pack(_HEADER_LENGTH_FORMAT, len(encoded_header)))
+        job_file.write(encoded_header)
+        job_file.write(payload)
+
+
+class ErikaJobFile:
+
+    def __init__(self, file_path):
+        """
+        Memory-maps the given job file - use with a with-statement to make sure the file is closed again.
+
+        :param file_path: path to a file written by write_job_file
+        """
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        try:
+            self._mapped_file = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files can not be mapped
+            self._file.close()
+            raise NotAJobFileException("{} is not a job file - it is empty".format(file_path))
+
+        try:
+            self.header, payload_offset = self._parse_header()
+            payload_end = payload_offset + self.header["payload_length"]
+            if payload_end > len(self._mapped_file):
+                raise NotAJobFileException("{} is truncated - the payload is {} bytes short"
+                                           .format(file_path, payload_end - len(self._mapped_file)))
+        except NotAJobFileException:
+            self.close()
+            raise
+        self.payload = memoryview(self._mapped_file)[payload_offset:payload_end]
+
+    def _parse_header(self):
+        magic_length = len(JOB_FILE_MAGIC)
+        if self._mapped_file[:magic_length] != JOB_FILE_MAGIC:
+            raise NotAJobFileException("{} is not a job file".format(self.file_path))
+
+        header_offset = magic_length + _HEADER_LENGTH_SIZE
+        try:
+            header_length, = struct.unpack_from(_HEADER_LENGTH_FORMAT, self._mapped_file, magic_length)
+            if header_offset + header_length > len(self._mapped_file):
+                raise ValueError("the header is truncated")
+            # UnicodeDecodeError is a ValueError, too
+            header = json.loads(bytes(self._mapped_file[header_offset:header_offset + header_length]).decode("utf-8"))
+        except (struct.error, ValueError) as e:
+            raise NotAJobFileException("{} is not a valid job file: {}".format(self.file_path, e))
+        if not isinstance(header, dict) or header.get("version") != JOB_FILE_VERSION:
+            raise NotAJobFileException("{} has unsupported job file version {}".format(
+                self.file_path, header.get("version") if isinstance(header, dict) else None))
+        if not isinstance(header.get("payload_length"), int) or header["payload_length"] < 0:
+            raise NotAJobFileException("{} is not a valid job file: no payload length".format(self.file_path))
+        return header, header_offset + header_length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if hasattr(self, "payload"):
+            self.payload.release()
+        self._mapped_file.close()
+        self._file.close()
+
+    def replay(self, erika, chunk_size=JOB_REPLAY_CHUNK_SIZE):
+        """Stream the payload to the given Erika, in slices of chunk_size bytes."""
+        erika.flush()
+        for start in range(0, len(self.payload), chunk_size):
+            chunk = self.payload[start:start + chunk_size]
+            try:
+                erika._write_bytes(chunk)
+            finally:
+                chunk.release()
+        erika.flush()
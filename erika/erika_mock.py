@@ -12,22 +12,65 @@
 import sys
 from time import sleep
 
+import numpy as np
+
 from erika.erika import AbstractErika
+from erika.erika import ERIKA_PAGE_HEIGHT_CHARACTERS
+from erika.erika import ERIKA_PAGE_HEIGHT_MICROSTEPS
+from erika.erika import ERIKA_PAGE_WIDTH_CHARACTERS_HARD_LIMIT_AT_12_CHARS_PER_INCH
+from erika.erika import ERIKA_PAGE_WIDTH_CHARACTERS_SOFT_LIMIT_AT_12_CHARS_PER_INCH
+from erika.erika import ERIKA_PAGE_WIDTH_MICROSTEPS_HARD_LIMIT_AT_12_CHARS_PER_INCH
+from erika.erika import ERIKA_PAGE_WIDTH_MICROSTEPS_SOFT_LIMIT_AT_12_CHARS_PER_INCH
 from erika.erika import MICROSTEPS_PER_CHARACTER_HEIGHT
 from erika.erika import MICROSTEPS_PER_CHARACTER_WIDTH
 
-"""page dimensions for Erika"""
-# tested manually - the cursor will no longer move if a key is pressed
-ERIKA_PAGE_WIDTH_CHARACTERS_HARD_LIMIT_AT_12_CHARS_PER_INCH = 74
-# tested manually - thee will be a warning "beep" on the next pressed key
-ERIKA_PAGE_WIDTH_CHARACTERS_SOFT_LIMIT_AT_12_CHARS_PER_INCH = 65
+# canvas cells hold Unicode code points
+_CANVAS_ENCODING = "utf-32-le"
+_CANVAS_DTYPE = np.dtype("<u4")
+_EMPTY = ord(" ")
+_PIXEL = ord("X")
 
-ERIKA_PAGE_HEIGHT_CHARACTERS = 150
 
-ERIKA_PAGE_WIDTH_MICROSTEPS_HARD_LIMIT_AT_12_CHARS_PER_INCH = ERIKA_PAGE_WIDTH_CHARACTERS_HARD_LIMIT_AT_12_CHARS_PER_INCH * MICROSTEPS_PER_CHARACTER_WIDTH
-ERIKA_PAGE_WIDTH_MICROSTEPS_SOFT_LIMIT_AT_12_CHARS_PER_INCH = ERIKA_PAGE_WIDTH_CHARACTERS_SOFT_LIMIT_AT_12_CHARS_PER_INCH * MICROSTEPS_PER_CHARACTER_WIDTH
+class MockCanvas:
 
-ERIKA_PAGE_HEIGHT_MICROSTEPS = ERIKA_PAGE_HEIGHT_CHARACTERS * MICROSTEPS_PER_CHARACTER_HEIGHT
+    def __init__(self, width, height):
+        """
+        Everything a mock has printed: one Unicode code point per cell, stored in a NumPy array (see the array attribute,
+        indexed [y, x]). Empty cells contain a space.
+        """
+        self.width = width
+        self.height = height
+        self.array = np.full((height, width), _EMPTY, dtype=_CANVAS_DTYPE)
+
+    @staticmethod
+    def encode(text):
+        return np.frombuffer(text.encode(_CANVAS_ENCODING), dtype=_CANVAS_DTYPE)
+
+    def lines(self):
+        """:return: the canvas as list of strings, one per row"""
+        return [row.tobytes().decode(_CANVAS_ENCODING) for row in self.array]
+
+    def matches(self, expected_lines):
+        """
+        :param expected_lines: list of strings, compared to the top left corner of the canvas - all other cells have to
+        be empty
+        :return: True if the canvas contains exactly the expected output
+        """
+        if len(expected_lines) > self.height or any(len(line) > self.width for line in expected_lines):
+            return False
+        expected = np.full((self.height, self.width), _EMPTY, dtype=_CANVAS_DTYPE)
+        for y, line in enumerate(expected_lines):
+            expected[y, :len(line)] = self.encode(line)
+        return np.array_equal(expected, self.array)
+
+    def to_text(self):
+        return "\n".join(self.lines())
+
+    def save_as_png(self, file_path):
+        """Store the canvas as black and white image - black for every cell that is not empty."""
+        # imported here, as Pillow is not needed for any other mock functionality
+        from PIL import Image
+        Image.fromarray(np.where(self.array == _EMPTY, 255, 0).astype(np.uint8)).save(file_path, "PNG")
 
 
 class AbstractErikaMock(AbstractErika):
@@ -57,12 +100,7 @@ def __init__(self, width, height, exception_if_overprinted, delay_after_each_ste
 
         self.width = width
         self.height = height
-        self.canvas = []
-        for y in range(height):
-            new_list = []
-            for x in range(width):
-                new_list.append(" ")
-            self.canvas.append(new_list)
+        self.canvas = MockCanvas(width, height)
         self.canvas_x = 0
         self.canvas_y = 0
         self.exception_if_overprinted = exception_if_overprinted
@@ -132,9 +170,24 @@ def _advance_paper(self):
     def _write_byte(self, data, delay=0.5):
         raise Exception('User is not supposed to call this function directly')
 
+    def _write_bytes(self, data, delay=0.5):
+        raise Exception('User is not supposed to call this function directly')
+
     def decode(self, value):
         raise Exception('Not supported yet')
 
+    def _exit_because_out_of_canvas(self, length=1):
+        print("IndexError at ({}, {}) of ({}, {}) - increase values of "
+              "cli.DRY_RUN_WIDTH and cli.DRY_RUN_HEIGHT "
+              "if you need more space".format(self.canvas_x + length - 1, self.canvas_y, self.width, self.height))
+        sys.exit(1)
+
+    def _canvas_slice(self, length):
+        """:return: writable view on the canvas, length cells starting at the current position"""
+        if not (0 <= self.canvas_y < self.height and 0 <= self.canvas_x and self.canvas_x + length <= self.width):
+            self._exit_because_out_of_canvas(length)
+        return self.canvas.array[self.canvas_y, self.canvas_x:self.canvas_x + length]
+
 
 # to get exception-safe behavior, make sure __exit__ is always called (by using with-statements)
 class CharacterBasedErikaMock(AbstractErikaMock):
@@ -197,20 +250,15 @@ def crlf(self):
 
     def print_ascii(self, text):
         y, x = self.stdscr.getyx()
-        for c in text:
-            try:
-                if not self.canvas[self.canvas_y][self.canvas_x] == " ":
-                    if self.exception_if_overprinted:
-                        raise Exception(
-                            "Not supposed to print a letter twice: '{}' at ({}, {})."
-                                .format(c, self.canvas_x, self.canvas_y))
-                self.canvas[self.canvas_y][self.canvas_x] = c
-            except IndexError as e:
-                print("IndexError at ({}, {}) of ({}, {}) - increase values of "
-                      "cli.DRY_RUN_WIDTH and cli.DRY_RUN_HEIGHT "
-                      "if you need more space".format(self.canvas_x, self.canvas_y, self.width, self.height))
-                sys.exit(1)
-            self.canvas_x += 1
+        target = self._canvas_slice(len(text))
+        if self.exception_if_overprinted:
+            overprinted = np.flatnonzero(target != _EMPTY)
+            if overprinted.size:
+                first = overprinted[0]
+                raise Exception("Not supposed to print a letter twice: '{}' at ({}, {})."
+                                .format(text[first], self.canvas_x + first, self.canvas_y))
+        target[:] = MockCanvas.encode(text)
+        self.canvas_x += len(text)
 
         self.stdscr.addstr(text)
         self.stdscr.move(y, x + len(text))
@@ -224,22 +272,18 @@ def delete_ascii(self, reversed_text):
         if text_length == 0:
             return
 
-        self.canvas_x -= 1
         y, x = self.stdscr.getyx()
-        for c in reversed_text:
-            try:
-                if self.canvas[self.canvas_y][self.canvas_x] == c:
-                    self.canvas[self.canvas_y][self.canvas_x] = " "
-                else:
-                    raise Exception("Unexpected letter at current position: '{}' at ({}, {})."
-                                    .format(c, self.canvas_x, self.canvas_y))
-            except IndexError as e:
-                print("IndexError at ({}, {}) of ({}, {}) - increase values of "
-                      "cli.DRY_RUN_WIDTH and cli.DRY_RUN_HEIGHT "
-                      "if you need more space".format(self.canvas_x, self.canvas_y, self.width, self.height))
-                sys.exit(1)
-            self.canvas_x -= 1
-        self.canvas_x += 1
+        self.canvas_x -= text_length
+        target = self._canvas_slice(text_length)
+        expected = MockCanvas.encode(reversed_text)[::-1]
+        unexpected = np.flatnonzero(target != expected)
+        if unexpected.size:
+            last = unexpected[-1]
+            self.canvas_x += text_length
+            raise Exception("Unexpected letter at current position: '{}' at ({}, {})."
+                            .format(reversed_text[text_length - 1 - last], self.canvas_x - text_length + last,
+                                    self.canvas_y))
+        target[:] = _EMPTY
 
         self.stdscr.move(y, x - text_length)
         self.stdscr.addstr((" " * text_length))
@@ -249,6 +293,31 @@ def delete_ascii(self, reversed_text):
             sleep(self.delay_after_each_step)
         self.stdscr.refresh()
 
+    def print_ascii_reversed(self, reversed_text):
+        text_length = len(reversed_text)
+        if text_length == 0:
+            return
+
+        y, x = self.stdscr.getyx()
+        self.canvas_x -= text_length
+        target = self._canvas_slice(text_length)
+        text = reversed_text[::-1]
+        if self.exception_if_overprinted:
+            overprinted = np.flatnonzero(target != _EMPTY)
+            if overprinted.size:
+                last = overprinted[-1]
+                raise Exception("Not supposed to print a letter twice: '{}' at ({}, {})."
+                                .format(text[last], self.canvas_x + last, self.canvas_y))
+        target[:] = MockCanvas.encode(text)
+
+        self.stdscr.move(y, x - text_length)
+        self.stdscr.addstr(text)
+        self.stdscr.move(y, x - text_length)
+
+        if self.delay_after_each_step > 0:
+            sleep(self.delay_after_each_step)
+        self.stdscr.refresh()
+
 
 class MicrostepBasedErikaMock(AbstractErikaMock):
 
@@ -275,17 +344,10 @@ def move_left_microsteps(self, num_steps=1):
         self._cursor_back(num_steps)
 
     def print_pixel(self):
-        try:
-            if self.canvas[self.canvas_y][self.canvas_x] == "X":
-                if self.exception_if_overprinted:
-                    raise Exception(
-                        "Not supposed to print a pixel twice: at ({}, {}).".format(self.canvas_x, self.canvas_y))
-            self.canvas[self.canvas_y][self.canvas_x] = "X"
-        except IndexError as e:
-            print("IndexError at ({}, {}) of ({}, {}) - increase values of "
-                  "cli.DRY_RUN_WIDTH and cli.DRY_RUN_HEIGHT "
-                  "if you need more space".format(self.canvas_x, self.canvas_y, self.width, self.height))
-            sys.exit(1)
+        target = self._canvas_slice(1)
+        if target[0] == _PIXEL and self.exception_if_overprinted:
+            raise Exception("Not supposed to print a pixel twice: at ({}, {}).".format(self.canvas_x, self.canvas_y))
+        target[0] = _PIXEL
         self.canvas_x += 1
 
         self.stdscr.addstr("X")
@@ -297,14 +359,9 @@ def print_pixel(self):
     def delete_pixel(self):
         y, x = self.stdscr.getyx()
         self.canvas_x -= 1
-        try:
-            if self.canvas[self.canvas_y][self.canvas_x] == "X":
-                self.canvas[self.canvas_y][self.canvas_x] = " "
-        except IndexError as e:
-            print("IndexError at ({}, {}) of ({}, {}) - increase values of "
-                  "cli.DRY_RUN_WIDTH and cli.DRY_RUN_HEIGHT "
-                  "if you need more space".format(self.canvas_x, self.canvas_y, self.width, self.height))
-            sys.exit(1)
+        target = self._canvas_slice(1)
+        if target[0] == _PIXEL:
+            target[0] = _EMPTY
 
         self.stdscr.move(y, x - 1)
         self.stdscr.addstr(" ")
@@ -338,3 +395,6 @@ def print_ascii(self, text):
 
     def delete_ascii(self, text):
         raise Exception('Characters and character steps are not supported in microstep-based tests')
+
+    def print_ascii_reversed(self, reversed_text):
+        raise Exception('Characters and character steps are not supported in microstep-based tests')
@@ -0,0 +1,201 @@
+"""
+Optimizing layer between rendering code and an Erika (or test double):
+
+Movement commands are not sent right away, but summed up per axis. Only when something is printed (or anything else
+happens that depends on the current position), the net movement is sent - using as few commands as possible.
+Opposite moves cancel each other out, zero-length moves are dropped entirely.
+
+For a real Erika, the net movement of each axis is sent as the cheapest mix of the commands she has for it: half steps
+(one byte each) and signed "A5 xx" microstep moves (two bytes for up to 127 microsteps) horizontally, half steps and
+single microsteps vertically. Anything else (e.g. test doubles) gets character steps and microsteps as they were
+recorded - not every implementation supports both.
+"""
+from erika.erika import AbstractErika
+from erika.erika import Direction
+from erika.erika import Erika
+from erika.erika import MICROSTEPS_PER_CHARACTER_HEIGHT
+from erika.erika import MICROSTEPS_PER_CHARACTER_WIDTH
+
+_HALF_STEP_WIDTH = MICROSTEPS_PER_CHARACTER_WIDTH // 2
+_HALF_STEP_HEIGHT = MICROSTEPS_PER_CHARACTER_HEIGHT // 2
+
+# the widest single "A5 xx" moves, see Erika.move_right_microsteps / move_left_microsteps
+_MAX_MICROSTEPS_RIGHT = 127
+_MAX_MICROSTEPS_LEFT = 128
+
+
+class MovementCoalescingErika(AbstractErika):
+
+    def __init__(self, erika):
+        """
+        :param erika: the Erika instance (or test double) that will receive the optimized commands
+        """
+        super().__init__()
+        self.erika = erika
+
+        # net movement not sent yet - character steps and microsteps are tracked separately,
+        # as not every Erika implementation supports both
+        self.pending_characters_x = 0
+        self.pending_characters_y = 0
+        self.pending_microsteps_x = 0
+        self.pending_microsteps_y = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._send_pending_movement()
+        self.erika.__exit__(*args)
+
+    # movement: only recorded
+
+    def move_up(self):
+        self.pending_characters_y -= 1
+
+    def move_down(self):
+        self.pending_characters_y += 1
+
+    def move_left(self):
+        self.pending_characters_x -= 1
+
+    def move_right(self):
+        self.pending_characters_x += 1
+
+    def move_down_microstep(self):
+        self.pending_microsteps_y += 1
+
+    def move_up_microstep(self):
+        self.pending_microsteps_y -= 1
+
+    def move_right_microsteps(self, num_steps=1):
+        self.pending_microsteps_x += num_steps
+
+    def move_left_microsteps(self, num_steps=1):
+        self.pending_microsteps_x -= num_steps
+
+    def crlf(self):
+        # carriage return makes any horizontal movement before it pointless
+        self.pending_characters_x = 0
+        self.pending_microsteps_x = 0
+        self._send_pending_movement()
+        self.erika.crlf()
+
+    # everything else: send pending movement first, then pass through
+
+    def alarm(self, duration):
+        self._send_pending_movement()
+        self.erika.alarm(duration)
+
+    def read(self):
+        self._send_pending_movement()
+        return self.erika.read()
+
+    def print_ascii(self, text, esc_sequences=False):
+        self._send_pending_movement()
+        if esc_sequences:
+            self.erika.print_ascii(text, esc_sequences)
+        else:
+            # not every implementation knows about escape sequences
+            self.erika.print_ascii(text)
+
+    def delete_ascii(self, reversed_text):
+        self._send_pending_movement()
+        self.erika.delete_ascii(reversed_text)
+
+    def print_ascii_reversed(self, reversed_text):
+        self._send_pending_movement()
+        self.erika.print_ascii_reversed(reversed_text)
+
+    def print_pixel(self):
+        self._send_pending_movement()
+        self.erika.print_pixel()
+
+    def delete_pixel(self):
+        self._send_pending_movement()
+        self.erika.delete_pixel()
+
+    def set_keyboard_echo(self, value):
+        self._send_pending_movement()
+        self.erika.set_keyboard_echo(value)
+
+    def demo(self):
+        self._send_pending_movement()
+        self.erika.demo()
+
+    def wait_for_user_if_simulated(self):
+        self._send_pending_movement()
+        self.erika.wait_for_user_if_simulated()
+
+    def flush(self):
+        self._send_pending_movement()
+        self.erika.flush()
+
+    def _send_pending_movement(self):
+        if isinstance(self.erika, Erika):
+            self._send_horizontal_bytes(
+                self.pending_characters_x * MICROSTEPS_PER_CHARACTER_WIDTH + self.pending_microsteps_x)
+            self._send_vertical_bytes(
+                self.pending_characters_y * MICROSTEPS_PER_CHARACTER_HEIGHT + self.pending_microsteps_y)
+        else:
+            self._send_pending_calls()
+
+        self.pending_characters_x = 0
+        self.pending_characters_y = 0
+        self.pending_microsteps_x = 0
+        self.pending_microsteps_y = 0
+
+    def _send_horizontal_bytes(self, microsteps):
+        if microsteps == 0:
+            return
+        distance = abs(microsteps)
+        half_steps, remainder = divmod(distance, _HALF_STEP_WIDTH)
+        max_microsteps = _MAX_MICROSTEPS_RIGHT if microsteps > 0 else _MAX_MICROSTEPS_LEFT
+        # two bytes per "A5 xx" move
+        microstep_move_bytes = 2 * -(-distance // max_microsteps)
+        if half_steps + (2 if remainder else 0) < microstep_move_bytes:
+            self.erika._move_half_steps(Direction.RIGHT if microsteps > 0 else Direction.LEFT, half_steps)
+            microsteps = remainder if microsteps > 0 else -remainder
+            if microsteps == 0:
+                return
+        if microsteps > 0:
+            self.erika.move_right_microsteps(microsteps)
+        else:
+            self.erika.move_left_microsteps(-microsteps)
+
+    def _send_vertical_bytes(self, microsteps):
+        # one byte per half step, one byte per microstep
+        half_steps, remainder = divmod(abs(microsteps), _HALF_STEP_HEIGHT)
+        if half_steps:
+            self.erika._move_half_steps(Direction.DOWN if microsteps > 0 else Direction.UP, half_steps)
+        for i in range(remainder):
+            if microsteps > 0:
+                self.erika.move_down_microstep()
+            else:
+                self.erika.move_up_microstep()
+
+    def _send_pending_calls(self):
+        if self.pending_characters_x > 0:
+            for i in range(self.pending_characters_x):
+                self.erika.move_right()
+        elif self.pending_characters_x < 0:
+            for i in range(-self.pending_characters_x):
+                self.erika.move_left()
+
+        if self.pending_characters_y > 0:
+            for i in range(self.pending_characters_y):
+                self.erika.move_down()
+        elif self.pending_characters_y < 0:
+            for i in range(-self.pending_characters_y):
+                self.erika.move_up()
+
+        if self.pending_microsteps_x > 0:
+            self.erika.move_right_microsteps(self.pending_microsteps_x)
+        elif self.pending_microsteps_x < 0:
+            self.erika.move_left_microsteps(-self.pending_microsteps_x)
+
+        if self.pending_microsteps_y > 0:
+            for i in range(self.pending_microsteps_y):
+                self.erika.move_down_microstep()
+        elif self.pending_microsteps_y < 0:
+            for i in range(-self.pending_microsteps_y):
+                self.erika.move_up_microstep()
@@ -0,0 +1,226 @@
+"""
+Plan the order in which to visit the positions to print - as short as possible (travelling salesman problem).
+
+Travel is measured as weighted Manhattan distance: carriage (horizontal) and paper feed (vertical) move at different
+speeds. After printing, the print head ends up one step to the right of the printed position - this is taken into
+account, so runs of positions next to each other are visited left to right, without any move in between.
+
+The order is built with a nearest neighbour heuristic, then improved with 2-opt moves. Both use a spatial index that
+keeps the positions sorted by line and column, so looking for nearby positions never scans all of them. The
+neighbours considered for 2-opt moves are looked up for all positions at once, with NumPy - only positions without
+enough neighbours close by fall back to the spatial index.
+"""
+import bisect
+
+import numpy as np
+
+# lines above and below searched at once when looking for the neighbours of all points, see _neighbour_lists
+_NEIGHBOUR_SEARCH_LINES = 2
+# number of points looked up at once - bounds the memory needed
+_NEIGHBOUR_SEARCH_CHUNK_SIZE = 16384
+
+
+class _LineIndex:
+
+    def __init__(self, points):
+        """
+        Spatial index for points on a grid: for each line (y), the sorted columns (x) of all points on that line.
+
+        :param points: list of (x, y) tuples
+        """
+        self.columns_by_line = {}
+        for x, y in points:
+            self.columns_by_line.setdefault(y, []).append(x)
+        for columns in self.columns_by_line.values():
+            columns.sort()
+        self.min_y = min(self.columns_by_line) if self.columns_by_line else 0
+        self.max_y = max(self.columns_by_line) if self.columns_by_line else 0
+
+    def remove(self, x, y):
+        columns = self.columns_by_line[y]
+        del columns[bisect.bisect_left(columns, x)]
+
+    def nearest(self, x, y, weight_x, weight_y, count=1, exclude=None):
+        """
+        :return: list of (cost, x, y) for up to count points closest to (x, y), cheapest first
+        """
+        found = []
+        for delta_y in range(0, max(y - self.min_y, self.max_y - y) + 1):
+            vertical_cost = weight_y * delta_y
+            if len(found) >= count and vertical_cost > found[-1][0]:
+                break
+            lines = (y,) if delta_y == 0 else (y - delta_y, y + delta_y)
+            for line in lines:
+                columns = self.columns_by_line.get(line)
+                if not columns:
+                    continue
+                # walk outward from the closest column, in both directions
+                right = bisect.bisect_left(columns, x)
+                left = right - 1
+                while left >= 0 or right < len(columns):
+                    if right < len(columns) and (left < 0 or columns[right] - x <= x - columns[left]):
+                        column = columns[right]
+                        right += 1
+                    else:
+                        column = columns[left]
+                        left -= 1
+                    cost = vertical_cost + weight_x * abs(column - x)
+                    if len(found) >= count and cost > found[-1][0]:
+                        break
+                    if exclude is not None and (column, line) == exclude:
+                        continue
+                    bisect.insort(found, (cost, column, line))
+                    del found[count:]
+        return found
+
+
+def plan_shortest_path(points, weight_x=1.0, weight_y=1.0, start=(0, 0), neighbour_count=8, two_opt_passes=2,
+                       max_segment_length=1000):
+    """
+    :param points: list of (x, y) tuples - the positions to visit
+    :param weight_x: cost of moving one step horizontally
+    :param weight_y: cost of moving one step vertically
+    :param start: position of the print head before visiting the first point
+    :param neighbour_count: number of nearby points considered for each 2-opt move
+    :param two_opt_passes: maximum number of 2-opt passes over the whole path - 0 to skip the improvement
+    :param max_segment_length: 2-opt moves reversing more points than this are not considered
+    :return: the points, in the order to visit them
+    """
+    path = _nearest_neighbour_path(points, weight_x, weight_y, start)
+    if two_opt_passes > 0 and len(path) > 2:
+        _improve_by_two_opt(path, weight_x, weight_y, neighbour_count, two_opt_passes, max_segment_length)
+    return path
+
+
+def path_cost(path, weight_x=1.0, weight_y=1.0, start=(0, 0)):
+    """:return: the travel cost for visiting the given points in the given order, printing at each of them"""
+    cost = 0
+    head_x, head_y = start
+    for x, y in path:
+        cost += weight_x * abs(x - head_x) + weight_y * abs(y - head_y)
+        head_x, head_y = x + 1, y
+    return cost
+
+
+def _nearest_neighbour_path(points, weight_x, weight_y, start):
+    index = _LineIndex(points)
+    path = []
+    head_x, head_y = start
+    for i in range(len(points)):
+        cost, x, y = index.nearest(head_x, head_y, weight_x, weight_y)[0]
+        index.remove(x, y)
+        path.append((x, y))
+        head_x, head_y = x + 1, y
+    return path
+
+
+def _neighbour_lists(points, weight_x, weight_y, count):
+    """
+    :return: for each point, the indices of the count other points cheapest to travel to after printing at it,
+    cheapest first - same as _LineIndex.nearest, except for the order of points that are equally cheap
+    """
+    xs = np.array([x for x, y in points], dtype=np.int64)
+    ys = np.array([y for x, y in points], dtype=np.int64)
+    order = np.lexsort((xs, ys))
+    sorted_xs, sorted_ys = xs[order], ys[order]
+    # one key per point, ordered by line, then column - with room for looking up one column past the last one
+    stride = int(sorted_xs.max() - min(sorted_xs.min(), 0)) + 2
+    keys = sorted_ys * stride + sorted_xs
+
+    neighbours = np.empty((len(points), count), dtype=np.int64)
+    inexact = []
+    exact_up_to = weight_y * (_NEIGHBOUR_SEARCH_LINES + 1)
+    line_offsets = np.arange(-_NEIGHBOUR_SEARCH_LINES, _NEIGHBOUR_SEARCH_LINES + 1)
+    window = np.arange(-count, count)
+    for chunk_start in range(0, len(points), _NEIGHBOUR_SEARCH_CHUNK_SIZE):
+        chunk = order[chunk_start:chunk_start + _NEIGHBOUR_SEARCH_CHUNK_SIZE]
+        head_xs, head_ys = xs[chunk] + 1, ys[chunk]
+        # on each of the lines close by, the count points on either side of the head's column
+        lines = head_ys[:, None] + line_offsets[None, :]
+        positions = np.searchsorted(keys, lines * stride + head_xs[:, None])
+        candidates = (positions[:, :, None] + window[None, None, :]).reshape(len(chunk), -1)
+        lines = np.repeat(lines, len(window), axis=1)
+        valid = (candidates >= 0) & (candidates < len(keys))
+        candidates = np.clip(candidates, 0, len(keys) - 1)
+        candidate_xs, candidate_ys = sorted_xs[candidates], sorted_ys[candidates]
+        valid &= (candidate_ys == lines) & ((candidate_xs != head_xs[:, None] - 1) | (candidate_ys != head_ys[:, None]))
+        costs = np.where(valid, weight_x * np.abs(candidate_xs - head_xs[:, None])
+                         + weight_y * np.abs(candidate_ys - head_ys[:, None]), np.inf)
+
+        # cheapest first - the candidates are ordered by line and column, so are ties
+        ranking = np.argsort(costs, axis=-1, kind='stable')[:, :count]
+        neighbours[chunk] = order[np.take_along_axis(candidates, ranking, axis=-1)]
+        if ranking.shape[1] < count:
+            inexact.extend(chunk.tolist())
+        else:
+            # points further away than the lines searched could be closer than the last one found
+            inexact.extend(chunk[np.take_along_axis(costs, ranking[:, -1:], axis=-1)[:, 0] > exact_up_to].tolist())
+
+    neighbours = neighbours.tolist()
+    if inexact:
+        index = _LineIndex(points)
+        point_indices = {point: i for i, point in enumerate(points)}
+        for i in inexact:
+            x, y = points[i]
+            neighbours[i] = [point_indices[(column, line)] for c, column, line
+                             in index.nearest(x + 1, y, weight_x, weight_y, count, exclude=(x, y))]
+    return neighbours
+
+
+def _improve_by_two_opt(path, weight_x, weight_y, neighbour_count, passes, max_segment_length):
+    # works on the indices of the points - path[k] is the point visited k-th
+    xs = [x for x, y in path]
+    ys = [y for x, y in path]
+    neighbours = _neighbour_lists(path, weight_x, weight_y, neighbour_count)
+    nodes = list(range(len(path)))
+    position = list(range(len(path)))
+    last = len(path) - 1
+
+    def reversal_gain(k):
+        # how much more the edge nodes[k] -> nodes[k + 1] costs when travelled backwards:
+        # travel from just after printing at one point, to the other
+        u, v = nodes[k], nodes[k + 1]
+        return weight_x * (abs(xs[u] - xs[v] - 1) - abs(xs[v] - xs[u] - 1))
+
+    for pass_number in range(passes):
+        # prefix sums of the reversal gains: reversing the edges k to l - 1 changes the cost by
+        # reversed_prefix[l] - reversed_prefix[k]
+        reversed_prefix = [0.0]
+        for k in range(last):
+            reversed_prefix.append(reversed_prefix[-1] + reversal_gain(k))
+
+        improved = False
+        for i in range(0, last - 1):
+            a, b = nodes[i], nodes[i + 1]
+            ax, ay = xs[a], ys[a]
+            bx, by = xs[b], ys[b]
+            cost_ab = weight_x * abs(bx - ax - 1) + weight_y * abs(by - ay)
+            for c in neighbours[a]:
+                j = position[c]
+                if j <= i + 1 or j - i > max_segment_length:
+                    continue
+                # reversing nodes[i + 1:j + 1] replaces the edges a -> b and c -> d with a -> c and b -> d
+                cx, cy = xs[c], ys[c]
+                delta = weight_x * abs(cx - ax - 1) + weight_y * abs(cy - ay) - cost_ab
+                if j < last:
+                    d = nodes[j + 1]
+                    dx, dy = xs[d], ys[d]
+                    delta += (weight_x * (abs(dx - bx - 1) - abs(dx - cx - 1))
+                              + weight_y * (abs(dy - by) - abs(dy - cy)))
+                # the edges within the reversed segment change direction
+                delta += reversed_prefix[j] - reversed_prefix[i + 1]
+                if delta < -1e-9:
+                    nodes[i + 1:j + 1] = nodes[i + 1:j + 1][::-1]
+                    for k in range(i + 1, j + 1):
+                        position[nodes[k]] = k
+                    # only sums from i + 1 on are used in this pass - keep the ones from j + 1 on as they are
+                    for k in range(min(j, last - 1), i, -1):
+                        reversed_prefix[k] = reversed_prefix[k + 1] - reversal_gain(k)
+                    b = nodes[i + 1]
+                    bx, by = xs[b], ys[b]
+                    cost_ab = weight_x * abs(bx - ax - 1) + weight_y * abs(by - ay)
+                    improved = True
+        if not improved:
+            break
+
+    path[:] = [(xs[node], ys[node]) for node in nodes]
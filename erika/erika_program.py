@@ -0,0 +1,362 @@
+"""
+Intermediate representation for Erika jobs:
+
+Instead of sending every call straight to the serial port, a RecordingErika collects them as a compact list of typed
+operations - an ErikaProgram. The program can be optimized (peephole pass), lowered to the raw bytes Erika expects, and
+replayed as often as needed, on as many Erika machines (or test doubles) as needed - without running the rendering
+strategy again.
+"""
+import io
+from enum import Enum
+
+from erika.erika import AbstractErika
+from erika.erika import Erika
+from erika.erika import MICROSTEPS_PER_CHARACTER_HEIGHT
+from erika.erika import MICROSTEPS_PER_CHARACTER_WIDTH
+
+
+class OpCode(Enum):
+    # (PRINT_TEXT, text, None)
+    PRINT_TEXT = 1
+    # (DELETE_TEXT, reversed_text, None)
+    DELETE_TEXT = 2
+    # (PRINT_PIXEL, None, None)
+    PRINT_PIXEL = 3
+    # (DELETE_PIXEL, None, None)
+    DELETE_PIXEL = 4
+    # (MOVE_CHARACTERS, delta_x, delta_y) - positive values: right / down
+    MOVE_CHARACTERS = 5
+    # (MOVE_MICROSTEPS, delta_x, delta_y) - positive values: right / down
+    MOVE_MICROSTEPS = 6
+    # (CRLF, None, None)
+    CRLF = 7
+    # (KEYBOARD_ECHO, enabled, None)
+    KEYBOARD_ECHO = 8
+    # (ALARM, duration, None)
+    ALARM = 9
+    # (PRINT_TEXT_REVERSED, reversed_text, None)
+    PRINT_TEXT_REVERSED = 10
+
+
+MOVE_OP_CODES = (OpCode.MOVE_CHARACTERS, OpCode.MOVE_MICROSTEPS)
+
+
+class ErikaProgram:
+
+    def __init__(self, ops=None):
+        """
+        :param ops: list of (op_code, first_argument, second_argument) tuples, see OpCode
+        """
+        self.ops = list(ops) if ops else []
+        self._lowered = None
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __eq__(self, other):
+        return isinstance(other, ErikaProgram) and self.ops == other.ops
+
+    def append(self, op_code, first_argument=None, second_argument=None):
+        self.ops.append((op_code, first_argument, second_argument))
+        self._lowered = None
+
+    def optimized(self):
+        """
+        Peephole pass:
+        * consecutive moves are merged into at most one move per unit, opposite moves cancel each other out
+        * zero-length moves are dropped
+        * horizontal moves right before a carriage return are dropped
+        * consecutive texts are merged into one
+
+        :return: a new, equivalent ErikaProgram
+        """
+        result = []
+        pending_moves = {op_code: [0, 0] for op_code in MOVE_OP_CODES}
+        for op in self.ops:
+            op_code = op[0]
+            if op_code in MOVE_OP_CODES:
+                pending_moves[op_code][0] += op[1]
+                pending_moves[op_code][1] += op[2]
+                continue
+
+            if op_code == OpCode.CRLF:
+                for pending_move in pending_moves.values():
+                    pending_move[0] = 0
+            self._append_pending_moves(result, pending_moves)
+
+            if op_code == OpCode.PRINT_TEXT:
+                if not op[1]:
+                    continue
+                if result and result[-1][0] == OpCode.PRINT_TEXT:
+                    result[-1] = (OpCode.PRINT_TEXT, result[-1][1] + op[1], None)
+                    continue
+            result.append(op)
+        self._append_pending_moves(result, pending_moves)
+        return ErikaProgram(result)
+
+    @staticmethod
+    def _append_pending_moves(result, pending_moves):
+        for op_code in MOVE_OP_CODES:
+            delta_x, delta_y = pending_moves[op_code]
+            if delta_x or delta_y:
+                result.append((op_code, delta_x, delta_y))
+            pending_moves[op_code] = [0, 0]
+
+    def extent(self):
+        """
+        :return: (width, height) in microsteps - how far right / down from the starting position the program goes
+        """
+        x = y = max_x = max_y = 0
+        for op in self.ops:
+            x, y, widest_x = _position_after(op, x, y)
+            max_x = max(max_x, widest_x)
+            max_y = max(max_y, y)
+        return max_x, max_y
+
+    def to_bytes(self):
+        """
+        Lower the program to the raw bytes Erika expects. The result is cached until the program is changed again.
+        """
+        if self._lowered is None:
+            self._lowered = self._lower()
+        return self._lowered
+
+    def to_bytes_by_line(self):
+        """
+        Like to_bytes, but also tells where printing can be interrupted and continued later on: wherever the print
+        head is back at the left margin (where the program started).
+
+        :return: (bytes, list of offsets in the bytes - at each of them, the print head is at the left margin)
+        """
+        line_ends = []
+        return self._lower(line_ends), line_ends
+
+    def _lower(self, line_ends=None):
+        sink = io.BytesIO()
+        erika = Erika(None, connection=sink)
+
+        # the move back after a pixel gets merged with whatever movement comes next
+        pending_microsteps_x = 0
+        x = y = 0
+        for op in self.ops:
+            pending_microsteps_x = self._lower_op(erika, op, pending_microsteps_x)
+            if line_ends is None:
+                continue
+            x, y, widest_x = _position_after(op, x, y)
+            if x == 0:
+                self._send_horizontal_microsteps(erika, pending_microsteps_x)
+                pending_microsteps_x = 0
+                erika.flush()
+                if sink.tell() > (line_ends[-1] if line_ends else 0):
+                    line_ends.append(sink.tell())
+
+        self._send_horizontal_microsteps(erika, pending_microsteps_x)
+        erika.flush()
+        if line_ends is not None and sink.tell() > (line_ends[-1] if line_ends else 0):
+            line_ends.append(sink.tell())
+        return sink.getvalue()
+
+    def _lower_op(self, erika, op, pending_microsteps_x):
+        """:return: the horizontal microsteps still to move"""
+        op_code, first_argument, second_argument = op
+        if op_code == OpCode.MOVE_MICROSTEPS:
+            self._send_vertical_microsteps(erika, second_argument)
+            return pending_microsteps_x + first_argument
+        if op_code == OpCode.MOVE_CHARACTERS:
+            self._send_character_steps(erika, first_argument, second_argument)
+            return pending_microsteps_x
+        if op_code == OpCode.CRLF:
+            erika.crlf()
+            return 0
+
+        self._send_horizontal_microsteps(erika, pending_microsteps_x)
+        if op_code == OpCode.PRINT_PIXEL:
+            # same as Erika.print_pixel
+            erika.print_ascii(".")
+            return -(MICROSTEPS_PER_CHARACTER_WIDTH - 1)
+        self._replay_op(erika, op_code, first_argument, second_argument)
+        return 0
+
+    @staticmethod
+    def _send_character_steps(erika, delta_x, delta_y):
+        if delta_x > 0:
+            erika._cursor_forward(delta_x)
+        elif delta_x < 0:
+            erika._cursor_back(-delta_x)
+
+        if delta_y > 0:
+            erika._cursor_down(delta_y)
+        elif delta_y < 0:
+            erika._cursor_up(-delta_y)
+
+    @staticmethod
+    def _send_horizontal_microsteps(erika, delta_x):
+        if delta_x > 0:
+            erika.move_right_microsteps(delta_x)
+        elif delta_x < 0:
+            erika.move_left_microsteps(-delta_x)
+
+    @staticmethod
+    def _send_vertical_microsteps(erika, delta_y):
+        for i in range(delta_y):
+            erika.move_down_microstep()
+        for i in range(-delta_y):
+            erika.move_up_microstep()
+
+    def replay(self, erika):
+        """
+        Send the program to the given Erika - as pre-lowered bytes for a real Erika, call by call for anything else
+        (e.g. a test double).
+        """
+        if isinstance(erika, Erika):
+            erika._write_bytes(self.to_bytes())
+            erika.flush()
+            return
+
+        for op_code, first_argument, second_argument in self.ops:
+            self._replay_op(erika, op_code, first_argument, second_argument)
+        erika.flush()
+
+    def _replay_op(self, erika, op_code, first_argument, second_argument):
+        if op_code == OpCode.PRINT_TEXT:
+            erika.print_ascii(first_argument)
+        elif op_code == OpCode.DELETE_TEXT:
+            erika.delete_ascii(first_argument)
+        elif op_code == OpCode.PRINT_TEXT_REVERSED:
+            erika.print_ascii_reversed(first_argument)
+        elif op_code == OpCode.PRINT_PIXEL:
+            erika.print_pixel()
+        elif op_code == OpCode.DELETE_PIXEL:
+            erika.delete_pixel()
+        elif op_code == OpCode.MOVE_CHARACTERS:
+            for i in range(first_argument):
+                erika.move_right()
+            for i in range(-first_argument):
+                erika.move_left()
+            for i in range(second_argument):
+                erika.move_down()
+            for i in range(-second_argument):
+                erika.move_up()
+        elif op_code == OpCode.MOVE_MICROSTEPS:
+            self._send_horizontal_microsteps(erika, first_argument)
+            self._send_vertical_microsteps(erika, second_argument)
+        elif op_code == OpCode.CRLF:
+            erika.crlf()
+        elif op_code == OpCode.KEYBOARD_ECHO:
+            erika.set_keyboard_echo(first_argument)
+        elif op_code == OpCode.ALARM:
+            erika.alarm(first_argument)
+        else:
+            raise Exception("Unknown operation: {}".format(op_code))
+
+
+def _position_after(op, x, y):
+    """:return: (x, y, widest_x) - the position after the given operation, and the rightmost x reached on the way"""
+    op_code, first_argument, second_argument = op
+    widest_x = x
+    if op_code == OpCode.PRINT_TEXT:
+        for line_index, line in enumerate(first_argument.split("\n")):
+            if line_index > 0:
+                x = 0
+                y += MICROSTEPS_PER_CHARACTER_HEIGHT
+            x += len(line) * MICROSTEPS_PER_CHARACTER_WIDTH
+            widest_x = max(widest_x, x)
+    elif op_code == OpCode.DELETE_TEXT or op_code == OpCode.PRINT_TEXT_REVERSED:
+        x -= len(first_argument) * MICROSTEPS_PER_CHARACTER_WIDTH
+    elif op_code == OpCode.PRINT_PIXEL:
+        x += 1
+    elif op_code == OpCode.DELETE_PIXEL:
+        x -= 1
+    elif op_code == OpCode.MOVE_CHARACTERS:
+        x += first_argument * MICROSTEPS_PER_CHARACTER_WIDTH
+        y += second_argument * MICROSTEPS_PER_CHARACTER_HEIGHT
+    elif op_code == OpCode.MOVE_MICROSTEPS:
+        x += first_argument
+        y += second_argument
+    elif op_code == OpCode.CRLF:
+        x = 0
+        y += MICROSTEPS_PER_CHARACTER_HEIGHT
+    return x, y, max(widest_x, x)
+
+
+class RecordingErika(AbstractErika):
+
+    def __init__(self):
+        """Records all calls as an ErikaProgram (see the program attribute) instead of printing anything."""
+        super().__init__()
+        self.program = ErikaProgram()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def alarm(self, duration):
+        self.program.append(OpCode.ALARM, duration)
+
+    def read(self):
+        raise Exception('Reading input is not supported while recording')
+
+    def print_ascii(self, text):
+        self.program.append(OpCode.PRINT_TEXT, text)
+
+    def delete_ascii(self, reversed_text):
+        self.program.append(OpCode.DELETE_TEXT, reversed_text)
+
+    def print_ascii_reversed(self, reversed_text):
+        self.program.append(OpCode.PRINT_TEXT_REVERSED, reversed_text)
+
+    def move_up(self):
+        self.program.append(OpCode.MOVE_CHARACTERS, 0, -1)
+
+    def move_down(self):
+        self.program.append(OpCode.MOVE_CHARACTERS, 0, 1)
+
+    def move_left(self):
+        self.program.append(OpCode.MOVE_CHARACTERS, -1, 0)
+
+    def move_right(self):
+        self.program.append(OpCode.MOVE_CHARACTERS, 1, 0)
+
+    def move_down_microstep(self):
+        self.program.append(OpCode.MOVE_MICROSTEPS, 0, 1)
+
+    def move_up_microstep(self):
+        self.program.append(OpCode.MOVE_MICROSTEPS, 0, -1)
+
+    def move_right_microsteps(self, num_steps=1):
+        self.program.append(OpCode.MOVE_MICROSTEPS, num_steps, 0)
+
+    def move_left_microsteps(self, num_steps=1):
+        self.program.append(OpCode.MOVE_MICROSTEPS, -num_steps, 0)
+
+    def crlf(self):
+        self.program.append(OpCode.CRLF)
+
+    def set_keyboard_echo(self, value):
+        self.program.append(OpCode.KEYBOARD_ECHO, value)
+
+    def demo(self):
+        raise Exception('The demo is not supported while recording')
+
+    def print_pixel(self):
+        self.program.append(OpCode.PRINT_PIXEL)
+
+    def delete_pixel(self):
+        self.program.append(OpCode.DELETE_PIXEL)
+
+    def wait_for_user_if_simulated(self):
+        pass
+
+    def _cursor_up(self, n=1):
+        self.program.append(OpCode.MOVE_CHARACTERS, 0, -n)
+
+    def _cursor_down(self, n=1):
+        self.program.append(OpCode.MOVE_CHARACTERS, 0, n)
+
+    def _cursor_back(self, n=1):
+        self.program.append(OpCode.MOVE_CHARACTERS, -n, 0)
+
+    def _cursor_forward(self, n=1):
+        self.program.append(OpCode.MOVE_CHARACTERS, n, 0)
@@ -0,0 +1,241 @@
+"""
+Headless, in-memory simulation of Erika - no curses, no terminal needed.
+
+The simulator keeps track of the position at microstep resolution and supports both character-based and
+microstep-based commands. Only printed positions are stored, so even a full page is cheap to simulate.
+Displaying the progress on screen is optional: attach a CursesErikaObserver (or any other observer).
+"""
+#     x
+#     ===>
+# y ||
+#   ||
+#   \/
+import time
+
+from erika.erika import AbstractErika
+from erika.erika import ERIKA_PAGE_HEIGHT_MICROSTEPS
+from erika.erika import ERIKA_PAGE_WIDTH_MICROSTEPS_SOFT_LIMIT_AT_12_CHARS_PER_INCH
+from erika.erika import MICROSTEPS_PER_CHARACTER_HEIGHT
+from erika.erika import MICROSTEPS_PER_CHARACTER_WIDTH
+from erika.erika import print_demo_rectangle
+
+PIXEL_CHARACTER = "."
+
+
+class OutOfPageException(Exception):
+    pass
+
+
+class ErikaSimulator(AbstractErika):
+
+    def __init__(self,
+                 width=ERIKA_PAGE_WIDTH_MICROSTEPS_SOFT_LIMIT_AT_12_CHARS_PER_INCH,
+                 height=ERIKA_PAGE_HEIGHT_MICROSTEPS,
+                 exception_if_overprinted=False,
+                 observers=(),
+                 input_keys=""):
+        """
+        :param width: page width [microsteps]
+        :param height: page height [microsteps]
+        :param exception_if_overprinted: if True, printing twice at the same position raises an exception
+        :param observers: objects notified about every change, see CursesErikaObserver
+        :param input_keys: keys to return on read(), one after another
+        """
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.exception_if_overprinted = exception_if_overprinted
+        self.observers = list(observers)
+        self.input_keys = list(input_keys)
+
+        # (x, y) -> printed character, positions in microsteps
+        self.canvas = {}
+        self.x = 0
+        self.y = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        for observer in self.observers:
+            observer.close()
+
+    # movement
+
+    def move_up(self):
+        self._cursor_up()
+
+    def move_down(self):
+        self._cursor_down()
+
+    def move_left(self):
+        self._cursor_back()
+
+    def move_right(self):
+        self._cursor_forward()
+
+    def move_down_microstep(self):
+        self.y += 1
+
+    def move_up_microstep(self):
+        self.y -= 1
+
+    def move_right_microsteps(self, num_steps=1):
+        self.x += num_steps
+
+    def move_left_microsteps(self, num_steps=1):
+        self.x -= num_steps
+
+    def crlf(self):
+        self.x = 0
+        self.y += MICROSTEPS_PER_CHARACTER_HEIGHT
+
+    def _cursor_up(self, n=1):
+        self.y -= n * MICROSTEPS_PER_CHARACTER_HEIGHT
+
+    def _cursor_down(self, n=1):
+        self.y += n * MICROSTEPS_PER_CHARACTER_HEIGHT
+
+    def _cursor_back(self, n=1):
+        self.x -= n * MICROSTEPS_PER_CHARACTER_WIDTH
+
+    def _cursor_forward(self, n=1):
+        self.x += n * MICROSTEPS_PER_CHARACTER_WIDTH
+
+    # printing
+
+    def print_ascii(self, text):
+        for c in text:
+            if c == "\n":
+                self.crlf()
+                continue
+            if c != " ":
+                self._put(c)
+            self.x += MICROSTEPS_PER_CHARACTER_WIDTH
+
+    def delete_ascii(self, reversed_text):
+        for c in reversed_text:
+            self.x -= MICROSTEPS_PER_CHARACTER_WIDTH
+            self._remove(c)
+
+    def print_ascii_reversed(self, reversed_text):
+        for c in reversed_text:
+            self.x -= MICROSTEPS_PER_CHARACTER_WIDTH
+            if c != " ":
+                self._put(c)
+
+    def print_pixel(self):
+        self._put(PIXEL_CHARACTER)
+        self.x += 1
+
+    def delete_pixel(self):
+        self.x -= 1
+        self._remove(PIXEL_CHARACTER)
+
+    def _put(self, c):
+        position = (self.x, self.y)
+        if not (0 <= self.x < self.width and 0 <= self.y < self.height):
+            raise OutOfPageException("Position ({}, {}) is outside of the page ({}, {})"
+                                     .format(self.x, self.y, self.width, self.height))
+        if self.exception_if_overprinted and position in self.canvas:
+            raise Exception("Not supposed to print twice: '{}' at ({}, {}).".format(c, self.x, self.y))
+        self.canvas[position] = c
+        for observer in self.observers:
+            observer.on_change(self, self.x, self.y, c)
+
+    def _remove(self, c):
+        position = (self.x, self.y)
+        if self.canvas.get(position) != c:
+            raise Exception("Unexpected letter at current position: '{}' at ({}, {}).".format(c, self.x, self.y))
+        del self.canvas[position]
+        for observer in self.observers:
+            observer.on_change(self, self.x, self.y, " ")
+
+    # everything else
+
+    def alarm(self, duration):
+        pass
+
+    def read(self):
+        if not self.input_keys:
+            raise Exception('No more input keys to simulate')
+        return self.input_keys.pop(0)
+
+    def set_keyboard_echo(self, value):
+        pass
+
+    def demo(self):
+        # same sequence as the real thing
+        self.crlf()
+        print_demo_rectangle(self)
+        self._cursor_down(5)
+
+    def wait_for_user_if_simulated(self):
+        pass
+
+    def flush(self):
+        for observer in self.observers:
+            observer.refresh()
+
+# evaluation - module level functions, as all public methods of an Erika have to be part of AbstractErika
+
+def lines_at_character_resolution(simulator):
+    """:return: the page of the given ErikaSimulator as text lines, one character per character cell"""
+    columns = simulator.width // MICROSTEPS_PER_CHARACTER_WIDTH
+    rows = simulator.height // MICROSTEPS_PER_CHARACTER_HEIGHT
+    lines = [[" "] * columns for row in range(rows)]
+    for (x, y), c in simulator.canvas.items():
+        lines[y // MICROSTEPS_PER_CHARACTER_HEIGHT][x // MICROSTEPS_PER_CHARACTER_WIDTH] = c
+    return ["".join(line) for line in lines]
+
+
+def lines_at_microstep_resolution(simulator):
+    """:return: the page of the given ErikaSimulator as text lines, one character per microstep - "X" marks printed
+    positions"""
+    lines = [[" "] * simulator.width for row in range(simulator.height)]
+    for (x, y) in simulator.canvas:
+        lines[y][x] = "X"
+    return ["".join(line) for line in lines]
+
+
+class CursesErikaObserver:
+
+    def __init__(self, microsteps_per_column=MICROSTEPS_PER_CHARACTER_WIDTH,
+                 microsteps_per_row=MICROSTEPS_PER_CHARACTER_HEIGHT, max_frames_per_second=25):
+        """
+        Display the progress of an ErikaSimulator in the terminal.
+
+        :param microsteps_per_column: horizontal scale - use 1 for microstep-based output
+        :param microsteps_per_row: vertical scale - use 1 for microstep-based output
+        :param max_frames_per_second: the screen is redrawn at most this often, no matter how fast the simulation is
+        """
+        # only needed when actually displaying something
+        import curses
+        self.curses = curses
+
+        # if your program fails here, add environment variable TERM=linux
+        self.stdscr = curses.initscr()
+        self.microsteps_per_column = microsteps_per_column
+        self.microsteps_per_row = microsteps_per_row
+        self.min_seconds_between_frames = 1 / max_frames_per_second
+        self.last_refresh = 0
+
+    def on_change(self, simulator, x, y, c):
+        try:
+            self.stdscr.addstr(y // self.microsteps_per_row, x // self.microsteps_per_column, c)
+        except self.curses.error:
+            # outside of the terminal window - nothing to show
+            pass
+
+        now = time.monotonic()
+        if now - self.last_refresh >= self.min_seconds_between_frames:
+            self.stdscr.refresh()
+            self.last_refresh = now
+
+    def refresh(self):
+        self.stdscr.refresh()
+        self.last_refresh = time.monotonic()
+
+    def close(self):
+        self.refresh()
+        self.curses.endwin()
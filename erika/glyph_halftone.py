@@ -0,0 +1,143 @@
+"""
+Render images as ASCII art: each character cell (MICROSTEPS_PER_CHARACTER_WIDTH x MICROSTEPS_PER_CHARACTER_HEIGHT
+microsteps of the image) is replaced by the printable character that matches it best - one typed character instead of
+up to 200 single dots.
+
+Characters are matched by their coverage profile: how much of each zone of the character cell is inked. The profiles
+are taken from Pillow's default font (Erika's daisy wheel is not available as a font, but the shapes are close enough),
+computed once per process. Matching compares all cells against all characters at once.
+"""
+import functools
+import math
+
+import numpy as np
+from PIL import Image
+from PIL import ImageDraw
+from PIL import ImageFont
+
+from erika.erica_encoder_decoder import DDR_ASCII
+from erika.erika import MICROSTEPS_PER_CHARACTER_HEIGHT
+from erika.erika import MICROSTEPS_PER_CHARACTER_WIDTH
+from erika.image_converter import LUMINANCE_AVERAGE
+from erika.image_converter import load_grayscale_values
+
+# each character cell is split into ZONES_X x ZONES_Y zones - more zones match shapes better, fewer match shades better
+ZONES_X = 2
+ZONES_Y = 4
+
+# font size for computing the coverage profiles - only used if the installed Pillow supports scaling the default font
+_PROFILE_FONT_SIZE = 40
+# from the private use area - no font has a glyph for it
+_CHARACTER_MISSING_IN_ANY_FONT = "\ue000"
+
+
+def printable_characters():
+    """:return: all single characters Erika can type, space included"""
+    return sorted(character for character in DDR_ASCII().ascii_2_ddr
+                  if len(character) == 1 and character.isprintable())
+
+
+@functools.lru_cache(maxsize=None)
+def glyph_coverage_profiles(characters=None):
+    """
+    :param characters: string of the characters to compute profiles for - default: all printable_characters
+    :return: (characters, profiles) - profiles is an array of shape (len(characters), ZONES_Y * ZONES_X): the share of
+    each zone covered by ink, scaled so that the darkest character has an average coverage of 1
+    """
+    characters = characters or "".join(printable_characters())
+    try:
+        font = ImageFont.load_default(size=_PROFILE_FONT_SIZE)
+    except TypeError:
+        # older Pillow: fixed-size bitmap font
+        font = ImageFont.load_default()
+    # older Pillow's bitmap font can only draw Latin-1 characters - the others are skipped, just like missing ones
+    characters = "".join(character for character in characters if _can_draw(font, character))
+    placeholders = "".join(character for character in _CHARACTER_MISSING_IN_ANY_FONT if _can_draw(font, character))
+
+    # Erika has a fixed pitch: characters are centered in their cell - the same cell for all of them
+    advance = max(_text_length(font, character) for character in characters)
+
+    def centered_box(character):
+        offset = (advance - _text_length(font, character)) / 2
+        box = _text_bbox(font, character)
+        return offset, box[0] + offset, box[1], box[2] + offset, box[3]
+
+    boxes = [centered_box(character) for character in characters + placeholders
+             if not character.isspace()]
+    left, top = math.floor(min(box[1] for box in boxes)), min(box[2] for box in boxes)
+    right, bottom = math.ceil(max(box[3] for box in boxes)), max(box[4] for box in boxes)
+
+    def profile(character):
+        glyph = Image.new('L', (right - left, bottom - top), 0)
+        ImageDraw.Draw(glyph).text((centered_box(character)[0] - left, -top), character, fill=255, font=font)
+        zones = glyph.resize((ZONES_X, ZONES_Y), Image.BOX)
+        return np.asarray(zones, dtype=np.float64).flatten() / 255
+
+    # characters the font doesn't have are all drawn as the same placeholder (or not at all) - no idea what they look
+    # like, so skip them
+    missing = [profile(character) for character in placeholders]
+    profiles = {character: profile(character) for character in characters}
+    characters = "".join(character for character in characters
+                         if character.isspace() or profiles[character].any()
+                         and not any(np.array_equal(profiles[character], placeholder) for placeholder in missing))
+    profiles = np.array([profiles[character] for character in characters])
+    return characters, profiles / profiles.mean(axis=1).max()
+
+
+def _can_draw(font, character):
+    try:
+        _text_length(font, character)
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def _text_length(font, text):
+    """:return: advance width of the given text - getlength needs Pillow 8.0"""
+    if hasattr(font, 'getlength'):
+        return font.getlength(text)
+    return font.getsize(text)[0]
+
+
+def _text_bbox(font, text):
+    """:return: (left, top, right, bottom) of the ink of the given text, relative to where it is drawn - getbbox needs
+    Pillow 9.2"""
+    if hasattr(font, 'getbbox'):
+        return font.getbbox(text)
+    # older Pillow only has the default bitmap font - its mask starts right where the text is drawn
+    return font.getmask(text).getbbox() or (0, 0, 0, 0)
+
+
+def image_to_glyph_lines(image_path, luminance=LUMINANCE_AVERAGE, width=None):
+    """
+    :param image_path: path to the image to convert
+    :param luminance: see WrappedImage
+    :param width: resize the image to this width [microsteps] first - see WrappedImage
+    :return: the image as ASCII art - list of text lines, without trailing spaces
+    """
+    values = load_grayscale_values(image_path, luminance, width)
+    return glyph_lines(1 - values / 255)
+
+
+def glyph_lines(darkness):
+    """
+    :param darkness: 2D array indexed [y, x], one value per microstep between 0 (white) and 1 (black)
+    :return: list of text lines, one character per character cell - cells sticking out at the right or bottom are cut
+    off
+    """
+    characters, profiles = glyph_coverage_profiles()
+    rows = darkness.shape[0] // MICROSTEPS_PER_CHARACTER_HEIGHT
+    columns = darkness.shape[1] // MICROSTEPS_PER_CHARACTER_WIDTH
+    if rows == 0 or columns == 0:
+        return []
+
+    # average darkness per zone: shape (rows, columns, ZONES_Y * ZONES_X), zones in the same order as the profiles
+    cells = darkness[:rows * MICROSTEPS_PER_CHARACTER_HEIGHT, :columns * MICROSTEPS_PER_CHARACTER_WIDTH]
+    zones = cells.reshape(rows, ZONES_Y, MICROSTEPS_PER_CHARACTER_HEIGHT // ZONES_Y,
+                          columns, ZONES_X, MICROSTEPS_PER_CHARACTER_WIDTH // ZONES_X).mean(axis=(2, 5))
+    zones = zones.transpose(0, 2, 1, 3).reshape(rows * columns, ZONES_Y * ZONES_X)
+
+    # squared distance of every cell to every profile, without building a (cells x characters x zones) array
+    distances = (profiles * profiles).sum(axis=1) - 2 * zones @ profiles.T
+    best_matches = np.asarray(list(characters))[distances.argmin(axis=1)].reshape(rows, columns)
+    return ["".join(line).rstrip() for line in best_matches]
@@ -1,32 +1,294 @@
+import hashlib
+import json
+import os
 import sys
+import tempfile
+import warnings
 
+import numpy as np
 from PIL import Image
 
+# the options are part of this module's interface, too
+from erika.image_options import DEFAULT_CACHE_DIRECTORY
+from erika.image_options import DITHERING_ATKINSON
+from erika.image_options import DITHERING_BAYER
+from erika.image_options import DITHERING_FLOYD_STEINBERG
+from erika.image_options import DITHERING_METHODS
+from erika.image_options import DITHERING_THRESHOLD
+from erika.image_options import PAGE_WIDTH_MICROSTEPS
+
+# luminance formulas: weights for the red, green and blue channel - the luminance is the weighted, rounded down average
+LUMINANCE_AVERAGE = "average"
+LUMINANCE_ITU_R_601 = "itu-r-601"
+LUMINANCE_ITU_R_709 = "itu-r-709"
+LUMINANCE_FORMULAS = {
+    LUMINANCE_AVERAGE: (1, 1, 1),
+    # same as Pillow uses for converting to grayscale
+    LUMINANCE_ITU_R_601: (299, 587, 114),
+    LUMINANCE_ITU_R_709: (2126, 7152, 722),
+}
+
+_GRAYSCALE_MODES = ('1', 'L', 'LA', 'La')
+_SIXTEEN_BIT_MODES = ('I;16', 'I;16L', 'I;16B', 'I;16N')
+
+# raw modes with a known size - needed for uncompressed images that don't store the size of their rows
+_RAW_MODE_BITS_PER_PIXEL = {'1': 1, 'L': 8, 'P': 8, 'LA': 16, 'RGB': 24, 'RGBA': 32, 'RGBX': 32, 'CMYK': 32,
+                            'I;16': 16, 'I;16B': 16}
+
+DEFAULT_STRIP_HEIGHT = 256
+
+# error diffusion: (delta_x, delta_y, share of the error) for each neighbour the error of a pixel is passed on to
+_ERROR_DIFFUSION_KERNELS = {
+    DITHERING_FLOYD_STEINBERG: ((1, 0, 7 / 16), (-1, 1, 3 / 16), (0, 1, 5 / 16), (1, 1, 1 / 16)),
+    # only passes on 3/4 of the error - keeps more contrast
+    DITHERING_ATKINSON: ((1, 0, 1 / 8), (2, 0, 1 / 8), (-1, 1, 1 / 8), (0, 1, 1 / 8), (1, 1, 1 / 8), (0, 2, 1 / 8)),
+}
+BAYER_MATRIX_SIZE = 8
+
+# bump whenever the conversion changes, so outdated cache entries are not used anymore
+_CACHE_VERSION = 1
+_HASH_CHUNK_SIZE = 1024 * 1024
+
 
 class NotAnImageException(Exception):
     pass
 
 
-class WrappedImage:
+def _open_image(image_path):
+    try:
+        return Image.open(image_path)
+    except FileNotFoundError:
+        raise FileNotFoundError("Exception when opening the file {} - file not found".format(image_path)) \
+            .with_traceback(sys.exc_info()[2])
+    except OSError:
+        # OSError - OS-specific! Results may vary among different operating systems
+        raise NotAnImageException("Exception when opening the file {} - maybe not an image?".format(image_path)) \
+            .with_traceback(sys.exc_info()[2])
+
+
+def _grayscale_values(image, luminance_weights):
+    """:return: 2D array of grayscale-equivalent values between 0 and 255 (uint8), indexed [y, x]"""
+    mode = image.mode
+    if mode in _GRAYSCALE_MODES:
+        # alpha channel is ignored, just like for RGBA
+        return np.asarray(image.getchannel(0).convert('L'), dtype=np.uint8)
+    if mode in _SIXTEEN_BIT_MODES:
+        return (np.asarray(image) >> 8).astype(np.uint8)
+    if mode in ('I', 'F'):
+        # same as Pillow's conversion to grayscale: values out of range are clipped
+        return np.clip(np.asarray(image), 0, 255).astype(np.uint8)
+
+    if mode not in ('RGB', 'RGBA', 'RGBX'):
+        # palette images (with transparency), CMYK, YCbCr, ...
+        image = image.convert('RGBA' if mode in ('P', 'PA') else 'RGB')
+    rgb = np.asarray(image)
+    weights = [int(weight) for weight in luminance_weights]
+    # the smallest type the weighted sum fits in - uint16 for the plain average
+    total_type = np.uint16 if 255 * sum(weights) <= np.iinfo(np.uint16).max else np.uint32
+    total = np.zeros(rgb.shape[:2], dtype=total_type)
+    for channel, weight in enumerate(weights):
+        total += rgb[:, :, channel].astype(total_type) * total_type(weight)
+    return (total // total_type(sum(weights))).astype(np.uint8)
+
+
+def _threshold(image, threshold, luminance):
+    """:return: boolean 2D array, indexed [y, x] - True if the pixel is set"""
+    return _grayscale_values(image, LUMINANCE_FORMULAS.get(luminance, luminance)) <= threshold
+
+
+def load_grayscale_values(image_path, luminance=LUMINANCE_AVERAGE, width=None):
+    """
+    :param luminance: see WrappedImage
+    :param width: see WrappedImage
+    :return: 2D array of grayscale-equivalent values between 0 (black) and 255 (white), indexed [y, x]
+    """
+    with _open_image(image_path) as image:
+        values = _grayscale_values(image, LUMINANCE_FORMULAS.get(luminance, luminance))
+    if width is not None and width != values.shape[1]:
+        values = _resize(values, width)
+    return values
+
+
+def _convert(image, threshold, luminance, dithering, width):
+    """:return: boolean 2D array, indexed [y, x] - True if the pixel is set"""
+    if dithering not in DITHERING_METHODS:
+        raise ValueError("Unknown dithering method {} - use one of {}".format(dithering, ", ".join(DITHERING_METHODS)))
+    if dithering == DITHERING_THRESHOLD and width is None:
+        return _threshold(image, threshold, luminance)
+
+    values = _grayscale_values(image, LUMINANCE_FORMULAS.get(luminance, luminance))
+    if width is not None and width != values.shape[1]:
+        values = _resize(values, width)
+    if dithering == DITHERING_THRESHOLD:
+        return values <= threshold
+    if dithering == DITHERING_BAYER:
+        return _ordered_dithering(values, threshold)
+    return _error_diffusion(values, threshold, _ERROR_DIFFUSION_KERNELS[dithering])
+
+
+def _resize(values, width):
+    """:return: the grayscale values scaled to the given width - the height is scaled alike, to keep the aspect ratio"""
+    height = max(1, round(values.shape[0] * width / values.shape[1]))
+    image = Image.fromarray(values.astype(np.uint8))
+    return np.asarray(image.resize((width, height), Image.LANCZOS), dtype=np.uint8)
+
+
+def _ordered_dithering(values, threshold):
+    """
+    Ordered dithering: each pixel is compared to its own threshold, taken from a Bayer matrix tiled across the image.
+    The given threshold shifts all of them - 128 spreads them evenly across the range of grayscale values.
+    """
+    matrix = _bayer_matrix(BAYER_MATRIX_SIZE)
+    thresholds = (matrix + 0.5) * (256 / matrix.size) + (threshold - 128)
+    height, width = values.shape
+    repeats = (-(-height // BAYER_MATRIX_SIZE), -(-width // BAYER_MATRIX_SIZE))
+    return values < np.tile(thresholds, repeats)[:height, :width]
 
-    def __init__(self, image_path, threshold=128):
+
+def _bayer_matrix(size):
+    """:return: size x size matrix containing each of the values 0 to size * size - 1 once, size is a power of 2"""
+    matrix = np.zeros((1, 1), dtype=np.int64)
+    while matrix.shape[0] < size:
+        matrix = np.block([[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]])
+    return matrix
+
+
+def _error_diffusion(values, threshold, kernel):
+    """
+    Error diffusion: pixels are set or not one after another, the difference to the actual grayscale value is passed on
+    to the neighbours that come later.
+
+    Each pixel only depends on pixels to its left, and on pixels of the rows above up to one pixel to its right (two
+    for the row right above). So all pixels with the same x + 2 * y are independent of each other - they are processed
+    together, one diagonal "wavefront" at a time. The result is the same as processing pixel by pixel.
+    """
+    height, width = values.shape
+    margin = max(max(abs(delta_x), delta_y) for delta_x, delta_y, share in kernel)
+    # pixels and their accumulated error - with a margin for errors passed on beyond the edges, which are dropped
+    errors = np.zeros((height + margin, width + 2 * margin))
+    errors[:height, margin:margin + width] = values
+    bitmap = np.zeros((height, width), dtype=bool)
+
+    for wavefront in range(width + 2 * (height - 1)):
+        ys = np.arange(max(0, (wavefront - width + 2) // 2), min(height - 1, wavefront // 2) + 1)
+        xs = wavefront - 2 * ys
+        columns = xs + margin
+        pixels = errors[ys, columns]
+        is_set = pixels <= threshold
+        bitmap[ys, xs] = is_set
+        error = pixels - np.where(is_set, 0, 255)
+        for delta_x, delta_y, share in kernel:
+            errors[ys + delta_y, columns + delta_x] += error * share
+    return bitmap
+
+
+def _file_hash(file_path):
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(_HASH_CHUNK_SIZE), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def _cache_path(cache_directory, image_path, parameters):
+    key = hashlib.sha256(json.dumps([_CACHE_VERSION, _file_hash(image_path), parameters]).encode('utf-8'))
+    return os.path.join(os.path.expanduser(cache_directory), key.hexdigest() + '.npz')
+
+
+def _load_cached_bitmap(cache_path):
+    """:return: the bitmap stored at the given path - None if there is none (or it can't be read)"""
+    try:
+        with np.load(cache_path) as cached:
+            height, width = cached['shape']
+            return np.unpackbits(cached['bits'], count=height * width).reshape(height, width).astype(bool)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _store_cached_bitmap(cache_path, bitmap):
+    """Store the bitmap at the given path - caching is best effort, so failing to write is not an error."""
+    directory = os.path.dirname(cache_path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # write to a temporary file first - concurrent readers never see a half-written file
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    except OSError:
+        return
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            np.savez_compressed(file, bits=np.packbits(bitmap), shape=np.array(bitmap.shape))
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        os.remove(temporary_path)
+
+
+class WrappedBitmap:
+
+    def __init__(self, bitmap):
+        """
+        :param bitmap: boolean 2D NumPy array, indexed [y, x] - True if the pixel is set
+        """
+        self.bitmap = bitmap
+
+    def is_pixel_set(self, x, y):
+        # item gives a plain Python bool - and is quicker than indexing for single pixels
+        return self.bitmap.item(y, x)
+
+    def row(self, y):
+        """:return: list of booleans - True for every pixel that is set in the given row"""
+        return self.bitmap[y].tolist()
+
+    def rows(self):
+        """:return: generator for the rows, see row - only one row at a time is converted to a list"""
+        return (self.row(y) for y in range(self.height()))
+
+    def runs(self, y):
+        """
+        :return: list of (start_x, end_x) tuples, one for each run of set pixels in the given row - end_x is exclusive
+        """
+        padded_row = np.concatenate(([False], self.bitmap[y], [False]))
+        edges = np.flatnonzero(padded_row[1:] != padded_row[:-1]).tolist()
+        return list(zip(edges[0::2], edges[1::2]))
+
+    def width(self):
+        return self.bitmap.shape[1]
+
+    def height(self):
+        return self.bitmap.shape[0]
+
+
+class WrappedImage(WrappedBitmap):
+
+    def __init__(self, image_path, threshold=128, luminance=LUMINANCE_AVERAGE, dithering=DITHERING_THRESHOLD,
+                 width=None, cache_directory=None):
         """
         :param image_path: path to image that should be opened
         :param threshold: threshold value - pixel is considered "set" if there is a grayscale-equivalent value
-        at this coordinate that is greater or equal to the given threshold
+        at this coordinate that is less or equal to the given threshold
+        :param luminance: how to compute the grayscale-equivalent value of colored pixels - name of one of the
+        LUMINANCE_FORMULAS, or a tuple of (integer) weights for red, green and blue
+        :param dithering: one of the DITHERING_METHODS - with dithering, the threshold only shifts the overall brightness
+        :param width: resize the image to this width (keeping the aspect ratio), e.g. PAGE_WIDTH_MICROSTEPS - None to
+        keep the original size
+        :param cache_directory: if given, the converted image is stored in this directory, keyed by file content and
+        conversion parameters - converting the same image the same way again only loads it from there
         """
-        try:
-            self.image = Image.open(image_path)
-        except FileNotFoundError:
-            raise FileNotFoundError("Exception when opening the file {} - file not found".format(image_path)) \
-                .with_traceback(sys.exc_info()[2])
-        except OSError:
-            # OSError - OS-specific! Results may vary among different operating systems
-            raise NotAnImageException("Exception when opening the file {} - maybe not an image?".format(image_path)) \
-                .with_traceback(sys.exc_info()[2])
-
-        self.pixels = self.image.load()
+        self.image = _open_image(image_path)
         self.threshold = threshold
+        self.luminance_weights = LUMINANCE_FORMULAS.get(luminance, luminance)
+        self.dithering = dithering
+
+        # converted once
+        if cache_directory is None:
+            bitmap = _convert(self.image, threshold, luminance, dithering, width)
+        else:
+            parameters = [threshold, list(self.luminance_weights), dithering, width]
+            cache_path = _cache_path(cache_directory, image_path, parameters)
+            bitmap = _load_cached_bitmap(cache_path)
+            if bitmap is None:
+                bitmap = _convert(self.image, threshold, luminance, dithering, width)
+                _store_cached_bitmap(cache_path, bitmap)
+        WrappedBitmap.__init__(self, bitmap)
 
     def is_grayscale(self):
         return self.image.mode == 'L'
@@ -34,21 +296,116 @@ def is_grayscale(self):
     def is_rgb(self):
         return self.image.mode == 'RGB' or self.image.mode == 'RGBA'
 
-    def is_pixel_set(self, x, y):
-        if self.is_grayscale():
-            return self.pixels[x, y] <= self.threshold
-        elif self.is_rgb():
-            pixel = self.pixels[x, y]
-            grayscale_value = (pixel[0] + pixel[1] + pixel[2]) // 3
-            return grayscale_value <= self.threshold
-        else:
-            raise Exception("Image type not supported")
+    def __exit__(self, *args):
+        self.image.close()
+
+
+class ImageStrips:
+
+    def __init__(self, image_path, strip_height=DEFAULT_STRIP_HEIGHT, threshold=128, luminance=LUMINANCE_AVERAGE):
+        """
+        Read an image as a sequence of horizontal strips, for images too big to be held in memory as a whole.
+
+        Only uncompressed images (e.g. BMP, PGM / PPM, uncompressed TIFF) are decoded strip by strip - memory usage is
+        bounded by the strip size. Compressed or interlaced formats (e.g. PNG, JPEG) can only be decoded as a whole:
+        Pillow's decoded image is kept while iterating, only the conversion to a bitmap is done strip by strip. A
+        warning is issued for these - convert them to BMP or PGM first to keep the memory usage bounded.
+
+        :param image_path: path to image that should be opened
+        :param strip_height: number of rows per strip
+        :param threshold: see WrappedImage
+        :param luminance: see WrappedImage
+        """
+        self.image_path = image_path
+        self.strip_height = strip_height
+        self.threshold = threshold
+        self.luminance = luminance
+        with _open_image(image_path) as image:
+            self.size = image.size
+            self.decodes_strips_only = _rows_can_be_read(image)
+        if not self.decodes_strips_only:
+            warnings.warn("The image {} can not be decoded strip by strip - it is decoded as a whole, memory usage "
+                          "is not bounded by the strip size".format(image_path))
 
     def width(self):
-        return self.image.width
+        return self.size[0]
 
     def height(self):
-        return self.image.height
+        return self.size[1]
+
+    def __enter__(self):
+        return self
 
     def __exit__(self, *args):
-        self.image.close()
+        pass
+
+    def __iter__(self):
+        """:return: generator for (top_y, WrappedBitmap) tuples - one for each strip, top to bottom"""
+        decoded_image = None if self.decodes_strips_only else _open_image(self.image_path)
+        try:
+            for top in range(0, self.height(), self.strip_height):
+                bottom = min(top + self.strip_height, self.height())
+                if decoded_image is None:
+                    with _open_image(self.image_path) as image:
+                        strip = _read_rows(self.image_path, image, top, bottom)
+                else:
+                    strip = decoded_image.crop((0, top, self.width(), bottom))
+                yield top, WrappedBitmap(_threshold(strip, self.threshold, self.luminance))
+        finally:
+            if decoded_image is not None:
+                decoded_image.close()
+
+
+def _rows_can_be_read(image):
+    """:return: True if _read_rows can decode only some of the rows of the given (not yet loaded) image"""
+    tiles = image.tile
+    if not tiles or any(codec_name != 'raw' or extents[0] != 0 or extents[2] != image.width
+                        for codec_name, extents, offset, args in tiles):
+        return False
+    tile_arguments = [_raw_tile_arguments(args) for codec_name, extents, offset, args in tiles]
+    return all(stride != 0 or raw_mode in _RAW_MODE_BITS_PER_PIXEL for raw_mode, stride, orientation in tile_arguments)
+
+
+def _read_rows(image_path, image, top, bottom):
+    """
+    Decode only the given rows of the given (not yet loaded) image, by reading just the corresponding part of the file.
+    Only possible for uncompressed images - stored as a whole, or in full-width strips.
+
+    :return: image of the rows top (inclusive) to bottom (exclusive); None if the image's encoding does not allow
+    decoding only some of its rows
+    """
+    if not _rows_can_be_read(image):
+        return None
+    width = image.width
+    tiles = image.tile
+    tile_arguments = [_raw_tile_arguments(args) for codec_name, extents, offset, args in tiles]
+
+    rows = Image.new(image.mode, (width, bottom - top))
+    if image.palette is not None:
+        raw_mode, palette = image.palette.getdata()
+        rows.putpalette(palette, raw_mode)
+    # e.g. the transparent palette entry
+    rows.info.update(image.info)
+    with open(image_path, 'rb') as file:
+        for (codec_name, extents, offset, args), (raw_mode, stride, orientation) in zip(tiles, tile_arguments):
+            tile_top, tile_bottom = max(extents[1], top), min(extents[3], bottom)
+            if tile_top >= tile_bottom:
+                continue
+            if stride == 0:
+                stride = (width * _RAW_MODE_BITS_PER_PIXEL[raw_mode] + 7) // 8
+            # bottom-up tiles start with their last row
+            first_row = tile_top - extents[1] if orientation > 0 else extents[3] - tile_bottom
+            file.seek(offset + first_row * stride)
+            data = file.read((tile_bottom - tile_top) * stride)
+            tile = Image.frombytes(image.mode, (width, tile_bottom - tile_top), data, 'raw',
+                                   (raw_mode, stride, orientation))
+            rows.paste(tile, (0, tile_top - top))
+    return rows
+
+
+def _raw_tile_arguments(args):
+    """:return: (raw_mode, stride, orientation) - args can be given as just the raw mode, too"""
+    if isinstance(args, str):
+        return args, 0, 1
+    args = tuple(args) + (0, 1)[len(args) - 1:]
+    return args[0], args[1], args[2]
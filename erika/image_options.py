@@ -0,0 +1,18 @@
+"""
+Names and defaults of the options for converting images, see WrappedImage - without importing NumPy or Pillow, so the
+CLI can offer them without any startup time.
+"""
+import os
+
+from erika.erika import ERIKA_PAGE_WIDTH_MICROSTEPS_SOFT_LIMIT_AT_12_CHARS_PER_INCH
+
+# how to turn grayscale values into set / unset pixels
+DITHERING_THRESHOLD = "threshold"
+DITHERING_FLOYD_STEINBERG = "floyd-steinberg"
+DITHERING_ATKINSON = "atkinson"
+DITHERING_BAYER = "bayer"
+DITHERING_METHODS = (DITHERING_THRESHOLD, DITHERING_FLOYD_STEINBERG, DITHERING_ATKINSON, DITHERING_BAYER)
+
+PAGE_WIDTH_MICROSTEPS = ERIKA_PAGE_WIDTH_MICROSTEPS_SOFT_LIMIT_AT_12_CHARS_PER_INCH
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join('~', '.cache'), 'erika3004')
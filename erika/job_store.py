@@ -0,0 +1,171 @@
+"""
+Durable spool for print jobs: an SQLite database, so no job is lost when the process restarts or Erika is unplugged.
+
+Each job is stored with the bytes to send to Erika, the offsets where its lines end, its state and the offset up to
+which the bytes have been sent (and confirmed) so far. After a restart, the job that was printing is resumed from that
+offset - at the start of the first line that was not confirmed yet.
+
+The database runs in WAL mode with synchronous=NORMAL: every change is a single short transaction, without waiting
+for the disk - thousands of jobs per second can be added. Committed jobs survive crashes of the process, only a crash
+of the whole system may lose the most recent ones.
+
+A job store is owned by the process that opened it: the database is locked exclusively until it is closed again. A
+second process (e.g. a second spooler started by mistake) can not open it - otherwise both would print the same jobs.
+"""
+import array
+import os
+import sqlite3
+import time
+
+JOB_QUEUED = "queued"
+JOB_PRINTING = "printing"
+JOB_DONE = "done"
+JOB_CANCELLED = "cancelled"
+JOB_FAILED = "failed"
+
+FINISHED_JOB_STATES = (JOB_DONE, JOB_CANCELLED, JOB_FAILED)
+
+DEFAULT_JOB_STORE_PATH = os.path.join(os.path.expanduser("~"), ".local", "share", "erika3004", "print_jobs.sqlite")
+
+# line ends are stored as a packed array of unsigned 32 bit integers
+_LINE_END_TYPE = "L" if array.array("L").itemsize == 4 else "I"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    line_ends BLOB NOT NULL,
+    state TEXT NOT NULL,
+    sent_offset INTEGER NOT NULL DEFAULT 0,
+    submitted REAL NOT NULL,
+    finished REAL,
+    priority INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, id);
+"""
+
+
+class JobStoreInUseException(Exception):
+    pass
+
+
+class PrintJob:
+
+    def __init__(self, job_id, source, sender, payload, line_ends, state, sent_offset, submitted, priority):
+        """
+        :param priority: jobs with a higher priority are printed first, see PrintScheduler
+        :param payload: the bytes to send to Erika
+        :param line_ends: offsets in the payload where a line ends - printing can stop and resume there
+        :param sent_offset: the payload up to here has been sent to Erika already
+        :param submitted: time.time() when the job was added
+        """
+        self.job_id = job_id
+        self.source = source
+        self.sender = sender
+        self.payload = payload
+        self.line_ends = line_ends
+        self.state = state
+        self.sent_offset = sent_offset
+        self.submitted = submitted
+        self.priority = priority
+        # not stored - a job is only cancelled while printing if the process keeps running until the line is done
+        self.cancel_requested = False
+
+
+class JobStore:
+
+    def __init__(self, path=DEFAULT_JOB_STORE_PATH):
+        """
+        Opens (or creates) the job store - use with a with-statement to make sure it is closed again.
+
+        :param path: database file - ":memory:" for a store that is not persisted at all
+        :raise JobStoreInUseException: if another process has the job store open
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # autocommit - every statement is a transaction of its own; no waiting for the lock of another process
+        self._connection = sqlite3.connect(path, isolation_level=None, timeout=0)
+        try:
+            # the lock taken by the first transaction is kept until the connection is closed
+            self._connection.execute("PRAGMA locking_mode=EXCLUSIVE")
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("BEGIN EXCLUSIVE")
+            self._connection.execute("COMMIT")
+        except sqlite3.OperationalError as e:
+            self._connection.close()
+            raise JobStoreInUseException("The job store {} is used by another process ({})".format(path, e))
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._upgrade_schema()
+
+    def _upgrade_schema(self):
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(jobs)")]
+        if "priority" not in columns:
+            # job stores from before there were priorities
+            self._connection.execute("ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def add(self, payload, line_ends, source, sender, priority=0):
+        """:return: the new PrintJob, queued"""
+        submitted = time.time()
+        cursor = self._connection.execute(
+            "INSERT INTO jobs (source, sender, payload, line_ends, state, submitted, priority) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (source, sender, bytes(payload), _pack_line_ends(line_ends), JOB_QUEUED, submitted, priority))
+        return PrintJob(cursor.lastrowid, source, sender, bytes(payload), list(line_ends), JOB_QUEUED, 0, submitted,
+                        priority)
+
+    def mark_printing(self, job_id):
+        self._connection.execute("UPDATE jobs SET state = ? WHERE id = ?", (JOB_PRINTING, job_id))
+
+    def mark_queued(self, job_id):
+        """E.g. for a job that was interrupted - it continues at the offset sent so far."""
+        self._connection.execute("UPDATE jobs SET state = ? WHERE id = ?", (JOB_QUEUED, job_id))
+
+    def record_progress(self, job_id, sent_offset):
+        """The payload of the given job has been sent up to sent_offset - printing resumes there after a restart."""
+        self._connection.execute("UPDATE jobs SET sent_offset = ? WHERE id = ?", (sent_offset, job_id))
+
+    def mark_finished(self, job_id, state):
+        """:param state: one of FINISHED_JOB_STATES"""
+        self._connection.execute("UPDATE jobs SET state = ?, finished = ? WHERE id = ?", (state, time.time(), job_id))
+
+    def pending_jobs(self):
+        """:return: all jobs not finished yet - the ones printing first, then the queued ones, oldest first"""
+        rows = self._connection.execute(
+            "SELECT id, source, sender, payload, line_ends, state, sent_offset, submitted, priority FROM jobs "
+            "WHERE state IN (?, ?) ORDER BY state = ?, id", (JOB_PRINTING, JOB_QUEUED, JOB_QUEUED))
+        return [PrintJob(job_id, source, sender, payload, _unpack_line_ends(line_ends), state, sent_offset, submitted,
+                         priority)
+                for job_id, source, sender, payload, line_ends, state, sent_offset, submitted, priority in rows]
+
+    def delete_finished_jobs(self, keep=0):
+        """
+        Keeps the database small.
+
+        :param keep: number of most recently finished jobs to keep
+        """
+        self._connection.execute(
+            "DELETE FROM jobs WHERE state IN (?, ?, ?) AND id NOT IN "
+            "(SELECT id FROM jobs WHERE state IN (?, ?, ?) ORDER BY finished DESC LIMIT ?)",
+            FINISHED_JOB_STATES + FINISHED_JOB_STATES + (keep,))
+
+
+def _pack_line_ends(line_ends):
+    return array.array(_LINE_END_TYPE, line_ends).tobytes()
+
+
+def _unpack_line_ends(data):
+    line_ends = array.array(_LINE_END_TYPE)
+    line_ends.frombytes(data)
+    return line_ends.tolist()
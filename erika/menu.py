@@ -1,7 +1,10 @@
+import asyncio
 import os
 from time import sleep
 
 from erika.TicTacToe import TicTacToe
+from erika.async_erika import BlockingErika
+from erika.print_scheduler import SOURCE_MENU
 
 SCROLL_DOWN_ROWS = 5
 PROGRAMS = {
@@ -60,3 +63,22 @@ def run_program(self, program):
         sleep(2)
         self.print_menu()
         self.program_running = False
+
+
+async def run_menu_on_key_press(spooler, erika):
+    """
+    Key listener for PrintSpooler.run_device_worker: a key pressed on Erika opens the menu - in a device session, so
+    the job printing right now is interrupted at the end of its line. Jobs wait until the menu is quit.
+
+    :param spooler: the PrintSpooler
+    :param erika: the spooler's AsyncErika
+    """
+    loop = asyncio.get_event_loop()
+    while True:
+        await erika.read()
+        async with spooler.device_session(SOURCE_MENU) as device:
+            # the menu blocks - it gets a thread of its own
+            menu = Menu(BlockingErika(device, loop))
+            await loop.run_in_executor(None, menu.start_menu)
+            # back to printing jobs
+            await device.set_keyboard_echo(False)
@@ -0,0 +1,231 @@
+"""
+Decides which print job Erika works on next - there is only one typewriter, but several sources of jobs: network
+messages, tweets, images, interactive programs.
+
+* Priorities: jobs with a higher priority always go first. By default, the priority depends on the source (see
+  DEFAULT_SOURCE_PRIORITIES) - interactive programs before messages, messages before images.
+* Fair share: among the jobs with the same priority, the source that got the least printing time so far goes next.
+  Jobs of the same source are printed in order.
+* Preemption: a job can be interrupted at the end of each of its lines - where the print head is back at the left
+  margin of a fresh line, so the job can be continued later on as if nothing happened. It is interrupted as soon as a
+  job with a higher priority is waiting, or once it has printed for a whole time slice while a source with less
+  printing time is waiting.
+
+The time each job waited before printing started (or continued) is collected per source, see latency_metrics.
+"""
+import collections
+import itertools
+import time
+from collections import namedtuple
+
+# where a job came from
+SOURCE_MENU = "menu"
+SOURCE_NETWORK = "network"
+SOURCE_TWITTER = "twitter"
+SOURCE_IMAGES = "images"
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2
+
+DEFAULT_SOURCE_PRIORITIES = {
+    SOURCE_MENU: PRIORITY_HIGH,
+    SOURCE_NETWORK: PRIORITY_NORMAL,
+    SOURCE_TWITTER: PRIORITY_NORMAL,
+    SOURCE_IMAGES: PRIORITY_LOW,
+}
+
+# a job that has printed that long can be interrupted in favour of sources with less printing time [s]
+DEFAULT_TIME_SLICE = 30
+
+# number of waiting times kept per source for the metrics
+LATENCY_SAMPLES_PER_SOURCE = 1000
+
+LatencyMetrics = namedtuple('LatencyMetrics', ['count', 'mean', 'p50', 'p95', 'max'])
+
+
+def priority_for_source(source):
+    return DEFAULT_SOURCE_PRIORITIES.get(source, PRIORITY_NORMAL)
+
+
+class PrintScheduler:
+
+    def __init__(self, time_slice=DEFAULT_TIME_SLICE, clock=time.monotonic):
+        """
+        :param time_slice: printing time [s] after which a job can be interrupted in favour of a fairer choice
+        :param clock: returns the current time [s] - for testing
+        """
+        self.time_slice = time_slice
+        self.clock = clock
+        # (priority, source) -> deque of (sequence number, job), in order
+        self._queues = {}
+        # source -> printing time [s] so far
+        self._usage = collections.defaultdict(float)
+        # job -> since when it is waiting
+        self._waiting_since = {}
+        # job -> its sequence number - the entries of each queue are sorted by it
+        self._sequence_numbers = {}
+        self._latencies = collections.defaultdict(lambda: collections.deque(maxlen=LATENCY_SAMPLES_PER_SOURCE))
+        self._sequence = itertools.count()
+        self._last_source = None
+
+    def __len__(self):
+        return len(self._waiting_since)
+
+    def add(self, job):
+        """
+        Queue the given job - anything with source and priority attributes.
+
+        :param job: the job, at the end of the queue of its source
+        """
+        self._add(job, at_front=False)
+
+    def put_back(self, job):
+        """Queue an interrupted job again - at the front of the queue of its source, so it continues first."""
+        self._add(job, at_front=True)
+
+    def _add(self, job, at_front):
+        if not self._has_waiting_jobs(job.source):
+            # a source coming back after a pause does not get to catch up on the time it did not need
+            self._usage[job.source] = max(self._usage[job.source], self._minimum_usage_of_active_sources())
+        queue = self._queues.setdefault((job.priority, job.source), collections.deque())
+        if at_front:
+            # counts as waiting longer than anything else
+            sequence = -next(self._sequence)
+            queue.appendleft((sequence, job))
+        else:
+            sequence = next(self._sequence)
+            queue.append((sequence, job))
+        self._waiting_since[job] = self.clock()
+        self._sequence_numbers[job] = sequence
+
+    def remove(self, job):
+        """Remove a waiting job, e.g. because it was cancelled - jobs not waiting anymore are left as they are."""
+        index = self._index_in_queue(job)
+        if index is None:
+            return
+        del self._queues[(job.priority, job.source)][index]
+        del self._waiting_since[job]
+        del self._sequence_numbers[job]
+
+    def next_job(self):
+        """:return: the job to print next, removed from the queue - None if there is none"""
+        key = self._choose_queue()
+        if key is None:
+            return None
+        sequence, job = self._queues[key].popleft()
+        del self._sequence_numbers[job]
+        waited = self.clock() - self._waiting_since.pop(job)
+        self._latencies[job.source].append(waited)
+        self._last_source = job.source
+        return job
+
+    def should_preempt(self, job, printing_time):
+        """
+        :param job: the job printing right now, at the end of one of its lines
+        :param printing_time: how long [s] the job has been printing since it was last started or continued
+        :return: True if the job should make way for another one now - see put_back
+        """
+        key = self._choose_queue()
+        if key is None:
+            return False
+        priority, source = key
+        if priority != job.priority:
+            return priority > job.priority
+        return (source != job.source and printing_time >= self.time_slice
+                and self._usage[source] < self._usage[job.source])
+
+    def charge(self, source, seconds):
+        """Account printing time to the given source."""
+        self._usage[source] += seconds
+
+    def order(self):
+        """
+        :return: the waiting jobs, in the order they are expected to be printed - assuming all of them take the same
+        time
+        """
+        result = []
+        for priority in sorted({priority for priority, source in self._queues}, reverse=True):
+            queues = [(self._usage[source], queue[0][0], list(queue)) for (queue_priority, source), queue
+                      in self._queues.items() if queue_priority == priority and queue]
+            # fair share: one job per source in turn, the source with the least printing time first
+            queues.sort(key=lambda usage_and_entries: usage_and_entries[:2])
+            for entries in itertools.zip_longest(*[entries for usage, sequence, entries in queues]):
+                result.extend(entry[1] for entry in entries if entry is not None)
+        return result
+
+    def position(self, job):
+        """
+        Same as order().index(job), without building the whole order - depends on the number of sources, not on the
+        number of waiting jobs.
+
+        :return: number of waiting jobs expected to be printed before the given one - None if it is not waiting
+        """
+        index = self._index_in_queue(job)
+        if index is None:
+            return None
+        own_key = (job.priority, job.source)
+        own_rank = (self._usage[job.source], self._queues[own_key][0][0])
+        position = index
+        for key, queue in self._queues.items():
+            priority, source = key
+            if priority > job.priority:
+                position += len(queue)
+            elif priority == job.priority and key != own_key and queue:
+                # one job per source in turn, sources ranked as in order()
+                position += min(len(queue), index)
+                if len(queue) > index and (self._usage[source], queue[0][0]) < own_rank:
+                    position += 1
+        return position
+
+    def latency_metrics(self):
+        """:return: source -> LatencyMetrics about the time [s] jobs waited before being printed"""
+        metrics = {}
+        for source, latencies in self._latencies.items():
+            ordered = sorted(latencies)
+            metrics[source] = LatencyMetrics(len(ordered), sum(ordered) / len(ordered), _percentile(ordered, 50),
+                                             _percentile(ordered, 95), ordered[-1])
+        return metrics
+
+    def _choose_queue(self):
+        best_key = best_rank = None
+        for key, queue in self._queues.items():
+            if not queue:
+                continue
+            priority, source = key
+            # highest priority, then least printing time, then waiting the longest
+            rank = (-priority, self._usage[source], queue[0][0])
+            if best_rank is None or rank < best_rank:
+                best_key, best_rank = key, rank
+        return best_key
+
+    def _index_in_queue(self, job):
+        """:return: index of the given job in the queue of its source - None if it is not waiting"""
+        sequence = self._sequence_numbers.get(job)
+        if sequence is None:
+            return None
+        queue = self._queues[(job.priority, job.source)]
+        # binary search - the entries are sorted by their sequence numbers
+        low, high = 0, len(queue)
+        while low < high:
+            middle = (low + high) // 2
+            if queue[middle][0] < sequence:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _has_waiting_jobs(self, source):
+        return any(queue for (priority, queue_source), queue in self._queues.items() if queue_source == source)
+
+    def _minimum_usage_of_active_sources(self):
+        # the ones waiting, and the one printing right now (or most recently)
+        usages = [self._usage[source] for (priority, source), queue in self._queues.items() if queue]
+        if self._last_source is not None:
+            usages.append(self._usage[self._last_source])
+        return min(usages) if usages else 0.0
+
+
+def _percentile(ordered_values, percent):
+    index = max(0, -(-len(ordered_values) * percent // 100) - 1)
+    return ordered_values[index]
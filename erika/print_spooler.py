@@ -0,0 +1,462 @@
+"""
+Print spooler: accepts messages from many network clients at once and prints them one after another.
+
+Every message is acknowledged as soon as it has been received - with a job ID and the position in the queue - so
+nobody has to wait for Erika. A single device worker prints the queued jobs, in the order a PrintScheduler decides on -
+by priority, with a fair share for every source. All jobs are kept in a JobStore, so they survive restarts.
+
+There is one spooler for all sources - network clients, tweets (erika/twitter.py) and the menu (erika/menu.py) - see
+erika/tcp_server.py for running them together.
+
+Protocol - the first line of the connection is PROTOCOL_HEADER (ERIKA/1), then one command per line, UTF-8, any number
+of commands per connection:
+* PRINT <length>, followed by <length> bytes of message: queues the message, answer: OK <job ID> <position>
+* STATUS <job ID>: answer: STATUS <job ID> <state> <position>
+* CANCEL <job ID>: a queued job is dropped, a job that is already printing stops at the end of the current line,
+  answer: CANCELLED <job ID>
+* METRICS: how long jobs waited before printing started, per source - one line per source, then END:
+  METRICS <source> <number of jobs> <mean [s]> <median [s]> <95th percentile [s]> <maximum [s]>
+Errors are answered with ERROR <reason>. The position is the number of jobs expected to be printed before the job - 0
+for the job printing right now.
+
+Anything not starting with PROTOCOL_HEADER is taken as a message as it is, up to the end of the connection - just like
+before, e.g. for: echo "Hello Erika" | nc <host> <port> - even if it starts with a word like PRINT or STATUS.
+"""
+import asyncio
+import collections
+import itertools
+import logging
+import time
+
+from erika.async_erika import AsyncErika
+from erika.async_erika import ErikaConnectionClosedException
+from erika.erica_encoder_decoder import DDR_ASCII
+from erika.erica_encoder_decoder import FALLBACK_IGNORE
+from erika.job_store import FINISHED_JOB_STATES
+from erika.job_store import JOB_CANCELLED
+from erika.job_store import JOB_DONE
+from erika.job_store import JOB_PRINTING
+from erika.job_store import JOB_QUEUED
+from erika.print_scheduler import PrintScheduler
+from erika.print_scheduler import SOURCE_IMAGES
+from erika.print_scheduler import SOURCE_MENU
+from erika.print_scheduler import SOURCE_NETWORK
+from erika.print_scheduler import priority_for_source
+from erika.text_layout import TextLayout
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_LINE_LENGTH = 60
+
+# bigger messages are refused
+MAX_MESSAGE_SIZE = 64 * 1024
+
+# connections without any command for that long are closed [s]
+CLIENT_TIMEOUT = 60
+
+# wait that long before trying to connect to Erika again [s]
+RECONNECT_DELAY = 10
+
+# finished jobs are kept for status queries - only the most recent ones
+MAX_FINISHED_JOBS = 1000
+
+# same as Erika.crlf
+_CRLF = bytes.fromhex("77")
+
+# first line of a connection sending commands - a client sending anything else is an old one, sending a plain message
+PROTOCOL_HEADER = b"ERIKA/1"
+
+_COMMANDS = ("PRINT", "STATUS", "CANCEL")
+_MESSAGE_TOO_BIG = "Messages must not be longer than {} bytes".format(MAX_MESSAGE_SIZE)
+
+
+class UnknownJobException(Exception):
+    pass
+
+
+class _ProtocolException(Exception):
+    pass
+
+
+def message_lines(text, sender, text_layout):
+    """
+    :param text: the message - a string, or an iterable of strings
+    :param text_layout: TextLayout to sanitize and wrap the message with
+    :return: generator of the lines to print for the given message - with a header saying who sent it when
+    """
+    header = '({}) Message sent by {}:\n'.format(time.strftime('%Y-%m-%d %H:%M:%S'), sender)
+    if isinstance(text, str):
+        text = (text,)
+    return text_layout.lines(itertools.chain((header,), text))
+
+
+class _DeviceSession:
+
+    def __init__(self, spooler, source, priority):
+        """
+        Exclusive use of Erika for a while - scheduled just like a print job, see PrintSpooler.device_session. An
+        async context manager, for Python 3.6 (no contextlib.asynccontextmanager).
+        """
+        self.spooler = spooler
+        self.source = source
+        self.priority = priority
+        self.granted = None
+        self.released = None
+
+    async def __aenter__(self):
+        self.granted = asyncio.get_event_loop().create_future()
+        self.released = asyncio.Event()
+        self.spooler._enqueue(self)
+        try:
+            return await self.granted
+        except BaseException:
+            self._release()
+            raise
+
+    async def __aexit__(self, *args):
+        self._release()
+
+    def _release(self):
+        if self.granted.cancelled():
+            self.spooler.scheduler.remove(self)
+        self.released.set()
+
+
+class PrintSpooler:
+
+    def __init__(self, job_store, max_line_length=DEFAULT_MAX_LINE_LENGTH, scheduler=None):
+        """
+        Jobs not finished before (e.g. because the process was stopped) are picked up again - a job that was printing
+        continues right after the last line that was confirmed to be sent.
+
+        :param job_store: JobStore keeping the jobs
+        :param max_line_length: longer lines are wrapped
+        :param scheduler: PrintScheduler deciding which job goes next - default settings if not given
+        """
+        self.job_store = job_store
+        self.text_layout = TextLayout(max_line_length)
+        self.scheduler = scheduler or PrintScheduler()
+        self._ddr_ascii = DDR_ASCII()
+        self._jobs = {}
+        for job in job_store.pending_jobs():
+            self._jobs[job.job_id] = job
+            if job.state == JOB_PRINTING:
+                self.scheduler.put_back(job)
+            else:
+                self.scheduler.add(job)
+        self._finished_job_ids = collections.deque()
+        self._printing_job = None
+        self._jobs_available = asyncio.Event()
+        # the ones left over from before are not needed anymore
+        job_store.delete_finished_jobs()
+
+    # jobs
+
+    def submit(self, text, sender, source=SOURCE_NETWORK):
+        """
+        Queue the given message for printing.
+
+        :param text: the message, as sent by the client - a string, or an iterable of strings
+        :param sender: who sent the message - printed in the header
+        :param source: where the message came from, e.g. SOURCE_NETWORK
+        :return: the new PrintJob
+        """
+        return self.submit_lines(message_lines(text, sender, self.text_layout), sender, source)
+
+    def submit_lines(self, lines, sender, source, priority=None):
+        """
+        Queue the given lines for printing, as they are - characters Erika can not print are left out. Each line is
+        sent to Erika in one go.
+
+        :param lines: iterable of lines, e.g. from TextLayout.lines
+        :param priority: see PrintScheduler - depends on the source if not given
+        :return: the new PrintJob
+        """
+        payload = bytearray()
+        line_ends = []
+        # start on a new line
+        for line in itertools.chain(("",), lines):
+            payload += self._ddr_ascii.encode_bytes(line, FALLBACK_IGNORE)
+            payload += _CRLF
+            line_ends.append(len(payload))
+        return self._submit(payload, line_ends, sender, source, priority)
+
+    def submit_program(self, program, sender, source=SOURCE_IMAGES, priority=None):
+        """
+        Queue the given ErikaProgram for printing, e.g. a rendered image. It can be interrupted wherever the print
+        head is back at the left margin - long programs should get there once in a while.
+
+        :param priority: see PrintScheduler - depends on the source if not given
+        :return: the new PrintJob
+        """
+        program_bytes, program_line_ends = program.to_bytes_by_line()
+        # start on a new line
+        return self._submit(_CRLF + program_bytes, [len(_CRLF)] + [len(_CRLF) + end for end in program_line_ends],
+                            sender, source, priority)
+
+    def _submit(self, payload, line_ends, sender, source, priority):
+        if priority is None:
+            priority = priority_for_source(source)
+        job = self.job_store.add(payload, line_ends, source, sender, priority)
+        self._jobs[job.job_id] = job
+        self._enqueue(job)
+        return job
+
+    def _enqueue(self, job):
+        self.scheduler.add(job)
+        self._jobs_available.set()
+
+    def job(self, job_id):
+        try:
+            return self._jobs[job_id]
+        except KeyError:
+            raise UnknownJobException("Unknown job {}".format(job_id))
+
+    def position(self, job):
+        """:return: number of jobs expected to be printed before the given one, None for finished jobs"""
+        if job is self._printing_job:
+            return 0
+        if job.state in FINISHED_JOB_STATES:
+            return None
+        return self.scheduler.position(job) + (1 if self._printing_job else 0)
+
+    def cancel(self, job_id):
+        """:return: the job - finished jobs are left as they are"""
+        job = self.job(job_id)
+        if job is self._printing_job:
+            job.cancel_requested = True
+        elif job.state not in FINISHED_JOB_STATES:
+            self.scheduler.remove(job)
+            self._finish(job, JOB_CANCELLED)
+        return job
+
+    def latency_metrics(self):
+        """:return: source -> LatencyMetrics, see PrintScheduler.latency_metrics"""
+        return self.scheduler.latency_metrics()
+
+    def _finish(self, job, state):
+        job.state = state
+        self.job_store.mark_finished(job.job_id, state)
+        # forget the oldest finished jobs
+        self._finished_job_ids.append(job.job_id)
+        while len(self._finished_job_ids) > MAX_FINISHED_JOBS:
+            del self._jobs[self._finished_job_ids.popleft()]
+
+    def device_session(self, source=SOURCE_MENU, priority=None):
+        """
+        Exclusive use of Erika, e.g. for an interactive program - waits until it is the session's turn: the job
+        printing right now is interrupted at the end of its current line if the session has a higher priority.
+
+        async with spooler.device_session() as erika:
+            ...
+
+        :param priority: see PrintScheduler - depends on the source if not given
+        """
+        return _DeviceSession(self, source, priority_for_source(source) if priority is None else priority)
+
+    # device worker
+
+    async def run_device_worker(self, erika, key_listener=None):
+        """
+        Print all queued jobs, one after another (see PrintScheduler) - runs until cancelled or until printing fails.
+        In the latter case, the job printing is put back, so it can be resumed on the next run.
+
+        :param erika: AsyncErika to print on - or anything else with the same awaitable methods
+        :param key_listener: optional coroutine function, run alongside with the spooler and erika as arguments - e.g.
+        menu.run_menu_on_key_press, for interactive programs started from Erika's keyboard. If it fails, the worker
+        stops, too.
+        """
+        if key_listener is None:
+            await self._print_jobs(erika)
+            return
+        worker = asyncio.ensure_future(self._print_jobs(erika))
+        listener = asyncio.ensure_future(key_listener(self, erika))
+        try:
+            await asyncio.wait([worker, listener], return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            worker.cancel()
+            listener.cancel()
+        for task in (worker, listener):
+            if task.done() and not task.cancelled():
+                task.result()
+
+    async def _print_jobs(self, erika):
+        while True:
+            job = self.scheduler.next_job()
+            while job is None:
+                self._jobs_available.clear()
+                await self._jobs_available.wait()
+                job = self.scheduler.next_job()
+
+            if isinstance(job, _DeviceSession):
+                await self._lend_device(erika, job)
+                continue
+
+            self._printing_job = job
+            try:
+                finished = await self._print_job(erika, job)
+            except BaseException:
+                self.scheduler.put_back(job)
+                raise
+            finally:
+                self._printing_job = None
+            if finished:
+                self._finish(job, JOB_CANCELLED if job.cancel_requested else JOB_DONE)
+            else:
+                job.state = JOB_QUEUED
+                self.job_store.mark_queued(job.job_id)
+                self.scheduler.put_back(job)
+
+    async def _lend_device(self, erika, session):
+        start = time.monotonic()
+        session.granted.set_result(erika)
+        await session.released.wait()
+        self.scheduler.charge(session.source, time.monotonic() - start)
+
+    async def print_forever(self, com_port, reconnect_delay=RECONNECT_DELAY, key_listener=None):
+        """
+        Print all queued jobs on the Erika at the given serial port - if the connection is lost, try again and
+        again, resuming where printing stopped. Runs until cancelled.
+
+        :param key_listener: see run_device_worker
+        """
+        while True:
+            try:
+                async with AsyncErika(com_port) as erika:
+                    await erika.set_keyboard_echo(False)
+                    await self.run_device_worker(erika, key_listener)
+            except (OSError, ErikaConnectionClosedException) as e:
+                logger.warning("Lost the connection to Erika (%s) - trying again in %s s", e, reconnect_delay)
+                await asyncio.sleep(reconnect_delay)
+
+    async def _print_job(self, erika, job):
+        """:return: True if the job is done (or cancelled), False if it was interrupted to make way for another one"""
+        if job.state != JOB_PRINTING:
+            job.state = JOB_PRINTING
+            self.job_store.mark_printing(job.job_id)
+        start = line_start = time.monotonic()
+        printed_a_line = False
+        for line_end in job.line_ends:
+            if line_end <= job.sent_offset:
+                continue
+            if job.cancel_requested:
+                break
+            if printed_a_line and self.scheduler.should_preempt(job, line_start - start):
+                return False
+            await erika.write_bytes(job.payload[job.sent_offset:line_end])
+            # only progress that has actually left the computer counts
+            await erika.flush(wait_until_sent=True)
+            job.sent_offset = line_end
+            self.job_store.record_progress(job.job_id, line_end)
+
+            now = time.monotonic()
+            self.scheduler.charge(job.source, now - line_start)
+            line_start = now
+            printed_a_line = True
+        return True
+
+    # network
+
+    async def start_server(self, host, port):
+        """
+        Accept clients on the given address - what they send is queued, see run_device_worker for printing it.
+
+        :return: the asyncio Server
+        """
+        return await asyncio.start_server(self.handle_client, host, port, limit=MAX_MESSAGE_SIZE)
+
+    async def handle_client(self, reader, writer):
+        address = writer.get_extra_info("peername")
+        sender = "{}:{}".format(address[0], address[1]) if address else "unknown"
+        try:
+            line = await self._read_line(reader, writer)
+            if line is None:
+                return
+            if line.rstrip(b"\r\n") != PROTOCOL_HEADER:
+                await self._answer(writer, await self._handle(self._handle_unframed_message, line, reader, sender))
+                return
+            while True:
+                line = await self._read_line(reader, writer)
+                if line is None:
+                    return
+                if line.strip():
+                    await self._answer(writer, await self._handle(self._handle_command, line, reader, sender))
+        except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            logger.info("Connection to %s dropped: %s", sender, e)
+        finally:
+            writer.close()
+
+    async def _read_line(self, reader, writer):
+        """:return: the next line, None at the end of the connection"""
+        try:
+            return await asyncio.wait_for(reader.readline(), CLIENT_TIMEOUT) or None
+        except ValueError:
+            # the line alone is longer than any message may be
+            await self._answer(writer, "ERROR " + _MESSAGE_TOO_BIG)
+            return None
+
+    @staticmethod
+    async def _handle(handler, line, reader, sender):
+        """:return: the handler's answer - or the error to answer with"""
+        try:
+            return await handler(line, reader, sender)
+        except (_ProtocolException, UnknownJobException) as e:
+            return "ERROR {}".format(e)
+
+    @staticmethod
+    async def _answer(writer, answer):
+        writer.write((answer + "\n").encode("utf-8"))
+        await writer.drain()
+
+    async def _handle_command(self, line, reader, sender):
+        if line.split() == [b"METRICS"]:
+            return self._format_metrics()
+        try:
+            command, argument = line.decode("ascii").split()
+            number = int(argument)
+            if command not in _COMMANDS:
+                raise ValueError(command)
+        except ValueError:
+            raise _ProtocolException("Invalid command - use PRINT <length>, STATUS <job ID>, CANCEL <job ID> or "
+                                     "METRICS")
+
+        if command == "PRINT":
+            if not 0 <= number <= MAX_MESSAGE_SIZE:
+                raise _ProtocolException(_MESSAGE_TOO_BIG)
+            data = await asyncio.wait_for(reader.readexactly(number), CLIENT_TIMEOUT)
+            return self._queue_message(data, sender)
+        if command == "STATUS":
+            job = self.job(number)
+            return "STATUS {} {} {}".format(job.job_id, job.state, self._format_position(job))
+        job = self.cancel(number)
+        return "CANCELLED {}".format(job.job_id)
+
+    async def _handle_unframed_message(self, first_line, reader, sender):
+        data = bytearray(first_line)
+        while len(data) <= MAX_MESSAGE_SIZE:
+            chunk = await asyncio.wait_for(reader.read(MAX_MESSAGE_SIZE + 1 - len(data)), CLIENT_TIMEOUT)
+            if not chunk:
+                break
+            data += chunk
+        if len(data) > MAX_MESSAGE_SIZE:
+            raise _ProtocolException(_MESSAGE_TOO_BIG)
+        return self._queue_message(data, sender)
+
+    def _queue_message(self, data, sender):
+        try:
+            text = bytes(data).decode("utf-8")
+        except UnicodeDecodeError:
+            raise _ProtocolException("Invalid bytes. You must send UTF-8.")
+        job = self.submit(text, sender)
+        position = self.position(job)
+        logger.info("Job %s from %s queued at position %s", job.job_id, sender, position)
+        return "OK {} {}".format(job.job_id, position)
+
+    def _format_metrics(self):
+        lines = ["METRICS {} {} {:.3f} {:.3f} {:.3f} {:.3f}".format(source, *metrics)
+                 for source, metrics in sorted(self.latency_metrics().items())]
+        return "\n".join(lines + ["END"])
+
+    def _format_position(self, job):
+        position = self.position(job)
+        return "-" if position is None else position
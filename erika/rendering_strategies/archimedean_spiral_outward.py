@@ -0,0 +1,177 @@
+import math
+from enum import Enum
+
+import numpy as np
+
+from erika.rendering_strategies.base import ErikaImageRenderingStrategy
+
+
+class Direction(Enum):
+    NORTHEAST = 1
+    NORTHWEST = 2
+    SOUTHEAST = 3
+    SOUTHWEST = 4
+
+
+class ArchimedeanSpiralOutwardErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
+
+    # TODO mention "This is a reST style." in commit message + link to https://stackoverflow.com/a/24385103/1143126
+    def __init__(self, spiral_param_a=1, spiral_param_b=0.35, spiral_step_size=0.01, render_remaining_characters=True):
+        """
+        "...with real numbers a and b.
+
+        Changing the parameter a turns the spiral,
+
+        while b controls the distance between successive turnings."
+
+        https://en.wikipedia.org/wiki/Archimedean_spiral
+
+        :param spiral_param_a: turns the spiral
+        :param spiral_param_b: controls distance between spiral turns
+        :param spiral_step_size: step size between successive datapoints
+        :param render_remaining_characters: if False, will only render the spiral, not fill remaining gaps later
+        """
+        ErikaImageRenderingStrategy.__init__(self)
+
+        self.spiral_param_a = spiral_param_a
+        self.spiral_param_b = spiral_param_b
+
+        # round spiral:
+        # 1 / 20 * pi
+        # 1 / 10
+        #
+        # jagged spiral:
+        # 1
+        self.spiral_step_size = spiral_step_size
+
+        # tolerance around 45° angle (in all directions) to mark as area for cut-off
+        self.CUTOFF_ANGLE_TOLERANCE = 15
+
+        self.render_remaining_characters = render_remaining_characters
+
+        # init - only used later
+        self.current_x = 0
+        self.current_y = 0
+        self.spiral_offset_x = 0
+        self.spiral_offset_y = 0
+
+    def render(self, erika_image_abstraction):
+        self.current_x = 0
+        self.current_y = 0
+
+        line_count = erika_image_abstraction.height()
+        max_line_length = erika_image_abstraction.width()
+        self._initialize_printed_characters_map(max_line_length, line_count)
+
+        self._render_spiral(erika_image_abstraction, max_line_length, line_count)
+
+        if self.render_remaining_characters:
+            self._render_remaining(erika_image_abstraction, max_line_length, line_count)
+
+        self._reset_to_upper_left(erika_image_abstraction)
+
+    # Formula for Archimedean spiral:
+    # https://en.wikipedia.org/wiki/Archimedean_spiral
+    # r = a + b * phi
+    # (with phi replaced later by t = 0, 1, ...)
+    #
+    # from polar coordinates to cartesian coordinates:
+    # x = r * cos(phi)
+    # y = r * sin(phi)
+    #
+    # follows:
+    # r = x / cos(phi)
+    # x / cos(phi) = a + b * phi
+    # x = (a + b * phi) * cos(phi)
+    #
+    # r = y / sin(phi)
+    # y / sin(phi) = a + b * phi
+    # y = (a + b * phi) * sin(phi)
+    #
+    def _render_spiral(self, erika_image_abstraction, max_line_length, line_count):
+        max_x = max_line_length - 1
+        max_y = line_count - 1
+
+        self.spiral_offset_x = math.floor(max_x / 2)
+        self.spiral_offset_y = math.floor(max_y / 2)
+        self._move_to(erika_image_abstraction, self.spiral_offset_x, self.spiral_offset_y)
+        for x, y in self._spiral_path(max_x, max_y):
+            self._goto_and_print(erika_image_abstraction, x, y)
+
+    def _spiral_path(self, max_x, max_y):
+        """
+        :return: list of (x, y) tuples - the integer positions along the spiral that are inside the bounds, without
+        repeating the same position several times in a row (the spiral is sampled much finer than the grid)
+        """
+        path = []
+        previous_position = None
+        i = 1
+        directions_out_of_bounds = {}
+        while True:
+            t = i * self.spiral_step_size
+
+            x = (self.spiral_param_a + self.spiral_param_b * t) * math.cos(t) + self.spiral_offset_x
+            y = (self.spiral_param_a + self.spiral_param_b * t) * math.sin(t) + self.spiral_offset_y
+
+            # cut off: cut off if turtle is in the corner (close to 45 degree angle in all directions) + out of bounds
+            current_angle = (math.degrees(t) % 360)
+            if ((45 - self.CUTOFF_ANGLE_TOLERANCE <= current_angle)
+                    and (current_angle <= 45 + self.CUTOFF_ANGLE_TOLERANCE)):
+                self._note_if_out_of_bounds(directions_out_of_bounds, Direction.NORTHEAST, max_x, max_y, x, y)
+            if ((135 - self.CUTOFF_ANGLE_TOLERANCE <= current_angle)
+                    and (current_angle <= 135 + self.CUTOFF_ANGLE_TOLERANCE)):
+                self._note_if_out_of_bounds(directions_out_of_bounds, Direction.NORTHWEST, max_x, max_y, x, y)
+            if ((225 - self.CUTOFF_ANGLE_TOLERANCE <= current_angle)
+                    and (current_angle <= 225 + self.CUTOFF_ANGLE_TOLERANCE)):
+                self._note_if_out_of_bounds(directions_out_of_bounds, Direction.SOUTHEAST, max_x, max_y, x, y)
+            if ((315 - self.CUTOFF_ANGLE_TOLERANCE <= current_angle)
+                    and (current_angle <= 315 + self.CUTOFF_ANGLE_TOLERANCE)):
+                self._note_if_out_of_bounds(directions_out_of_bounds, Direction.SOUTHWEST, max_x, max_y, x, y)
+
+            # all 4 directions are out of bounds now
+            if len(directions_out_of_bounds) > 3:
+                return path
+
+            position = (math.floor(x), math.floor(y))
+            if position != previous_position and 0 <= position[0] <= max_x and 0 <= position[1] <= max_y:
+                path.append(position)
+            previous_position = position
+
+            i += 1
+
+    @staticmethod
+    def _note_if_out_of_bounds(directions_out_of_bounds, direction, max_x, max_y, x, y):
+        if (x < 0) or (y < 0) or (max_x < x) or (max_y < y):
+            directions_out_of_bounds[direction] = 1
+
+    def _goto_and_print(self, erika_image_abstraction, x, y):
+        if self.printed.is_printed(x, y):
+            return
+
+        self.printed.mark_printed(x, y)
+        self._move_to(erika_image_abstraction, x, y)
+        erika_image_abstraction.print_at(x, y)
+        self.current_x += 1
+
+    def _move_to(self, erika_image_abstraction, position_x, position_y):
+        # adjust X position first, then Y position
+        erika_image_abstraction.move_by(position_x - self.current_x, position_y - self.current_y)
+        self.current_x = position_x
+        self.current_y = position_y
+
+    def _render_remaining(self, erika_image_abstraction, max_line_length, line_count):
+        # render remaining letters in ascending order of distance to middle point - ties in order of x, then y
+        for x, y in self._coordinates_by_distance_to_spiral_center(max_line_length, line_count):
+            self._goto_and_print(erika_image_abstraction, x, y)
+
+    def _coordinates_by_distance_to_spiral_center(self, max_line_length, line_count):
+        """:return: list of all (x, y) tuples, sorted once by distance to the spiral center, x and y"""
+        ys, xs = np.indices((line_count, max_line_length)).reshape(2, -1)
+        delta_x = np.abs(self.spiral_offset_x - xs).astype(float)
+        delta_y = np.abs(self.spiral_offset_y - ys).astype(float)
+        distances = np.sqrt(delta_x * delta_x + delta_y * delta_y)
+        order = np.lexsort((ys, xs, distances))
+        return list(zip(xs[order].tolist(), ys[order].tolist()))
+
+    def _reset_to_upper_left(self, erika_image_abstraction):
+        self._move_to(erika_image_abstraction, 0, 0)
@@ -0,0 +1,32 @@
+class ErikaImageRenderingStrategy:
+
+    def __init__(self):
+        pass
+
+    def render(self, erika_image_abstraction):
+        raise Exception('Not implemented')
+
+    @staticmethod
+    def _generate_coordinates(range_x_upper, range_y_upper, range_x_lower=0, range_y_lower=0):
+        for x in range(range_x_lower, range_x_upper):
+            for y in range(range_y_lower, range_y_upper):
+                yield (x, y)
+
+    def _initialize_printed_characters_map(self, max_line_length, line_count):
+        self.printed = PrintedMap(max_line_length, line_count)
+
+
+class PrintedMap:
+
+    def __init__(self, width, height):
+        """Keeps track of the positions that were printed already - one bit per position."""
+        self.width = width
+        self.bits = bytearray((width * height + 7) // 8)
+
+    def is_printed(self, x, y):
+        index = y * self.width + x
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def mark_printed(self, x, y):
+        index = y * self.width + x
+        self.bits[index >> 3] |= 1 << (index & 7)
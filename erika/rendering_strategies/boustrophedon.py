@@ -0,0 +1,36 @@
+from erika.rendering_strategies.base import ErikaImageRenderingStrategy
+
+
+class BoustrophedonErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
+
+    def __init__(self):
+        ErikaImageRenderingStrategy.__init__(self)
+
+    def render(self, erika_image_abstraction):
+        """
+        Print every other line backwards (right to left), so the carriage never has to return across the page. Only the
+        inked part of each line is printed, blank lines are skipped.
+        """
+        current_x = 0
+        lines_to_move_down = 0
+        forward = True
+        for y in range(0, erika_image_abstraction.height()):
+            inked_extent = erika_image_abstraction.inked_extent(y)
+            if inked_extent is None:
+                lines_to_move_down += 1
+                continue
+
+            start_x, end_x = inked_extent
+            if forward:
+                erika_image_abstraction.move_by(start_x - current_x, lines_to_move_down)
+                erika_image_abstraction.print_segment_at(y, start_x, end_x)
+                current_x = end_x
+            else:
+                erika_image_abstraction.move_by(end_x - current_x, lines_to_move_down)
+                erika_image_abstraction.print_segment_reversed_at(y, start_x, end_x)
+                current_x = start_x
+            lines_to_move_down = 1
+            forward = not forward
+
+        # end up at the start of the line below the image - just like after rendering line by line
+        erika_image_abstraction.move_by(-current_x, lines_to_move_down)
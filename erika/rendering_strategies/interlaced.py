@@ -0,0 +1,30 @@
+from erika.rendering_strategies.base import ErikaImageRenderingStrategy
+
+
+class InterlacedErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
+
+    def __init__(self):
+        ErikaImageRenderingStrategy.__init__(self)
+
+    def render(self, erika_image_abstraction):
+        line_count = erika_image_abstraction.height()
+        moved = 0
+        for even in range(0, line_count, 2):
+            erika_image_abstraction.print_line_at(even)
+            erika_image_abstraction.crlf()
+            erika_image_abstraction.crlf()
+            moved += 2
+
+        # reset cursor to start of line
+        erika_image_abstraction.crlf()
+
+        # do not compensate the line that this adds - the extra line will position the cursor right where we want it
+        # erika_image_abstraction.move_up()
+
+        for lines_to_move_up in range(0, moved):
+            erika_image_abstraction.move_up()
+
+        for odd in range(1, line_count, 2):
+            erika_image_abstraction.print_line_at(odd)
+            erika_image_abstraction.crlf()
+            erika_image_abstraction.crlf()
@@ -0,0 +1,12 @@
+from erika.rendering_strategies.base import ErikaImageRenderingStrategy
+
+
+class LineByLineErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
+
+    def __init__(self):
+        ErikaImageRenderingStrategy.__init__(self)
+
+    def render(self, erika_image_abstraction):
+        for y in range(0, erika_image_abstraction.height()):
+            erika_image_abstraction.print_line_at(y)
+            erika_image_abstraction.crlf()
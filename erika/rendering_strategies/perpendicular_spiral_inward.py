@@ -0,0 +1,69 @@
+from erika.rendering_strategies.base import ErikaImageRenderingStrategy
+
+
+class PerpendicularSpiralInwardErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
+
+    def __init__(self, skip_blank_positions=True):
+        """
+        :param skip_blank_positions: if True, blank characters / pixels are not visited - the moves around them are
+        merged into one
+        """
+        ErikaImageRenderingStrategy.__init__(self)
+        self.skip_blank_positions = skip_blank_positions
+
+    def render(self, erika_image_abstraction):
+        current_x = 0
+        current_y = 0
+        for x, y in self._spiral_coordinates(erika_image_abstraction.width(), erika_image_abstraction.height()):
+            if self.skip_blank_positions and not erika_image_abstraction.is_inked(x, y):
+                continue
+            erika_image_abstraction.move_by(x - current_x, y - current_y)
+            erika_image_abstraction.print_at(x, y)
+            current_x = x + 1
+            current_y = y
+
+    @staticmethod
+    def _spiral_coordinates(width, height):
+        """
+        Generate all coordinates, going round clockwise from the upper left corner, spiralling inward to the middle.
+        """
+        upper_left_x, upper_left_y = 0, 0
+        lower_right_x, lower_right_y = width - 1, height - 1
+        while upper_left_x <= lower_right_x and upper_left_y <= lower_right_y:
+            #
+            # =====>
+            #
+            for x in range(upper_left_x, lower_right_x + 1):
+                yield x, upper_left_y
+
+            # edge case: this was the only last row
+            if upper_left_y == lower_right_y:
+                return
+
+            # ||
+            # ||
+            # \/
+            for y in range(upper_left_y + 1, lower_right_y + 1):
+                yield lower_right_x, y
+
+            # edge case: this was the only last column
+            if upper_left_x == lower_right_x:
+                return
+
+            #
+            # <=====
+            #
+            for x in range(lower_right_x - 1, upper_left_x - 1, -1):
+                yield x, lower_right_y
+
+            # /\
+            # ||
+            # ||
+            for y in range(lower_right_y - 1, upper_left_y, -1):
+                yield upper_left_x, y
+
+            # continue with smaller spiral
+            upper_left_x += 1
+            upper_left_y += 1
+            lower_right_x -= 1
+            lower_right_y -= 1
@@ -0,0 +1,55 @@
+import numpy as np
+
+from erika.rendering_strategies.base import ErikaImageRenderingStrategy
+
+
+class RandomDotFillErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
+
+    def __init__(self, seed=None, skip_blank_positions=False, tile_size=None):
+        """
+        :param seed: seed for the random order - same seed, same order
+        :param skip_blank_positions: if True, only visit non-blank characters / set pixels
+        :param tile_size: if given, randomize only within square tiles of this size - tiles are visited line by line,
+        every other line of tiles backwards, which keeps the travel short
+        """
+        ErikaImageRenderingStrategy.__init__(self)
+        self.seed = seed
+        self.skip_blank_positions = skip_blank_positions
+        self.tile_size = tile_size
+        self.current_x = 0
+        self.current_y = 0
+
+    def render(self, erika_image_abstraction):
+        self.current_x = 0
+        self.current_y = 0
+
+        for x, y in self._random_positions(erika_image_abstraction):
+            self._move_to(erika_image_abstraction, x, y)
+            erika_image_abstraction.print_at(x, y)
+            self.current_x += 1
+
+    def _random_positions(self, erika_image_abstraction):
+        """:return: list of [x, y] lists - every position to visit exactly once, in random order"""
+        if self.skip_blank_positions:
+            positions = np.array(erika_image_abstraction.inked_positions(), dtype=np.int64).reshape(-1, 2)
+        else:
+            ys, xs = np.indices((erika_image_abstraction.height(), erika_image_abstraction.width())).reshape(2, -1)
+            positions = np.stack((xs, ys), axis=1)
+
+        # a random permutation of the indexes, no re-drawing of already printed positions
+        random_keys = np.random.default_rng(self.seed).permutation(len(positions))
+        if self.tile_size is None:
+            return positions[random_keys].tolist()
+
+        tile_columns = positions[:, 0] // self.tile_size
+        tile_rows = positions[:, 1] // self.tile_size
+        tile_columns_per_row = -(-erika_image_abstraction.width() // self.tile_size)
+        tile_columns = np.where(tile_rows % 2 == 0, tile_columns, tile_columns_per_row - 1 - tile_columns)
+        tiles = tile_rows * tile_columns_per_row + tile_columns
+        return positions[np.lexsort((random_keys, tiles))].tolist()
+
+    def _move_to(self, erika_image_abstraction, position_x, position_y):
+        # adjust X position first, then Y position
+        erika_image_abstraction.move_by(position_x - self.current_x, position_y - self.current_y)
+        self.current_x = position_x
+        self.current_y = position_y
@@ -0,0 +1,68 @@
+from erika.erika_cost_model import DEFAULT_SECONDS_PER_HORIZONTAL_MICROSTEP
+from erika.erika_cost_model import DEFAULT_SECONDS_PER_VERTICAL_MICROSTEP
+from erika.erika_cost_model import ErikaCostModel
+from erika.erika_optimizer import MovementCoalescingErika
+from erika.erika_path_planner import plan_shortest_path
+from erika.erika_program import RecordingErika
+from erika.rendering_strategies.base import ErikaImageRenderingStrategy
+from erika.rendering_strategies.boustrophedon import BoustrophedonErikaImageRenderingStrategy
+
+
+class ShortestPathErikaImageRenderingStrategy(ErikaImageRenderingStrategy):
+
+    def __init__(self, horizontal_cost=None, vertical_cost=None, two_opt_passes=2, cost_model=None):
+        """
+        Only visit the positions that are actually printed, in an order that keeps the travel short. Dense images
+        (where going line by line is hard to beat) are printed in Boustrophedon order instead, whenever that is
+        estimated to be at least as fast.
+
+        :param horizontal_cost: cost of moving one step (character or microstep) to the left / right - derived from the
+        default ErikaCostModel weights if not given
+        :param vertical_cost: cost of moving one step up / down - derived from the default ErikaCostModel weights if
+        not given
+        :param two_opt_passes: number of passes for improving the path - 0 for nearest neighbour only (fastest)
+        :param cost_model: ErikaCostModel for comparing the path with the Boustrophedon order - default weights if not
+        given
+        """
+        ErikaImageRenderingStrategy.__init__(self)
+        self.horizontal_cost = horizontal_cost
+        self.vertical_cost = vertical_cost
+        self.two_opt_passes = two_opt_passes
+        self.cost_model = cost_model or ErikaCostModel()
+
+    def render(self, erika_image_abstraction):
+        step_width, step_height = erika_image_abstraction.step_size()
+        horizontal_cost = self.horizontal_cost
+        if horizontal_cost is None:
+            horizontal_cost = step_width * DEFAULT_SECONDS_PER_HORIZONTAL_MICROSTEP
+        vertical_cost = self.vertical_cost
+        if vertical_cost is None:
+            vertical_cost = step_height * DEFAULT_SECONDS_PER_VERTICAL_MICROSTEP
+        path = plan_shortest_path(erika_image_abstraction.inked_positions(), horizontal_cost, vertical_cost,
+                                  two_opt_passes=self.two_opt_passes)
+
+        boustrophedon = BoustrophedonErikaImageRenderingStrategy()
+        if self._estimate(erika_image_abstraction, boustrophedon.render) \
+                <= self._estimate(erika_image_abstraction, lambda facade: self._render_path(facade, path)):
+            boustrophedon.render(erika_image_abstraction)
+        else:
+            self._render_path(erika_image_abstraction, path)
+
+    def _estimate(self, erika_image_abstraction, render):
+        """:return: estimated printing time [s] of the given way of rendering, from a trial run that is recorded only"""
+        recording_erika = RecordingErika()
+        optimized_erika = MovementCoalescingErika(recording_erika)
+        render(erika_image_abstraction.with_erika(optimized_erika))
+        optimized_erika.flush()
+        return self.cost_model.estimate(recording_erika.program.optimized().to_bytes())
+
+    @staticmethod
+    def _render_path(erika_image_abstraction, path):
+        current_x = current_y = 0
+        for x, y in path:
+            erika_image_abstraction.move_by(x - current_x, y - current_y)
+            erika_image_abstraction.print_at(x, y)
+            current_x, current_y = x + 1, y
+
+        # end up at the start of the line below the image - just like after rendering line by line
+        erika_image_abstraction.move_by(-current_x, erika_image_abstraction.height() - current_y)
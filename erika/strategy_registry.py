@@ -0,0 +1,114 @@
+"""
+Registry of rendering strategies: name, description and capabilities of each strategy - and where to find it.
+
+Strategies are registered by module path and class name, so a strategy's module is only imported once the strategy
+is actually used. Listing the strategies (e.g. for the CLI help) imports none of them. To add a strategy, call
+register_strategy - e.g. from a plugin module - and it shows up in the CLI and is tried out by the Auto strategy.
+"""
+import importlib
+from collections import namedtuple
+
+# picks one of the registered strategies, see ErikaImageRenderer.select_strategy
+AUTO_STRATEGY = 'Auto'
+
+StrategyInfo = namedtuple('StrategyInfo', ['name', 'module_path', 'class_name', 'description',
+                                           'character_based', 'microstep_based', 'needs_random_access',
+                                           'supports_rendering_in_strips'])
+
+_strategies = {}
+
+
+class UnknownStrategyException(Exception):
+    pass
+
+
+def register_strategy(name, module_path, class_name, description, character_based=True, microstep_based=True,
+                      needs_random_access=False, supports_rendering_in_strips=False):
+    """
+    :param name: name to select the strategy by, e.g. on the command line
+    :param module_path: module containing the strategy, e.g. "erika.rendering_strategies.line_by_line"
+    :param class_name: name of the ErikaImageRenderingStrategy subclass in that module
+    :param description: list of lines describing the strategy - shown in the CLI help
+    :param character_based: True if the strategy can render ASCII art (in character steps)
+    :param microstep_based: True if the strategy can render images (in microsteps)
+    :param needs_random_access: True if the strategy visits the positions in an arbitrary order (instead of line by
+    line) - needs the whole input at once and usually takes longer to simulate
+    :param supports_rendering_in_strips: True if the strategy only needs one part of an image at a time, top to bottom
+    - see ErikaImageRenderer.render_file_in_strips
+    """
+    if name == AUTO_STRATEGY:
+        raise ValueError("The name {} is reserved".format(AUTO_STRATEGY))
+    _strategies[name] = StrategyInfo(name, module_path, class_name, list(description), character_based,
+                                     microstep_based, needs_random_access, supports_rendering_in_strips)
+
+
+def strategy_names():
+    """:return: names of all registered strategies, in the order they were registered"""
+    return list(_strategies)
+
+
+def strategy_info(name):
+    try:
+        return _strategies[name]
+    except KeyError:
+        raise UnknownStrategyException("Unknown rendering strategy {} - use one of {}"
+                                       .format(name, ", ".join(strategy_names())))
+
+
+def strategy_infos_for_class(strategy_class):
+    """:return: StrategyInfo of each name the given strategy class is registered under - empty if not registered"""
+    return [info for info in _strategies.values()
+            if (info.module_path, info.class_name) == (strategy_class.__module__, strategy_class.__name__)]
+
+
+def load_strategy_class(name):
+    """Imports the strategy's module, if not done already."""
+    info = strategy_info(name)
+    return getattr(importlib.import_module(info.module_path), info.class_name)
+
+
+def create_strategy(name):
+    """:return: a new instance of the strategy with the given name, with default parameters"""
+    return load_strategy_class(name)()
+
+
+def strategies_help():
+    """:return: description of all strategies, for the CLI help"""
+    lines = []
+    for info in _strategies.values():
+        lines.append("    " + info.name)
+        lines.extend("        * " + line for line in info.description)
+    return "\n".join(lines)
+
+
+# built-in strategies - roughly in the order of how long they take to compute, see auto_candidates
+register_strategy('LineByLine', 'erika.rendering_strategies.line_by_line', 'LineByLineErikaImageRenderingStrategy',
+                  ["render the given image line by line",
+                   "default option"],
+                  supports_rendering_in_strips=True)
+register_strategy('Interlaced', 'erika.rendering_strategies.interlaced', 'InterlacedErikaImageRenderingStrategy',
+                  ["render the given image, every even line first (starting count at 0), every odd line later"],
+                  supports_rendering_in_strips=True)
+register_strategy('Boustrophedon', 'erika.rendering_strategies.boustrophedon',
+                  'BoustrophedonErikaImageRenderingStrategy',
+                  ["render the given image line by line, every other line backwards (right to left)",
+                   "only the inked part of each line is printed - saves most of the carriage travel"],
+                  supports_rendering_in_strips=True)
+register_strategy('ShortestPath', 'erika.rendering_strategies.shortest_path', 'ShortestPathErikaImageRenderingStrategy',
+                  ["render only the non-blank characters / pixels, in an order that keeps the travel short",
+                   "best for sparse drawings"],
+                  needs_random_access=True)
+register_strategy('PerpendicularSpiralInward', 'erika.rendering_strategies.perpendicular_spiral_inward',
+                  'PerpendicularSpiralInwardErikaImageRenderingStrategy',
+                  ["render the given image, spiralling inward to the middle while going parallel to X or Y axis all "
+                   "the time"],
+                  needs_random_access=True)
+register_strategy('RandomDotFill', 'erika.rendering_strategies.random_dot_fill',
+                  'RandomDotFillErikaImageRenderingStrategy',
+                  ["render the given image, printing one random letter at a time"],
+                  needs_random_access=True)
+register_strategy('ArchimedeanSpiralOutward', 'erika.rendering_strategies.archimedean_spiral_outward',
+                  'ArchimedeanSpiralOutwardErikaImageRenderingStrategy',
+                  ["render the given image, starting from the middle, following an Archimedean spiral as closely as "
+                   "possible"],
+                  needs_random_access=True)
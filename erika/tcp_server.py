@@ -1,62 +1,67 @@
 #!/usr/bin/env python3
+"""
+Print messages received over TCP - run from the repository's main directory using command:
 
-import socket
-import string
-import time
+python3 -m erika.tcp_server [--twitter] [--menu]
 
-from erika.erika import Erika
-from erika.local_settings import ERIKA_MAX_LINE_LENGTH
-from erika.local_settings import ERIKA_PORT
-from erika.local_settings import TCP_IP, TCP_PORT, BUFFER_SIZE
-
-ALLOWED_CHARACTERS = string.digits + string.ascii_letters + "@.,;:# ()_/?!\"§+%&=*-'äöüÄÖÜßéè°|$£µ^²³\n"
-
-
-# TODO bad style, use "with" statement instead for clean closing...
-erika = Erika(ERIKA_PORT)
-erika.set_keyboard_echo(False)
+See erika/print_spooler.py for the protocol. The address, port and Erika's serial port are configured in
+erika/local_settings.py. Messages are accepted even while Erika is not connected - they are printed as soon as she
+is back, and they are not lost when the server is restarted.
 
-s = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
-s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-s.bind((TCP_IP, TCP_PORT))
-s.listen(1)
+This is the one process printing on Erika: tweets (--twitter, see erika/twitter.py) and the menu (--menu, opened by
+pressing a key on Erika, see erika/menu.py) go through the same spooler, so they take turns with the messages.
+"""
+import argparse
+import asyncio
+import logging
+import sys
 
+from erika.async_erika import run_until_complete
+from erika.job_store import DEFAULT_JOB_STORE_PATH
+from erika.job_store import JobStore
+from erika.job_store import JobStoreInUseException
+from erika.local_settings import ERIKA_MAX_LINE_LENGTH
+from erika.local_settings import ERIKA_PORT
+from erika.local_settings import TCP_IP, TCP_PORT
+from erika.menu import run_menu_on_key_press
+from erika.print_spooler import PrintSpooler
 
-def print_to_erika(sanitized_tweet):
-    erika.crlf()
+try:
+    from erika.local_settings import JOB_STORE_PATH
+except ImportError:
+    JOB_STORE_PATH = DEFAULT_JOB_STORE_PATH
 
-    xpos = 0
-    for i in range(0, len(sanitized_tweet)):
-        erika.print_ascii(sanitized_tweet[i])
-        xpos += 1
 
-        if sanitized_tweet[i] == '\n':
-            xpos = 0
+async def run_print_spooler(twitter=False, menu=False):
+    """
+    :param twitter: print the tweets with the configured hash tags, too
+    :param menu: open the menu when a key is pressed on Erika
+    """
+    with JobStore(JOB_STORE_PATH) as job_store:
+        spooler = PrintSpooler(job_store, ERIKA_MAX_LINE_LENGTH)
+        server = await spooler.start_server(TCP_IP, TCP_PORT)
+        if twitter:
+            # twython and the Twitter credentials are only needed for tweets
+            from erika.twitter import start_twitter_stream
+            start_twitter_stream(spooler, asyncio.get_event_loop())
+        try:
+            await spooler.print_forever(ERIKA_PORT, key_listener=run_menu_on_key_press if menu else None)
+        finally:
+            server.close()
+            await server.wait_closed()
 
-        if xpos >= ERIKA_MAX_LINE_LENGTH:
-            erika.crlf()
-            xpos = 0
 
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Print spooler - prints the messages received over TCP on Erika")
+    parser.add_argument("--twitter", action="store_true", help="print tweets, too")
+    parser.add_argument("--menu", action="store_true", help="open the menu when a key is pressed on Erika")
+    args = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        run_until_complete(run_print_spooler(args.twitter, args.menu))
+    except JobStoreInUseException as e:
+        sys.exit("{} - is the print spooler running already?".format(e))
 
-while True:
-    conn, addr = s.accept()
-    print('Connection address:', addr)
-    data = conn.recv(BUFFER_SIZE)
 
-    try:
-        sanitized_tweet = data.decode('utf-8')
-        sanitized_tweet = ''.join(c for c in sanitized_tweet if c in ALLOWED_CHARACTERS)
-        sanitized_tweet = sanitized_tweet.replace('@', "(at)")
-        sanitized_tweet = '({}) Message sent by {}:{}:\n{}\n'.format(time.strftime('%Y-%m-%d %H:%M:%S'), addr[0], addr[1], sanitized_tweet)
-
-        print("sanitized data:", sanitized_tweet)
-        print_to_erika(sanitized_tweet)
-        # return sanitized data
-        conn.send(sanitized_tweet.encode('utf-8'))
-    except UnicodeDecodeError as e:
-        conn.send("Invalid bytes. You must send UTF-8.\n".encode("utf-8"))
-        print("Invalid bytes", e)
-    except ConnectionError as e:
-        print("Connection error", e)
-    finally:
-        conn.close()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Turns text from the outside world (network messages, tweets) into lines Erika can print.
+
+* Sanitizing: the printable characters are the ones in charTranslation.json. Everything else is transliterated (e.g.
+  '@' -> "(at)", typographic quotes -> plain ones, accented letters -> the letter without the accent) or left out.
+  All of it is done by one str.translate over a precomputed table - unknown characters are looked at only once.
+* Wrapping: lines longer than the maximum line length are wrapped at the last space that fits, words that do not fit
+  on a line of their own are broken. Explicit line breaks are kept.
+
+Text can be passed in chunks of any size (e.g. as it arrives over the network) - lines are produced as soon as they are
+complete, no more than about one line of text is held back.
+"""
+import unicodedata
+
+from erika.erica_encoder_decoder import DDR_ASCII
+
+# replacements for characters Erika can not print - anything else is tried without accents, or left out
+TRANSLITERATIONS = {
+    '@': "(at)",
+    'µ': "μ",
+    '€': "EUR",
+    '\t': " ",
+    '[': "(",
+    ']': ")",
+    '{': "(",
+    '}': ")",
+    '\\': "/",
+    '“': '"',
+    '”': '"',
+    '„': '"',
+    '«': '"',
+    '»': '"',
+    '‘': "'",
+    '’': "'",
+    '‚': "'",
+    '–': "-",
+    '—': "-",
+    '…': "...",
+}
+
+
+class _SanitizingTable(dict):
+    """Mapping for str.translate - works out what to do about a character the first time it shows up."""
+
+    def __init__(self, printable_characters, transliterations):
+        super().__init__((ord(character), character) for character in printable_characters)
+        for character, replacement in transliterations.items():
+            if not all(c in printable_characters for c in replacement):
+                raise ValueError("Transliteration of '{}' can not be printed by Erika".format(character))
+        self._printable_characters = printable_characters
+        self._transliterations = transliterations
+
+    def __missing__(self, code_point):
+        character = chr(code_point)
+        replacement = self._transliterations.get(character)
+        if replacement is None:
+            # e.g. "á" -> "a" + combining accent, "ﬁ" -> "fi"
+            replacement = "".join(c for c in unicodedata.normalize("NFKD", character)
+                                  if c in self._printable_characters)
+        # None makes str.translate delete the character
+        self[code_point] = replacement or None
+        return self[code_point]
+
+
+class TextLayout:
+
+    def __init__(self, max_line_length, transliterations=None):
+        """
+        :param max_line_length: longer lines are wrapped
+        :param transliterations: character -> replacement, for characters Erika can not print - default:
+        TRANSLITERATIONS
+        """
+        if max_line_length < 1:
+            raise ValueError("Lines must be at least one character long")
+        self.max_line_length = max_line_length
+        self.printable_characters = frozenset(character for character in DDR_ASCII().ascii_2_ddr
+                                              if len(character) == 1)
+        self._table = _SanitizingTable(self.printable_characters,
+                                       TRANSLITERATIONS if transliterations is None else transliterations)
+
+    def sanitize(self, text):
+        """:return: the given text with only printable characters and line breaks left"""
+        return text.translate(self._table)
+
+    def lines(self, chunks):
+        """
+        Sanitize and wrap the given text.
+
+        :param chunks: the text - a string, or any iterable of strings to be read one after another
+        :return: generator of the lines to print, without line breaks - at least one
+        """
+        if isinstance(chunks, str):
+            chunks = (chunks,)
+        wrapper = _LineWrapper(self.max_line_length)
+        for chunk in chunks:
+            yield from wrapper.feed(self.sanitize(chunk))
+        yield from wrapper.close()
+
+
+class _LineWrapper:
+
+    def __init__(self, max_line_length):
+        self.max_line_length = max_line_length
+        # the current line so far - never longer than max_line_length
+        self._pending = ""
+        # the current line is the continuation of a wrapped one - leading spaces are dropped
+        self._wrapped = False
+
+    def feed(self, text):
+        """:return: generator of the lines completed by the given (sanitized) text"""
+        start = 0
+        while True:
+            line_break = text.find("\n", start)
+            end = len(text) if line_break < 0 else line_break
+            yield from self._wrap(text, start, end)
+            if line_break < 0:
+                return
+            yield from self._end_paragraph()
+            start = line_break + 1
+
+    def close(self):
+        """:return: generator of the last line"""
+        yield from self._end_paragraph()
+
+    def _end_paragraph(self):
+        # nothing left after wrapping means the paragraph is printed completely already
+        if self._pending or not self._wrapped:
+            yield self._pending
+        self._pending = ""
+        self._wrapped = False
+
+    def _wrap(self, text, start, end):
+        max_line_length = self.max_line_length
+        while start < end:
+            if self._wrapped and not self._pending:
+                while start < end and text[start] == " ":
+                    start += 1
+                if start == end:
+                    return
+            # one character more than fits - to see whether the line ends right before a space
+            taken = min(end - start, max_line_length + 1 - len(self._pending))
+            candidate = self._pending + text[start:start + taken]
+            start += taken
+            if len(candidate) <= max_line_length:
+                self._pending = candidate
+                continue
+
+            space = candidate.rfind(" ")
+            if space > 0:
+                line, self._pending = candidate[:space].rstrip(" "), candidate[space + 1:]
+            else:
+                # a word longer than a line
+                line, self._pending = candidate[:max_line_length], candidate[max_line_length:]
+            if line:
+                yield line
+            self._wrapped = True
+            self._pending = self._pending.lstrip(" ")
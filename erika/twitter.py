@@ -12,6 +12,8 @@
 * run from the repository's main directory using command:
 sudo python3 -m erika.twitter
 
+  - same as: sudo python3 -m erika.tcp_server --twitter
+
 
 
 Troubleshooting:
@@ -26,26 +28,32 @@
 
 * copy [erika3004]/erika/local_settings.py.template to [erika3004]/erika/local_settings.py and add the required credentials
 """
-import string
-from queue import Queue
+import logging
 from threading import Thread
 
 from twython import TwythonStreamer
 
-from erika.erika import Erika
+from erika import tcp_server
 from erika.local_settings import APP_KEY, APP_SECRET, OAUTH_TOKEN, OAUTH_TOKEN_SECRET
 from erika.local_settings import COMMA_SEPARATED_HASH_TAGS_TO_LISTEN_FOR
-from erika.local_settings import ERIKA_MAX_LINE_LENGTH
-from erika.local_settings import ERIKA_PORT
+from erika.print_scheduler import SOURCE_TWITTER
+
+logger = logging.getLogger(__name__)
 
 
 # simple twitter listener + printout to Erika device
 #
-# THIS MODULE NEEDS LOVE - add some proper tests, remove global state + make it look nice!
+# tweets go through the same print spooler as the messages for erika.tcp_server, in the same process - they take turns
+# with the messages and none get lost on a restart
 
 
 class MyStreamer(TwythonStreamer):
 
+    def __init__(self, spooler, loop, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spooler = spooler
+        self.loop = loop
+
     def on_success(self, data):
         if 'text' in data:
             username = data['user']['screen_name']
@@ -56,78 +64,41 @@ def on_success(self, data):
                 tweet = data['text']
 
             tweet_as_string = "{}: {}".format(username, tweet)
-            # print(tweet)
-            q.put(tweet_as_string)
+            logger.debug("Tweet: %s", tweet_as_string)
+            # the spooler lives in the event loop's thread
+            lines = tweet_lines(tweet_as_string, self.spooler.text_layout)
+            self.loop.call_soon_threadsafe(self.spooler.submit_lines, lines, username, SOURCE_TWITTER)
 
     def on_error(self, status_code, data):
-        print(status_code)
+        logger.warning("Twitter stream error %s", status_code)
 
         # Want to stop trying to get data because of the error?
         # Uncomment the next line!
         # self.disconnect()
 
 
-q = Queue()
-
-# TODO bad style, use "with" statement instead for clean closing...
-erika = Erika(ERIKA_PORT)
-
-# For local tests
-# erika = CharacterBasedErikaMock(output_after_each_step=True)
-
+def tweet_lines(tweet_as_string, text_layout):
+    """:return: generator of the lines to print for the given tweet, see TextLayout"""
+    return text_layout.lines(tweet_as_string)
 
-def sanitize_tweet(tweet_as_string):
-    allowed_characters = string.digits + string.ascii_letters + "@.,;:# ()_/?!\"§+%&=*-'äöüÄÖÜßéè°|$£µ^²³"
-    sanitized_tweet = tweet_as_string
-    sanitized_tweet = ''.join(c for c in sanitized_tweet if c in allowed_characters)
-    sanitized_tweet = sanitized_tweet.replace('@', "(at)")
 
-    return sanitized_tweet
-
-
-def twitter_worker():
-    stream = MyStreamer(APP_KEY, APP_SECRET,
-                        OAUTH_TOKEN, OAUTH_TOKEN_SECRET)
+def twitter_worker(spooler, loop):
+    stream = MyStreamer(spooler, loop, APP_KEY, APP_SECRET, OAUTH_TOKEN, OAUTH_TOKEN_SECRET)
     stream.statuses.filter(track=COMMA_SEPARATED_HASH_TAGS_TO_LISTEN_FOR)
 
 
-def erika_worker():
-    while True:
-        tweet_as_string = q.get(block=True)
-        erika.crlf()
-        print("### DEBUG (tweet):" + tweet_as_string)
-
-        sanitized_tweet = sanitize_tweet(tweet_as_string)
-
-        print("### DEBUG (print string):" + sanitized_tweet)
-        for i in range(0, len(sanitized_tweet), ERIKA_MAX_LINE_LENGTH):
-            # print('### DEBUG (chunk): ' + sanitized_tweet[i:i+ERIKA_MAX_LINE_LENGTH])
-            erika.print_ascii(sanitized_tweet[i:i + ERIKA_MAX_LINE_LENGTH])
-            erika.crlf()
-
-
+def start_twitter_stream(spooler, loop):
+    """
+    Queue the tweets with the configured hash tags on the given spooler.
 
-# block until all tasks are done
-# q.join()
+    :param loop: the event loop the spooler runs in
+    """
+    # the stream blocks - it gets a thread of its own
+    Thread(target=twitter_worker, args=(spooler, loop), daemon=True).start()
 
-#####
-# TODO: shutdown
-# stop workers
-# for i in range(num_worker_threads):
-#    q.put(None)
-# for t in threads:
-#    t.join()
-####
 
 def main():
-    threads = []
-    t = Thread(target=twitter_worker)
-    t.start()
-    threads.append(t)
-
-    t = Thread(target=erika_worker)
-    t.start()
-    threads.append(t)
+    tcp_server.main(["--twitter"])
 
 
 if __name__ == "__main__":
@@ -115,6 +115,8 @@ async def read(self, fh, off, size):
     async def write(self, fh, off, buf):
         #assert fh == self.hello_inode
         self.erika.print_ascii(buf.decode("utf-8"))
+        # written text is expected on paper right away, not only once the next line break comes
+        self.erika.flush()
         print(buf)
         return len(buf)
 
@@ -120,14 +120,14 @@ def test_erika_will_make_a_move(self):
             game._print_initial_field()
             game._cursor_to_start_position()
 
-            any_x_on_field = any(['x' in line for line in my_erika.canvas])
-            any_o_on_field = any(['o' in line for line in my_erika.canvas])
+            any_x_on_field = any(['x' in line for line in my_erika.canvas.lines()])
+            any_o_on_field = any(['o' in line for line in my_erika.canvas.lines()])
             self.assertFalse(any_x_on_field, "player should not have moved yet")
             self.assertFalse(any_o_on_field, "erika should not have moved yet")
 
             game.ai_select()
 
-            any_x_on_field = any(['x' in line for line in my_erika.canvas])
-            any_o_on_field = any(['o' in line for line in my_erika.canvas])
+            any_x_on_field = any(['x' in line for line in my_erika.canvas.lines()])
+            any_o_on_field = any(['o' in line for line in my_erika.canvas.lines()])
             self.assertFalse(any_x_on_field, "player should not have moved yet")
             self.assertTrue(any_o_on_field, "erika should have moved")
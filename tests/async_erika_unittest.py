@@ -0,0 +1,175 @@
+import asyncio
+import os
+import select
+import unittest
+
+import serial
+
+from erika.async_erika import AsyncErika
+from erika.async_erika import BlockingErika
+from erika.async_erika import ErikaConnectionClosedException
+from erika.async_erika import run_until_complete
+
+
+def read_available_bytes(file_descriptor, timeout=1.0):
+    data = b""
+    while select.select([file_descriptor], [], [], timeout)[0]:
+        try:
+            data += os.read(file_descriptor, 1024)
+        except OSError:
+            # the port side was closed - nothing more to come
+            break
+        timeout = 0.1
+    return data
+
+
+class AsyncErikaTest(unittest.TestCase):
+    """Runs AsyncErika on a pseudo terminal - the test plays Erika on the other end."""
+
+    def setUp(self):
+        self.erika_side, port_side = os.openpty()
+        self.port_name = os.ttyname(port_side)
+        os.close(port_side)
+
+    def tearDown(self):
+        os.close(self.erika_side)
+
+    def run_with_erika(self, test_coroutine, **kwargs):
+        async def run():
+            async with AsyncErika(self.port_name, **kwargs) as erika:
+                return await test_coroutine(erika)
+
+        return run_until_complete(asyncio.wait_for(run(), 10))
+
+    def test_sends_the_same_bytes_as_erika(self):
+        async def print_something(erika):
+            await erika.print_ascii("ab")
+            await erika.move_right_microsteps(3)
+            await erika.move_down_microstep()
+            await erika.crlf()
+            await erika.flush()
+
+        self.run_with_erika(print_something)
+        self.assertEqual(b'\x61\x4e\xa5\x03\x81\x77', read_available_bytes(self.erika_side))
+
+    def test_everything_queued_is_sent_before_closing(self):
+        async def print_lines(erika):
+            for i in range(100):
+                await erika.print_ascii("a")
+                await erika.crlf()
+
+        self.run_with_erika(print_lines, write_queue_size=4)
+        self.assertEqual(b'\x61\x77' * 100, read_available_bytes(self.erika_side))
+
+    def test_raw_bytes(self):
+        async def send_raw_bytes(erika):
+            await erika.write_bytes(memoryview(b'\x81\x82'))
+
+        self.run_with_erika(send_raw_bytes)
+        self.assertEqual(b'\x81\x82', read_available_bytes(self.erika_side))
+
+    def test_without_rts_cts(self):
+        async def print_something(erika):
+            await erika.print_ascii("ab")
+
+        self.run_with_erika(print_something, rts_cts=False)
+        self.assertEqual(b'\x61\x4e', read_available_bytes(self.erika_side))
+
+    def test_read_sends_everything_before_waiting(self):
+        async def read_key(erika):
+            await erika.print_ascii("a")
+            reading = asyncio.ensure_future(erika.read())
+            # Erika sees the "a" before anybody presses a key
+            await asyncio.get_event_loop().run_in_executor(None, read_available_bytes, self.erika_side)
+            os.write(self.erika_side, b'\x4e')
+            return await reading
+
+        self.assertEqual("b", self.run_with_erika(read_key))
+
+    def test_blocking_erika_from_another_thread(self):
+        def use_erika(erika):
+            with erika:
+                erika.print_ascii("a")
+                erika._cursor_back(2)
+                return erika.read()
+
+        async def run_in_thread(erika):
+            os.write(self.erika_side, b'\x4e')
+            loop = asyncio.get_event_loop()
+            key = await loop.run_in_executor(None, use_erika, BlockingErika(erika, loop))
+            # still open
+            await erika.crlf()
+            return key
+
+        self.assertEqual("b", self.run_with_erika(run_in_thread))
+        self.assertEqual(b'\x61' + b'\x74' * 4 + b'\x77', read_available_bytes(self.erika_side))
+
+    def test_keys(self):
+        async def collect_keys(erika):
+            os.write(self.erika_side, b'\x61\x4e\x77')
+            keys = []
+            async for key in erika.keys():
+                keys.append(key)
+                if len(keys) == 3:
+                    break
+            return keys
+
+        self.assertEqual(["a", "b", "\n"], self.run_with_erika(collect_keys))
+
+    def test_keys_end_when_the_connection_is_closed(self):
+        async def collect_keys(erika):
+            keys = []
+            erika._transport.close()
+            async for key in erika.keys():
+                keys.append(key)
+            self.assertRaises(ErikaConnectionClosedException, erika._transport.write, b'\x61')
+            return keys
+
+        self.assertEqual([], self.run_with_erika(collect_keys))
+
+    def test_errors_from_sending_show_up_on_flush(self):
+        async def print_after_closing(erika):
+            erika._transport.close()
+            await erika.print_ascii("a")
+            with self.assertRaises(ErikaConnectionClosedException):
+                await erika.flush()
+
+        self.run_with_erika(print_after_closing)
+
+    def test_already_opened_connection(self):
+        async def print_something():
+            connection = serial.Serial(self.port_name, timeout=0)
+            async with AsyncErika(None, connection=connection) as erika:
+                await erika.print_ascii("a")
+            self.assertFalse(connection.is_open)
+
+        run_until_complete(asyncio.wait_for(print_something(), 10))
+        self.assertEqual(b'\x61', read_available_bytes(self.erika_side))
+
+
+class RunUntilCompleteTest(unittest.TestCase):
+
+    def test_tasks_left_over_are_cancelled(self):
+        cancelled = []
+
+        async def wait_forever():
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def run():
+            asyncio.ensure_future(wait_forever())
+            await asyncio.sleep(0)
+            return "done"
+
+        self.assertEqual("done", run_until_complete(run()))
+        self.assertEqual([True], cancelled)
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
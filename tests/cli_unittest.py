@@ -2,10 +2,17 @@
 import unittest
 import unittest.mock
 
+from erika.cli import compile_job_file
 from erika.cli import create_argument_parser
+from erika.cli import get_erika_for_given_args
+from erika.cli import image_options_for_given_args
 from erika.cli import print_ascii_art
 from erika.cli import print_demo
+from erika.cli import print_estimate
+from erika.cli import replay_job_file
 from erika.cli import run_tic_tac_toe
+from erika.image_converter import DEFAULT_CACHE_DIRECTORY
+from erika.image_converter import PAGE_WIDTH_MICROSTEPS
 
 
 class CliTest(unittest.TestCase):
@@ -114,6 +121,74 @@ def test_argument_parser_parses_arguments_for_tictactoe(self):
         self.assertTrue(args.dry_run)
         self.assertIsNone(args.serial_port)
 
+    def test_argument_parser_parses_arguments_for_compile_and_replay(self):
+        parser = create_argument_parser()
+
+        args = parser.parse_args(["compile", "-f", "test_file.txt", "-s", "Interlaced", "-o", "job.erika"])
+        self.assertEqual(args.func, compile_job_file)
+        self.assertEqual(args.file, "test_file.txt")
+        self.assertEqual(args.strategy, "Interlaced")
+        self.assertEqual(args.output, "job.erika")
+
+        args = parser.parse_args(["compile", "--file", "test_file.txt", "--output", "job.erika"])
+        self.assertEqual(args.strategy, "LineByLine")
+
+        args = parser.parse_args(["replay", "--file", "job.erika", "--serial-port", "/dev/ttyACM0"])
+        self.assertEqual(args.func, replay_job_file)
+        self.assertEqual(args.file, "job.erika")
+        self.assertEqual(args.serial_port, "/dev/ttyACM0")
+
+    def test_argument_parser_parses_strip_height(self):
+        parser = create_argument_parser()
+
+        args = parser.parse_args(["render_image", "-d", "-f", "test_file.png", "--strip-height", "64"])
+        self.assertEqual(args.func, print_ascii_art)
+        self.assertEqual(args.strip_height, 64)
+
+        args = parser.parse_args(["render_image", "-d", "-f", "test_file.png"])
+        self.assertIsNone(args.strip_height)
+
+    @unittest.mock.patch('erika.image_converter.WrappedImage')
+    @unittest.mock.patch('erika.erika_mock.MicrostepBasedErikaMock')
+    def test_dry_run_in_strips_does_not_load_the_whole_image(self, microstep_based_erika_mock, wrapped_image):
+        parser = create_argument_parser()
+        args = parser.parse_args(["render_image", "-d", "-f", "tests/test_resources/test_image_color.bmp",
+                                  "--strip-height", "64"])
+
+        self.assertIs(microstep_based_erika_mock.return_value, get_erika_for_given_args(args))
+        wrapped_image.assert_not_called()
+
+    def test_argument_parser_parses_image_conversion_options(self):
+        parser = create_argument_parser()
+
+        args = parser.parse_args(["render_image", "-d", "-f", "test_file.png"])
+        self.assertEqual({'cache_directory': DEFAULT_CACHE_DIRECTORY}, image_options_for_given_args(args))
+
+        args = parser.parse_args(["compile", "-f", "test_file.png", "-o", "job.erika", "--dithering", "atkinson",
+                                  "--fit-to-page", "--no-cache"])
+        self.assertEqual({'dithering': 'atkinson', 'width': PAGE_WIDTH_MICROSTEPS}, image_options_for_given_args(args))
+
+        args = parser.parse_args(["estimate", "-f", "test_file.png", "--dithering", "bayer"])
+        self.assertEqual('bayer', args.dithering)
+
+        args = parser.parse_args(["render_image", "-d", "-f", "test_file.png", "--glyphs", "--no-cache"])
+        self.assertEqual({'glyph_halftone': True}, image_options_for_given_args(args))
+
+    def test_argument_parser_parses_arguments_for_estimate(self):
+        parser = create_argument_parser()
+
+        args = parser.parse_args(["estimate", "-f", "test_file.txt", "-s", "RandomDotFill"])
+        self.assertEqual(args.func, print_estimate)
+        self.assertEqual(args.file, "test_file.txt")
+        self.assertEqual(args.strategy, "RandomDotFill")
+        self.assertIsNone(args.calibration)
+
+        args = parser.parse_args(["estimate", "-f", "test_file.txt", "-s", "Auto"])
+        self.assertEqual(args.strategy, "Auto")
+
+        args = parser.parse_args(["estimate", "-f", "test_file.txt", "--calibration", "measurements.json"])
+        self.assertEqual(args.calibration, "measurements.json")
+
     def test_argument_parser_prints_help(self):
         """simple test that ArgumentParser will print help text and exit"""
         # arrange
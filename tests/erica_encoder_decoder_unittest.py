@@ -0,0 +1,42 @@
+import unittest
+
+from erika.erica_encoder_decoder import DDR_ASCII
+from erika.erica_encoder_decoder import FALLBACK_IGNORE
+from erika.erica_encoder_decoder import UnknownCharacterException
+
+
+class DdrAsciiTest(unittest.TestCase):
+
+    def test_encode_bytes_matches_encode(self):
+        ddr_ascii = DDR_ASCII()
+        text = "Hello World! äöüß 0123456789\n"
+        expected = b''.join(bytes.fromhex(ddr_ascii.encode(c)) for c in text)
+        self.assertEqual(expected, ddr_ascii.encode_bytes(text))
+
+    def test_encode_bytes_empty(self):
+        self.assertEqual(b'', DDR_ASCII().encode_bytes(""))
+
+    def test_encode_bytes_strict_fallback(self):
+        ddr_ascii = DDR_ASCII()
+        with self.assertRaises(UnknownCharacterException):
+            ddr_ascii.encode_bytes("a€b")
+
+    def test_encode_bytes_ignore_fallback(self):
+        ddr_ascii = DDR_ASCII()
+        self.assertEqual(ddr_ascii.encode_bytes("ab"), ddr_ascii.encode_bytes("a€b", fallback=FALLBACK_IGNORE))
+
+    def test_encode_bytes_replacement_fallback(self):
+        ddr_ascii = DDR_ASCII()
+        self.assertEqual(ddr_ascii.encode_bytes("a?b?"), ddr_ascii.encode_bytes("a€b€", fallback="?"))
+
+        # the fallback must be printable itself
+        with self.assertRaises(UnknownCharacterException):
+            ddr_ascii.encode_bytes("a€b", fallback="€")
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
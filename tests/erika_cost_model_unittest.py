@@ -0,0 +1,70 @@
+import unittest
+
+from erika.erika_cost_model import CostFeatures
+from erika.erika_cost_model import ErikaCostModel
+from erika.erika_cost_model import SECONDS_PER_BYTE
+from erika.erika_cost_model import extract_cost_features
+from erika.erika_image_renderer import ErikaImageRenderer
+
+
+class ErikaCostModelTest(unittest.TestCase):
+
+    def test_extract_cost_features(self):
+        # "aab", 2 half steps right, microsteps -3, 1 microstep down, correction mode on + off, crlf, alarm
+        data = b'\x61\x61\x4e' + b'\x73\x73' + b'\xa5\xfd' + b'\x81' + b'\x8c\x8b' + b'\x77' + b'\xaa\x32'
+        self.assertEqual(CostFeatures(bytes=13, characters=2, repeated_characters=1,
+                                      horizontal_travel=30 + 10 + 3 + 37, vertical_travel=1, line_feeds=1,
+                                      mode_switches=2, alarm_seconds=1.0),
+                         extract_cost_features(data))
+
+    def test_extract_cost_features_for_arguments_that_look_like_commands(self):
+        # microsteps with the argument A5 (-91), alarm with the argument AA (3.4 s), microsteps with the argument 77 -
+        # none of the arguments is a command of its own; the trailing A5 has no argument and is ignored
+        data = b'\xa5\xa5' + b'\xaa\xaa' + b'\xa5\x77' + b'\x61' + b'\xa5'
+        self.assertEqual(CostFeatures(bytes=8, characters=1, repeated_characters=0,
+                                      horizontal_travel=91 + 119 + 10, vertical_travel=0, line_feeds=0,
+                                      mode_switches=0, alarm_seconds=3.4),
+                         extract_cost_features(data))
+
+    def test_extract_cost_features_in_reverse_printing_mode(self):
+        # reverse printing on, "ab", reverse printing off, "a", crlf - back to 10 microsteps left of the start
+        data = b'\x8e' + b'\x61\x62' + b'\x8d' + b'\x61' + b'\x77'
+        self.assertEqual(CostFeatures(bytes=6, characters=3, repeated_characters=0, horizontal_travel=30 + 10,
+                                      vertical_travel=0, line_feeds=1, mode_switches=2, alarm_seconds=0.0),
+                         extract_cost_features(data))
+        self.assertEqual(CostFeatures(0, 0, 0, 0, 0, 0, 0, 0.0), extract_cost_features(b''))
+
+    def test_estimate(self):
+        cost_model = ErikaCostModel(seconds_per_character=1, seconds_per_repeated_character=0.5,
+                                    seconds_per_horizontal_microstep=0.01, seconds_per_vertical_microstep=0,
+                                    seconds_per_line_feed=2, seconds_per_mode_switch=0)
+        self.assertAlmostEqual(4 * SECONDS_PER_BYTE + 1 + 0.5 + 0.4 + 2, cost_model.estimate(b'\x61\x61\x77\x81'))
+
+    def test_calibrated(self):
+        expected_cost_model = ErikaCostModel(seconds_per_byte=0.01, seconds_per_character=0.2,
+                                             seconds_per_repeated_character=0.03,
+                                             seconds_per_horizontal_microstep=0.004,
+                                             seconds_per_vertical_microstep=0.02, seconds_per_line_feed=0.5,
+                                             seconds_per_mode_switch=0.1)
+        samples = [b'\x61\x4e\x61', b'\x61\x61\x61\x77', b'\xa5\x10\x81\x81', b'\x8c\x61\x8b', b'\x75\x75\x73',
+                   b'\x61\x77\x77\xaa\x05', b'\xa5\xf0\x4e\x4e', b'\x81']
+        measurements = [(data, expected_cost_model.estimate(data)) for data in samples]
+
+        cost_model = ErikaCostModel.calibrated(measurements)
+        for data in samples:
+            self.assertAlmostEqual(expected_cost_model.estimate(data), cost_model.estimate(data))
+
+    def test_estimate_duration_for_rendering_strategy(self):
+        file_path = 'tests/test_resources/test_ascii_art_small.txt'
+        line_by_line = ErikaImageRenderer(None, 'LineByLine').estimate_duration(file_path)
+        random_dot_fill = ErikaImageRenderer(None, 'RandomDotFill').estimate_duration(file_path)
+        self.assertGreater(line_by_line, 0)
+        self.assertLess(line_by_line, random_dot_fill)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
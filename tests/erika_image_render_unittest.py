@@ -1,7 +1,24 @@
+import os
+import tempfile
 import unittest
 
+from PIL import Image
+
 from erika.erika_image_renderer import *
 from erika.erika_mock import *
+from erika.erika_path_planner import plan_shortest_path
+from erika.erika_program import OpCode
+from erika.glyph_halftone import image_to_glyph_lines
+from erika.image_converter import DITHERING_BAYER
+from erika.image_converter import DITHERING_FLOYD_STEINBERG
+from erika.rendering_strategies.archimedean_spiral_outward import ArchimedeanSpiralOutwardErikaImageRenderingStrategy
+from erika.rendering_strategies.base import PrintedMap
+from erika.rendering_strategies.boustrophedon import BoustrophedonErikaImageRenderingStrategy
+from erika.rendering_strategies.interlaced import InterlacedErikaImageRenderingStrategy
+from erika.rendering_strategies.line_by_line import LineByLineErikaImageRenderingStrategy
+from erika.rendering_strategies.perpendicular_spiral_inward import PerpendicularSpiralInwardErikaImageRenderingStrategy
+from erika.rendering_strategies.random_dot_fill import RandomDotFillErikaImageRenderingStrategy
+from erika.rendering_strategies.shortest_path import ShortestPathErikaImageRenderingStrategy
 from tests.erika_mock_unittest import assert_print_output
 
 
@@ -92,6 +109,35 @@ def testPerpendicularSpiralInwardErikaImageRenderingStrategy(self):
         self.helper_test_ErikaImageRenderingStrategy_wide(strategy)
         self.helper_test_ErikaImageRenderingStrategy_real_image(strategy)
 
+    def testPerpendicularSpiralInwardErikaImageRenderingStrategyWithoutSkipping(self):
+        strategy = PerpendicularSpiralInwardErikaImageRenderingStrategy(skip_blank_positions=False)
+        self.helper_test_ErikaImageRenderingStrategy_square(strategy)
+        self.helper_test_ErikaImageRenderingStrategy_high(strategy)
+        self.helper_test_ErikaImageRenderingStrategy_wide(strategy)
+        self.helper_test_ErikaImageRenderingStrategy_real_image(strategy)
+
+    def testPerpendicularSpiralInwardErikaImageRenderingStrategyOrder(self):
+        self.assertEqual([(0, 0), (1, 0), (2, 0), (2, 1), (2, 2), (1, 2), (0, 2), (0, 1), (1, 1)],
+                         list(PerpendicularSpiralInwardErikaImageRenderingStrategy._spiral_coordinates(3, 3)))
+        self.assertEqual([(0, 0), (0, 1), (0, 2)],
+                         list(PerpendicularSpiralInwardErikaImageRenderingStrategy._spiral_coordinates(1, 3)))
+
+    def testPerpendicularSpiralInwardErikaImageRenderingStrategyForLargeImages(self):
+        """no recursion - big images work, too"""
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'frame.png')
+            image = Image.new('L', (1200, 1200), 255)
+            image.putpixel((0, 0), 0)
+            image.putpixel((600, 600), 0)
+            image.save(file_path)
+
+            recording_erika = RecordingErika()
+            renderer = ErikaImageRenderer(recording_erika, "test: strategy will be set explicitly")
+            renderer.render_file_for_fixed_strategy(file_path, PerpendicularSpiralInwardErikaImageRenderingStrategy())
+            self.assertEqual([(OpCode.PRINT_PIXEL, None, None),
+                              (OpCode.MOVE_MICROSTEPS, 599, 600),
+                              (OpCode.PRINT_PIXEL, None, None)], recording_erika.program.optimized().ops)
+
     def testRandomDotFillErikaImageRenderingStrategy(self):
         """simple test that printing as one random dot at a time works"""
         strategy = RandomDotFillErikaImageRenderingStrategy()
@@ -100,6 +146,32 @@ def testRandomDotFillErikaImageRenderingStrategy(self):
         self.helper_test_ErikaImageRenderingStrategy_wide(strategy)
         self.helper_test_ErikaImageRenderingStrategy_real_image(strategy)
 
+    def testRandomDotFillErikaImageRenderingStrategyOptions(self):
+        """seeded, blank-skipping and tiled variants still print everything"""
+        for strategy in [RandomDotFillErikaImageRenderingStrategy(seed=1),
+                         RandomDotFillErikaImageRenderingStrategy(skip_blank_positions=True),
+                         RandomDotFillErikaImageRenderingStrategy(tile_size=2),
+                         RandomDotFillErikaImageRenderingStrategy(skip_blank_positions=True, tile_size=4)]:
+            self.helper_test_ErikaImageRenderingStrategy_square(strategy)
+            self.helper_test_ErikaImageRenderingStrategy_wide(strategy)
+            self.helper_test_ErikaImageRenderingStrategy_real_image(strategy)
+
+    def testRandomDotFillErikaImageRenderingStrategyOrder(self):
+        lines = ["ab  ", "    ", "  cd"]
+        facade = ErikaAndAsciiArtInputFacade(RecordingErika(), lines)
+
+        positions = RandomDotFillErikaImageRenderingStrategy(seed=7)._random_positions(facade)
+        self.assertEqual(positions, RandomDotFillErikaImageRenderingStrategy(seed=7)._random_positions(facade))
+        self.assertEqual(sorted([x, y] for y in range(3) for x in range(4)), sorted(positions))
+
+        positions = RandomDotFillErikaImageRenderingStrategy(skip_blank_positions=True)._random_positions(facade)
+        self.assertEqual([[0, 0], [1, 0], [2, 2], [3, 2]], sorted(positions))
+
+        # tiles: upper left, upper right, lower right, lower left
+        positions = RandomDotFillErikaImageRenderingStrategy(tile_size=2)._random_positions(facade)
+        tiles = [(x // 2, y // 2) for x, y in positions]
+        self.assertEqual([(0, 0)] * 4 + [(1, 0)] * 4 + [(1, 1)] * 2 + [(0, 1)] * 2, tiles)
+
     def testArchimedeanSpiralOutwardErikaImageRenderingStrategy(self):
         """simple test that printing following along an archimedean spiral works"""
         strategy = ArchimedeanSpiralOutwardErikaImageRenderingStrategy()
@@ -108,6 +180,91 @@ def testArchimedeanSpiralOutwardErikaImageRenderingStrategy(self):
         self.helper_test_ErikaImageRenderingStrategy_wide(strategy)
         self.helper_test_ErikaImageRenderingStrategy_real_image(strategy)
 
+    def testBoustrophedonErikaImageRenderingStrategy(self):
+        """simple test that printing every other line backwards works"""
+        strategy = BoustrophedonErikaImageRenderingStrategy()
+        self.helper_test_ErikaImageRenderingStrategy_square(strategy)
+        self.helper_test_ErikaImageRenderingStrategy_high(strategy)
+        self.helper_test_ErikaImageRenderingStrategy_wide(strategy)
+        self.helper_test_ErikaImageRenderingStrategy_real_image(strategy)
+
+    def testBoustrophedonErikaImageRenderingStrategyOnlyPrintsInkedExtent(self):
+        """lines are trimmed to their inked part, every other inked line is printed backwards"""
+        with CharacterBasedErikaMock(6, 4, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+            renderer = ErikaImageRenderer(my_erika, "test: strategy will be set explicitly")
+            renderer.render_lines_for_fixed_strategy([" ab", "", "   cd ", "e"],
+                                                     BoustrophedonErikaImageRenderingStrategy())
+            assert_print_output(self, my_erika, [" ab   ", "      ", "   cd ", "e     "])
+            # back at the start of the line after the image
+            self.assertEqual((0, 4), (my_erika.canvas_x, my_erika.canvas_y))
+
+        recording_erika = RecordingErika()
+        facade = ErikaAndAsciiArtInputFacade(recording_erika, [" ab", "", "   cd ", "e"])
+        BoustrophedonErikaImageRenderingStrategy().render(facade)
+        program = recording_erika.program.optimized()
+        self.assertEqual([(OpCode.MOVE_CHARACTERS, 1, 0),
+                          (OpCode.PRINT_TEXT, "ab", None),
+                          (OpCode.MOVE_CHARACTERS, 2, 2),
+                          (OpCode.PRINT_TEXT_REVERSED, "dc", None),
+                          (OpCode.MOVE_CHARACTERS, -3, 1),
+                          (OpCode.PRINT_TEXT, "e", None),
+                          (OpCode.MOVE_CHARACTERS, -1, 1)], program.ops)
+
+    def testBoustrophedonErikaImageRenderingStrategyForSparseImages(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'sparse.png')
+            image = Image.new('L', (6, 3), 255)
+            for x, y in [(1, 0), (2, 0), (0, 1), (2, 1), (5, 1), (3, 2)]:
+                image.putpixel((x, y), 0)
+            image.save(file_path)
+
+            with MicrostepBasedErikaMock(6, 4, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+                renderer = ErikaImageRenderer(my_erika, "test: strategy will be set explicitly")
+                renderer.render_file_for_fixed_strategy(file_path, BoustrophedonErikaImageRenderingStrategy())
+                assert_print_output(self, my_erika, [" XX   ", "X X  X", "   X  ", "      "])
+                self.assertEqual((0, 3), (my_erika.canvas_x, my_erika.canvas_y))
+
+    def testShortestPathErikaImageRenderingStrategy(self):
+        """simple test that printing only the non-blank positions, in a short order, works"""
+        strategy = ShortestPathErikaImageRenderingStrategy()
+        self.helper_test_ErikaImageRenderingStrategy_square(strategy)
+        self.helper_test_ErikaImageRenderingStrategy_high(strategy)
+        self.helper_test_ErikaImageRenderingStrategy_wide(strategy)
+        self.helper_test_ErikaImageRenderingStrategy_real_image(strategy)
+
+    def testShortestPathErikaImageRenderingStrategyIsFasterForSparseImages(self):
+        lines = ["x" + " " * 40 + "y", "", "", " " * 41 + "z"]
+        with CharacterBasedErikaMock(42, 5, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+            renderer = ErikaImageRenderer(my_erika, "test: strategy will be set explicitly")
+            renderer.render_lines_for_fixed_strategy(lines, ShortestPathErikaImageRenderingStrategy())
+            assert_print_output(self, my_erika, [line.ljust(42) for line in lines])
+            self.assertEqual((0, 4), (my_erika.canvas_x, my_erika.canvas_y))
+
+        def estimate(strategy):
+            recording_erika = RecordingErika()
+            strategy.render(ErikaAndAsciiArtInputFacade(recording_erika, lines))
+            return ErikaCostModel().estimate(recording_erika.program.optimized().to_bytes())
+
+        self.assertLess(estimate(ShortestPathErikaImageRenderingStrategy()),
+                        estimate(LineByLineErikaImageRenderingStrategy()))
+
+    def testShortestPathErikaImageRenderingStrategyHonoursZeroCosts(self):
+        lines = ["x  y", "", " z"]
+        strategy = ShortestPathErikaImageRenderingStrategy(horizontal_cost=0, vertical_cost=0)
+        with unittest.mock.patch('erika.rendering_strategies.shortest_path.plan_shortest_path',
+                                 wraps=plan_shortest_path) as planner:
+            strategy.render(ErikaAndAsciiArtInputFacade(RecordingErika(), lines))
+        positions, horizontal_cost, vertical_cost = planner.call_args[0]
+        self.assertEqual((0, 0), (horizontal_cost, vertical_cost))
+
+    def testShortestPathErikaImageRenderingStrategyIsNeverSlowerThanBoustrophedon(self):
+        for file_path, image_options in [('tests/test_resources/ubuntu-logo32.png', {'width': 200}),
+                                         ('tests/test_resources/test_image_color.bmp', {}),
+                                         ('tests/test_resources/test_ascii_art.txt', {})]:
+            shortest_path = ErikaImageRenderer(None, 'ShortestPath', image_options).estimate_duration(file_path)
+            boustrophedon = ErikaImageRenderer(None, 'Boustrophedon', image_options).estimate_duration(file_path)
+            self.assertLessEqual(shortest_path, boustrophedon, file_path)
+
     def testArchimedeanSpiralOutwardErikaImageRenderingStrategy2(self):
         """test with a bigger file + two spirals"""
         with CharacterBasedErikaMock(60, 30, inside_unit_test=True, exception_if_overprinted=False) as my_erika:
@@ -122,6 +279,133 @@ def testArchimedeanSpiralOutwardErikaImageRenderingStrategy2(self):
             renderer.render_file_for_fixed_strategy('tests/test_resources/test_ascii_art.txt', strategy2)
             # my_erika.test_debug_helper_print_canvas()
 
+    def testBlankRunsAreSkippedInImageLines(self):
+        """blank runs are jumped over with one move, blank lines only move the paper"""
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'sparse.png')
+            image = Image.new('L', (5, 3), 255)
+            for x, y in [(0, 0), (3, 0), (4, 0), (3, 2)]:
+                image.putpixel((x, y), 0)
+            image.save(file_path)
+
+            recording_erika = RecordingErika()
+            facade = ErikaAndImageInputFacade(recording_erika, WrappedImage(file_path))
+            LineByLineErikaImageRenderingStrategy().render(facade)
+            self.assertEqual([(OpCode.PRINT_PIXEL, None, None),
+                              (OpCode.MOVE_MICROSTEPS, 2, 0),
+                              (OpCode.PRINT_PIXEL, None, None),
+                              (OpCode.PRINT_PIXEL, None, None),
+                              (OpCode.MOVE_MICROSTEPS, -5, 0),
+                              (OpCode.MOVE_MICROSTEPS, 0, 1),
+                              (OpCode.MOVE_MICROSTEPS, 0, 1),
+                              (OpCode.MOVE_MICROSTEPS, 3, 0),
+                              (OpCode.PRINT_PIXEL, None, None),
+                              (OpCode.MOVE_MICROSTEPS, -4, 0),
+                              (OpCode.MOVE_MICROSTEPS, 0, 1)], recording_erika.program.ops)
+
+            with MicrostepBasedErikaMock(5, 3, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+                renderer = ErikaImageRenderer(my_erika, "test: strategy will be set explicitly")
+                renderer.render_file_for_fixed_strategy(file_path, InterlacedErikaImageRenderingStrategy())
+                assert_print_output(self, my_erika, ["X  XX", "     ", "   X "])
+
+    def testRenderingInStrips(self):
+        """rendering strip by strip gives the same result - even for strategies that end up somewhere else"""
+        for strategy in [LineByLineErikaImageRenderingStrategy(), InterlacedErikaImageRenderingStrategy(),
+                         BoustrophedonErikaImageRenderingStrategy()]:
+            with MicrostepBasedErikaMock(200, 201, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+                renderer = ErikaImageRenderer(my_erika, "test: strategy will be set explicitly")
+                # PNG images are decoded as a whole
+                with self.assertWarns(UserWarning):
+                    renderer.render_file_in_strips('tests/test_resources/ubuntu-logo32.png', strategy, strip_height=16)
+                expected_lines = ["".join("X" if pixel_set else " " for pixel_set in row)
+                                  for row in WrappedImage('tests/test_resources/ubuntu-logo32.png').rows()]
+                assert_print_output(self, my_erika, expected_lines)
+                self.assertEqual((0, 200), (my_erika.canvas_x, my_erika.canvas_y))
+
+        renderer = ErikaImageRenderer(RecordingErika(), "test: strategy will be set explicitly")
+        self.assertRaises(Exception, renderer.render_file_in_strips, 'tests/test_resources/ubuntu-logo32.png',
+                          RandomDotFillErikaImageRenderingStrategy())
+
+    def testRenderingWithImageOptions(self):
+        image_options = {'dithering': DITHERING_FLOYD_STEINBERG, 'width': 50}
+        expected_image = WrappedImage('tests/test_resources/ubuntu-logo32.png', **image_options)
+        expected_lines = ["".join("X" if pixel_set else " " for pixel_set in row) for row in expected_image.rows()]
+
+        with MicrostepBasedErikaMock(50, 50, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+            renderer = ErikaImageRenderer(my_erika, 'Boustrophedon', image_options)
+            renderer.render_file('tests/test_resources/ubuntu-logo32.png')
+            assert_print_output(self, my_erika, expected_lines)
+
+        # compiling passes them on, too
+        program = ErikaImageRenderer(None, 'LineByLine', image_options).compile_file('tests/test_resources/ubuntu-logo32.png')
+        self.assertEqual((50, 50), program.extent())
+
+        self.assertRaises(Exception, renderer.render_file_in_strips, 'tests/test_resources/ubuntu-logo32.png',
+                          LineByLineErikaImageRenderingStrategy())
+
+    def testRenderingAsGlyphs(self):
+        expected_lines = image_to_glyph_lines('tests/test_resources/ubuntu-logo32.png', width=300)
+        with CharacterBasedErikaMock(30, 15, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+            renderer = ErikaImageRenderer(my_erika, 'LineByLine', {'glyph_halftone': True, 'width': 300})
+            renderer.render_file('tests/test_resources/ubuntu-logo32.png')
+            assert_print_output(self, my_erika, expected_lines)
+
+        # ASCII art files stay as they are
+        with CharacterBasedErikaMock(6, 6, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+            renderer = ErikaImageRenderer(my_erika, 'LineByLine', {'glyph_halftone': True})
+            renderer.render_file('tests/test_resources/test_ascii_art_small.txt')
+            assert_print_output(self, my_erika, ["abcdef", "ghijkl", "mnopqr", "stuvwx", "yzäöüß", "!?#'\"/"])
+
+        renderer = ErikaImageRenderer(None, 'LineByLine', {'glyph_halftone': True, 'dithering': DITHERING_BAYER})
+        self.assertRaises(Exception, renderer.compile_file, 'tests/test_resources/ubuntu-logo32.png')
+
+    def testAutoStrategyPicksTheCheapestStrategy(self):
+        file_path = 'tests/test_resources/test_image_monochrome_1.bmp'
+        candidates = ['LineByLine', 'Interlaced', 'Boustrophedon', 'ShortestPath']
+        selection = ErikaImageRenderer(None, AUTO_STRATEGY).select_strategy(file_path=file_path, candidates=candidates)
+
+        estimates = {strategy_string: ErikaImageRenderer(None, strategy_string).estimate_duration(file_path)
+                     for strategy_string in candidates}
+        self.assertEqual(estimates, selection.estimates)
+        self.assertEqual(min(estimates, key=estimates.get), selection.strategy_string)
+        self.assertEqual(ErikaImageRenderer(None, selection.strategy_string).compile_file(file_path), selection.program)
+
+    def testAutoStrategy(self):
+        with MicrostepBasedErikaMock(20, 30, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+            renderer = ErikaImageRenderer(my_erika, AUTO_STRATEGY)
+            renderer.render_file('tests/test_resources/test_image_color.bmp')
+            expected_lines = ["".join("X" if pixel_set else " " for pixel_set in row)
+                              for row in WrappedImage('tests/test_resources/test_image_color.bmp').rows()]
+            assert_print_output(self, my_erika, expected_lines)
+
+        with CharacterBasedErikaMock(6, 6, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+            renderer = ErikaImageRenderer(my_erika, AUTO_STRATEGY)
+            renderer.render_lines(["abcdef", "ghijkl", "mnopqr", "stuvwx", "yzäöüß", "!?#'\"/"])
+            assert_print_output(self, my_erika, ["abcdef", "ghijkl", "mnopqr", "stuvwx", "yzäöüß", "!?#'\"/"])
+
+        self.assertRaises(Exception, ErikaImageRenderer(None, AUTO_STRATEGY).create_strategy)
+        self.assertEqual(sorted(strategy_registry.strategy_names()), sorted(auto_candidates()))
+
+    def testPrintedMap(self):
+        printed = PrintedMap(3, 5)
+        self.assertEqual(2, len(printed.bits))
+        printed.mark_printed(2, 4)
+        printed.mark_printed(1, 0)
+        self.assertEqual([(1, 0), (2, 4)], [(x, y) for y in range(5) for x in range(3) if printed.is_printed(x, y)])
+
+    def testArchimedeanSpiralOutwardErikaImageRenderingStrategyOrder(self):
+        """the spiral path has no repeated positions in a row, remaining positions are sorted by distance, x, y"""
+        strategy = ArchimedeanSpiralOutwardErikaImageRenderingStrategy()
+        strategy.spiral_offset_x = 1
+        strategy.spiral_offset_y = 1
+
+        path = strategy._spiral_path(2, 2)
+        self.assertTrue(all(0 <= x <= 2 and 0 <= y <= 2 for x, y in path))
+        self.assertTrue(all(path[i] != path[i + 1] for i in range(len(path) - 1)))
+
+        self.assertEqual([(1, 1), (0, 1), (1, 0), (1, 2), (2, 1), (0, 0), (0, 2), (2, 0), (2, 2)],
+                         strategy._coordinates_by_distance_to_spiral_center(3, 3))
+
 
 def main():
     unittest.main()
@@ -0,0 +1,82 @@
+import io
+import os
+import struct
+import tempfile
+import unittest
+
+from erika.erika import Erika
+from erika.erika_image_renderer import ErikaImageRenderer
+from erika.erika_job_file import ErikaJobFile
+from erika.erika_job_file import JOB_FILE_MAGIC
+from erika.erika_job_file import NotAJobFileException
+from erika.erika_job_file import write_job_file
+from erika.erika_program import RecordingErika
+
+
+def compile_program(file_path, strategy_string):
+    recording_erika = RecordingErika()
+    ErikaImageRenderer(recording_erika, strategy_string).render_file(file_path)
+    return recording_erika.program.optimized()
+
+
+class ErikaJobFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.job_file_path = os.path.join(self.temporary_directory.name, "job.erika")
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_write_and_read_back(self):
+        program = compile_program('tests/test_resources/test_ascii_art_small.txt', 'LineByLine')
+        write_job_file(self.job_file_path, program, metadata={"strategy": "LineByLine"})
+
+        with ErikaJobFile(self.job_file_path) as job_file:
+            self.assertEqual(program.to_bytes(), bytes(job_file.payload))
+            self.assertEqual({"strategy": "LineByLine"}, job_file.header["metadata"])
+            self.assertEqual(60, job_file.header["page_width_microsteps"])
+            self.assertEqual(120, job_file.header["page_height_microsteps"])
+            self.assertGreater(job_file.header["estimated_duration"], 0)
+
+    def test_replay(self):
+        program = compile_program('tests/test_resources/test_image_grayscale_1.bmp', 'LineByLine')
+        write_job_file(self.job_file_path, program)
+
+        connection = io.BytesIO()
+        erika = Erika(None, connection=connection)
+        with ErikaJobFile(self.job_file_path) as job_file:
+            job_file.replay(erika, chunk_size=100)
+        self.assertEqual(program.to_bytes(), connection.getvalue())
+
+    def test_not_a_job_file(self):
+        with self.assertRaises(NotAJobFileException):
+            ErikaJobFile('tests/test_resources/test_ascii_art_small.txt')
+
+    def test_truncated_job_files(self):
+        program = compile_program('tests/test_resources/test_ascii_art_small.txt', 'LineByLine')
+        write_job_file(self.job_file_path, program)
+        with open(self.job_file_path, "rb") as job_file:
+            data = job_file.read()
+
+        # in the payload, in the header, in the header length
+        for length in [len(data) - 1, 20, 10]:
+            with open(self.job_file_path, "wb") as job_file:
+                job_file.write(data[:length])
+            with self.assertRaises(NotAJobFileException, msg=length):
+                ErikaJobFile(self.job_file_path)
+
+    def test_corrupt_headers(self):
+        for header in [b"\xff\xfe", b"{not json", b"[1]", b'{"version": 1}', b'{"version": 1, "payload_length": "x"}']:
+            with open(self.job_file_path, "wb") as job_file:
+                job_file.write(JOB_FILE_MAGIC + struct.pack("<I", len(header)) + header)
+            with self.assertRaises(NotAJobFileException, msg=header):
+                ErikaJobFile(self.job_file_path)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,17 @@
+import os
+import tempfile
 import unittest
 
+from PIL import Image
+
 from erika.erika_mock import CharacterBasedErikaMock
 from erika.erika_mock import MicrostepBasedErikaMock
 
 
 def assert_print_output(test_case, my_erika, expected_array_of_joined_lines):
+    actual_lines = my_erika.canvas.lines()
     for line in range(len(expected_array_of_joined_lines)):
-        expected_line_joined = expected_array_of_joined_lines[line]
-        expected_line = list(expected_line_joined)
-        actual_line = my_erika.canvas[line]
-        test_case.assertEqual(expected_line, actual_line)
+        test_case.assertEqual(expected_array_of_joined_lines[line], actual_lines[line])
 
     # validate curses output as well
     y, x = my_erika.stdscr.getyx()
@@ -108,6 +110,18 @@ def test_delete_ascii2(self):
         my_erika.print_ascii("x")
         assert_print_output(self, my_erika, ["H x o"])
 
+    def test_print_ascii_reversed(self):
+        my_erika = CharacterBasedErikaMock(width=5, height=1, inside_unit_test=True, exception_if_overprinted=False)
+        my_erika.move_right()
+        my_erika.move_right()
+        my_erika.move_right()
+        my_erika.print_ascii_reversed("cba")
+        assert_print_output(self, my_erika, ["abc  "])
+
+        # the cursor rests above the "a" now
+        my_erika.print_ascii("A")
+        assert_print_output(self, my_erika, ["Abc  "])
+
     def test_delete_pixel(self):
         my_erika = MicrostepBasedErikaMock(width=5, height=1, inside_unit_test=True, exception_if_overprinted=False)
         my_erika.print_pixel()
@@ -121,6 +135,35 @@ def test_delete_pixel(self):
         my_erika.delete_pixel()
         assert_print_output(self, my_erika, ["XXX X"])
 
+    def test_overprinting_raises_exception(self):
+        my_erika = CharacterBasedErikaMock(width=5, height=1, inside_unit_test=True, exception_if_overprinted=True)
+        my_erika.print_ascii("ab")
+        my_erika.move_left()
+        self.assertRaises(Exception, my_erika.print_ascii, "cd")
+
+    def test_canvas_matches_expected_output(self):
+        my_erika = CharacterBasedErikaMock(width=5, height=2, inside_unit_test=True)
+        my_erika.print_ascii("äb")
+        self.assertTrue(my_erika.canvas.matches(["äb"]))
+        self.assertTrue(my_erika.canvas.matches(["äb   ", "     "]))
+        self.assertFalse(my_erika.canvas.matches(["ä"]))
+        self.assertFalse(my_erika.canvas.matches(["äb", "x"]))
+        self.assertFalse(my_erika.canvas.matches(["äb    "]))
+        self.assertEqual("äb   \n     ", my_erika.canvas.to_text())
+
+    def test_canvas_export_as_png(self):
+        my_erika = MicrostepBasedErikaMock(width=3, height=2, inside_unit_test=True)
+        my_erika.move_right_microsteps(1)
+        my_erika.print_pixel()
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "canvas.png")
+            my_erika.canvas.save_as_png(file_path)
+            with Image.open(file_path) as image:
+                self.assertEqual((3, 2), image.size)
+                self.assertEqual(0, image.getpixel((1, 0)))
+                self.assertEqual(255, image.getpixel((0, 0)))
+                self.assertEqual(255, image.getpixel((1, 1)))
+
 
 def main():
     unittest.main()
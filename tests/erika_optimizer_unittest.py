@@ -0,0 +1,105 @@
+import unittest
+import unittest.mock
+
+from erika.erika_mock import CharacterBasedErikaMock
+from erika.erika_optimizer import MovementCoalescingErika
+from tests.erika_mock_unittest import assert_print_output
+from tests.erika_unittest import create_erika_with_mocked_serial_port
+from tests.erika_unittest import written_bytes
+
+
+class MovementCoalescingErikaTest(unittest.TestCase):
+
+    def test_microsteps_are_merged_into_one_command(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        optimized_erika = MovementCoalescingErika(erika)
+        for i in range(5):
+            optimized_erika.move_right_microsteps(1)
+        optimized_erika.move_left_microsteps(2)
+        optimized_erika.print_ascii("a")
+        optimized_erika.flush()
+        self.assertEqual([b'\xa5\x03\x61'], written_bytes(connection))
+
+    def test_large_microstep_moves_use_as_few_commands_as_possible(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        optimized_erika = MovementCoalescingErika(erika)
+        for i in range(200):
+            optimized_erika.move_left_microsteps(1)
+        optimized_erika.flush()
+        self.assertEqual([b'\xa5\x80\xa5\xb8'], written_bytes(connection))
+
+    def test_opposite_and_zero_length_moves_are_dropped(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        optimized_erika = MovementCoalescingErika(erika)
+        optimized_erika.move_right()
+        optimized_erika.move_down()
+        optimized_erika.move_left()
+        optimized_erika.move_up()
+        optimized_erika.move_right_microsteps(0)
+        optimized_erika.move_down_microstep()
+        optimized_erika.move_up_microstep()
+        optimized_erika.print_ascii("a")
+        optimized_erika.flush()
+        self.assertEqual([b'\x61'], written_bytes(connection))
+
+    def test_horizontal_movement_before_crlf_is_dropped(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        optimized_erika = MovementCoalescingErika(erika)
+        optimized_erika.move_right()
+        optimized_erika.move_right_microsteps(3)
+        optimized_erika.move_down_microstep()
+        optimized_erika.crlf()
+        self.assertEqual([b'\x81\x77'], written_bytes(connection))
+
+    def test_character_steps_and_microsteps_are_sent_as_one_move(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        optimized_erika = MovementCoalescingErika(erika)
+        for i in range(3):
+            optimized_erika.move_right()
+        optimized_erika.move_right_microsteps(2)
+        optimized_erika.move_down()
+        optimized_erika.move_down_microstep()
+        optimized_erika.print_ascii("a")
+        optimized_erika.flush()
+        # 32 microsteps right in one "A5" move, 21 microsteps down as two half steps and a microstep
+        self.assertEqual([b'\xa5\x20' + b'\x75\x75\x81' + b'\x61'], written_bytes(connection))
+
+    def test_short_moves_use_half_steps(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        optimized_erika = MovementCoalescingErika(erika)
+        optimized_erika.move_left_microsteps(5)
+        optimized_erika.print_ascii("a")
+        optimized_erika.move_right_microsteps(6)
+        optimized_erika.print_ascii("a")
+        optimized_erika.flush()
+        self.assertEqual([b'\x74\x61' + b'\xa5\x06\x61'], written_bytes(connection))
+
+    def test_escape_sequences_are_passed_on(self):
+        erika = unittest.mock.Mock()
+        MovementCoalescingErika(erika).print_ascii("\033[2Ca", esc_sequences=True)
+        erika.print_ascii.assert_called_once_with("\033[2Ca", True)
+
+    def test_output_is_unchanged(self):
+        with CharacterBasedErikaMock(5, 3, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+            optimized_erika = MovementCoalescingErika(my_erika)
+            optimized_erika.print_ascii("Hello")
+            optimized_erika.move_down()
+            optimized_erika.move_down()
+            optimized_erika.move_left()
+            optimized_erika.move_left()
+            optimized_erika.move_left()
+            optimized_erika.print_ascii("!")
+            optimized_erika.move_up()
+            optimized_erika.move_left()
+            optimized_erika.move_left()
+            optimized_erika.move_left()
+            optimized_erika.print_ascii("World")
+            assert_print_output(self, my_erika, ["Hello", "World", "  !  "])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
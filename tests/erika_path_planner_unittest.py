@@ -0,0 +1,43 @@
+import random
+import unittest
+
+from erika.erika_path_planner import path_cost
+from erika.erika_path_planner import plan_shortest_path
+
+
+class PathPlannerTest(unittest.TestCase):
+
+    def test_every_point_is_visited_once(self):
+        random.seed(3)
+        points = list({(random.randrange(50), random.randrange(50)) for i in range(300)})
+        path = plan_shortest_path(points, 1, 5)
+        self.assertEqual(sorted(points), sorted(path))
+
+    def test_runs_are_visited_left_to_right(self):
+        points = [(3, 0), (2, 0), (1, 0), (4, 2), (5, 2)]
+        path = plan_shortest_path(points)
+        self.assertEqual([(1, 0), (2, 0), (3, 0), (4, 2), (5, 2)], path)
+        self.assertEqual(1 + 2, path_cost(path))
+
+    def test_vertical_moves_are_avoided_if_expensive(self):
+        points = [(0, 1), (5, 0)]
+        self.assertEqual([(0, 1), (5, 0)], plan_shortest_path(points, weight_x=10, weight_y=1))
+        self.assertEqual([(5, 0), (0, 1)], plan_shortest_path(points, weight_x=1, weight_y=10))
+
+    def test_two_opt_does_not_make_the_path_longer(self):
+        random.seed(5)
+        points = list({(random.randrange(100), random.randrange(100)) for i in range(500)})
+        nearest_neighbour_path = plan_shortest_path(points, 1, 5, two_opt_passes=0)
+        improved_path = plan_shortest_path(points, 1, 5)
+        self.assertLessEqual(path_cost(improved_path, 1, 5), path_cost(nearest_neighbour_path, 1, 5))
+
+    def test_no_points(self):
+        self.assertEqual([], plan_shortest_path([]))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
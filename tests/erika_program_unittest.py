@@ -0,0 +1,102 @@
+import unittest
+
+from erika.erika_image_renderer import *
+from erika.erika_mock import *
+from erika.erika_program import ErikaProgram
+from erika.erika_program import OpCode
+from erika.erika_program import RecordingErika
+from erika.rendering_strategies.line_by_line import LineByLineErikaImageRenderingStrategy
+from erika.rendering_strategies.perpendicular_spiral_inward import PerpendicularSpiralInwardErikaImageRenderingStrategy
+from tests.erika_mock_unittest import assert_print_output
+from tests.erika_unittest import create_erika_with_mocked_serial_port
+from tests.erika_unittest import written_bytes
+
+
+def record(strategy, file_path):
+    recording_erika = RecordingErika()
+    renderer = ErikaImageRenderer(recording_erika, "test: strategy will be set explicitly")
+    renderer.render_file_for_fixed_strategy(file_path, strategy)
+    return recording_erika.program
+
+
+class ErikaProgramTest(unittest.TestCase):
+
+    def test_optimized_merges_moves_and_texts(self):
+        program = ErikaProgram([
+            (OpCode.PRINT_TEXT, "a", None),
+            (OpCode.PRINT_TEXT, "b", None),
+            (OpCode.MOVE_CHARACTERS, 1, 0),
+            (OpCode.MOVE_MICROSTEPS, 3, 1),
+            (OpCode.MOVE_CHARACTERS, 1, 1),
+            (OpCode.MOVE_MICROSTEPS, -3, 0),
+            (OpCode.PRINT_TEXT, "c", None),
+            (OpCode.MOVE_CHARACTERS, 1, 0),
+            (OpCode.MOVE_CHARACTERS, -1, 0),
+            (OpCode.PRINT_TEXT, "d", None),
+            (OpCode.MOVE_MICROSTEPS, 5, 0),
+            (OpCode.CRLF, None, None),
+        ])
+        self.assertEqual(ErikaProgram([
+            (OpCode.PRINT_TEXT, "ab", None),
+            (OpCode.MOVE_CHARACTERS, 2, 1),
+            (OpCode.MOVE_MICROSTEPS, 0, 1),
+            (OpCode.PRINT_TEXT, "cd", None),
+            (OpCode.CRLF, None, None),
+        ]), program.optimized())
+
+    def test_to_bytes(self):
+        program = ErikaProgram([
+            (OpCode.PRINT_TEXT, "ab", None),
+            (OpCode.MOVE_CHARACTERS, 1, -1),
+            (OpCode.PRINT_PIXEL, None, None),
+            (OpCode.MOVE_MICROSTEPS, 1, 1),
+            (OpCode.PRINT_TEXT, "a", None),
+            (OpCode.CRLF, None, None),
+        ])
+        self.assertEqual(b'\x61\x4e' + b'\x73\x73\x76\x76' + b'\x63\x81\xa5\xf8' + b'\x61\x77', program.to_bytes())
+
+        # cached
+        self.assertIs(program.to_bytes(), program.to_bytes())
+
+    def test_to_bytes_by_line(self):
+        program = ErikaProgram([
+            (OpCode.PRINT_TEXT, "ab", None),
+            (OpCode.CRLF, None, None),
+            (OpCode.MOVE_CHARACTERS, 1, 0),
+            (OpCode.PRINT_PIXEL, None, None),
+            (OpCode.CRLF, None, None),
+        ])
+        payload, line_ends = program.to_bytes_by_line()
+        self.assertEqual(program.to_bytes(), payload)
+        self.assertEqual([3, len(payload)], line_ends)
+
+    def test_replay_to_erika_sends_lowered_bytes(self):
+        file_path = 'tests/test_resources/test_image_grayscale_1.bmp'
+        program = record(LineByLineErikaImageRenderingStrategy(), file_path).optimized()
+        erika, connection = create_erika_with_mocked_serial_port()
+        program.replay(erika)
+        self.assertEqual(program.to_bytes(), b''.join(written_bytes(connection)))
+
+        # less to send than when rendering directly
+        directly_rendering_erika, direct_connection = create_erika_with_mocked_serial_port()
+        ErikaImageRenderer(directly_rendering_erika, "LineByLine").render_file(file_path)
+        self.assertLess(len(program.to_bytes()), len(b''.join(written_bytes(direct_connection))))
+
+    def test_replay_to_mock_gives_same_result(self):
+        program = record(PerpendicularSpiralInwardErikaImageRenderingStrategy(),
+                         'tests/test_resources/test_ascii_art_small.txt').optimized()
+
+        # replay twice - the program does not change by replaying it
+        for i in range(2):
+            with CharacterBasedErikaMock(6, 6, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+                program.replay(my_erika)
+                assert_print_output(self, my_erika,
+                                    ["abcdef", "ghijkl", "mnopqr", "stuvwx", "yzäöüß", "!?#'\"/"])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
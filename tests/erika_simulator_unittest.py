@@ -0,0 +1,107 @@
+import unittest
+
+from erika.erika import print_demo_rectangle
+from erika.erika_image_renderer import *
+from erika.erika_simulator import ErikaSimulator
+from erika.erika_simulator import OutOfPageException
+from erika.erika_simulator import lines_at_character_resolution
+from erika.erika_simulator import lines_at_microstep_resolution
+from erika.rendering_strategies.perpendicular_spiral_inward import PerpendicularSpiralInwardErikaImageRenderingStrategy
+
+
+class RecordingObserver:
+
+    def __init__(self):
+        self.changes = []
+        self.closed = False
+
+    def on_change(self, simulator, x, y, c):
+        self.changes.append((x, y, c))
+
+    def refresh(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class ErikaSimulatorTest(unittest.TestCase):
+
+    def test_write_and_read_back_characters(self):
+        simulator = ErikaSimulator(width=50, height=60, exception_if_overprinted=True)
+        simulator.print_ascii("Hello")
+        simulator.move_down()
+        simulator.move_down()
+        simulator.move_left()
+        simulator.move_left()
+        simulator.move_left()
+        simulator.print_ascii("!")
+        simulator.move_up()
+        simulator.move_left()
+        simulator.move_left()
+        simulator.move_left()
+        simulator.print_ascii("World")
+        self.assertEqual(["Hello", "World", "  !  "], lines_at_character_resolution(simulator))
+
+        simulator.delete_ascii("dlr")
+        self.assertEqual(["Hello", "Wo   ", "  !  "], lines_at_character_resolution(simulator))
+
+    def test_write_and_read_back_microsteps(self):
+        simulator = ErikaSimulator(width=5, height=3)
+        simulator.print_pixel()
+        simulator.move_right_microsteps(1)
+        simulator.print_pixel()
+        simulator.move_down_microstep()
+        simulator.move_left_microsteps(2)
+        simulator.print_pixel()
+        self.assertEqual(["X X  ", " X   ", "     "], lines_at_microstep_resolution(simulator))
+
+        simulator.delete_pixel()
+        self.assertEqual(["X X  ", "     ", "     "], lines_at_microstep_resolution(simulator))
+
+    def test_overprinting_and_page_limits(self):
+        simulator = ErikaSimulator(width=5, height=3, exception_if_overprinted=True)
+        simulator.print_pixel()
+        simulator.move_left_microsteps(1)
+        self.assertRaises(Exception, simulator.print_pixel)
+
+        simulator.move_up_microstep()
+        self.assertRaises(OutOfPageException, simulator.print_pixel)
+
+    def test_render_image(self):
+        simulator = ErikaSimulator(width=20, height=30, exception_if_overprinted=True)
+        renderer = ErikaImageRenderer(simulator, "test: strategy will be set explicitly")
+        renderer.render_file_for_fixed_strategy('tests/test_resources/test_image_grayscale_1.bmp',
+                                                PerpendicularSpiralInwardErikaImageRenderingStrategy())
+        self.assertEqual(["X" * 20] * 7 + [" " * 20] * 15 + ["X" * 20] * 8, lines_at_microstep_resolution(simulator))
+
+    def test_print_demo_rectangle(self):
+        simulator = ErikaSimulator(width=120, height=10, exception_if_overprinted=True)
+        # the rectangle reaches one microstep left of where it starts
+        simulator.move_right_microsteps(1)
+        print_demo_rectangle(simulator)
+        lines = lines_at_microstep_resolution(simulator)
+        self.assertEqual(30, sum(line.count("X") for line in lines))
+
+    def test_observers_are_notified(self):
+        observer = RecordingObserver()
+        with ErikaSimulator(observers=[observer]) as simulator:
+            simulator.print_ascii("a b")
+            simulator.crlf()
+            simulator.print_pixel()
+        self.assertEqual([(0, 0, "a"), (20, 0, "b"), (0, 20, ".")], observer.changes)
+        self.assertTrue(observer.closed)
+
+    def test_read_returns_simulated_input(self):
+        simulator = ErikaSimulator(input_keys="ab")
+        self.assertEqual("a", simulator.read())
+        self.assertEqual("b", simulator.read())
+        self.assertRaises(Exception, simulator.read)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
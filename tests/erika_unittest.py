@@ -0,0 +1,84 @@
+import unittest
+import unittest.mock
+
+from erika.erika import Erika
+from erika.erika import WRITE_BUFFER_SIZE
+
+
+def create_erika_with_mocked_serial_port(rts_cts=True):
+    with unittest.mock.patch('serial.Serial') as serial_class_mock:
+        erika = Erika("/dev/null", rts_cts=rts_cts)
+    return erika, serial_class_mock.return_value
+
+
+def written_bytes(connection_mock):
+    return [call_args[0][0] for call_args in connection_mock.write.call_args_list]
+
+
+class ErikaWriteBufferTest(unittest.TestCase):
+
+    def test_bytes_are_collected_until_flush(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        erika.move_right_microsteps(3)
+        erika.move_down_microstep()
+        connection.write.assert_not_called()
+
+        erika.flush()
+        self.assertEqual([b'\xa5\x03\x81'], written_bytes(connection))
+
+        # nothing left to send
+        erika.flush()
+        self.assertEqual(1, connection.write.call_count)
+
+    def test_crlf_flushes(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        erika.print_ascii("ab")
+        erika.crlf()
+        self.assertEqual([b'\x61\x4e\x77'], written_bytes(connection))
+
+    def test_newline_in_text_flushes(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        erika.print_ascii("a\n")
+        self.assertEqual([b'\x61\x77'], written_bytes(connection))
+
+    def test_buffer_size_limit_flushes(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        for i in range(WRITE_BUFFER_SIZE):
+            erika.move_down_microstep()
+        self.assertEqual([b'\x81' * WRITE_BUFFER_SIZE], written_bytes(connection))
+
+    def test_read_flushes_before_waiting_for_input(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        connection.read.return_value = b'\x61'
+        erika.print_ascii("a")
+        self.assertEqual("a", erika.read())
+        self.assertEqual([b'\x61'], written_bytes(connection))
+
+    def test_exit_flushes_before_closing(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        with erika:
+            erika.print_ascii("a")
+        self.assertEqual([b'\x61'], written_bytes(connection))
+        connection.close.assert_called_once()
+
+    def test_without_rts_cts_every_command_is_written_directly(self):
+        erika, connection = create_erika_with_mocked_serial_port(rts_cts=False)
+        erika.print_ascii("ab")
+        self.assertEqual([b'\x61', b'\x4e'], written_bytes(connection))
+
+
+class ErikaCommandsTest(unittest.TestCase):
+
+    def test_print_ascii_reversed_uses_reverse_printing_mode(self):
+        erika, connection = create_erika_with_mocked_serial_port()
+        erika.print_ascii_reversed("ba")
+        erika.flush()
+        self.assertEqual([b'\x8e\x4e\x61\x8d'], written_bytes(connection))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
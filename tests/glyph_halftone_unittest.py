@@ -0,0 +1,95 @@
+import unittest
+import unittest.mock
+
+import numpy as np
+from PIL import ImageFont
+
+from erika.erika import MICROSTEPS_PER_CHARACTER_HEIGHT
+from erika.erika import MICROSTEPS_PER_CHARACTER_WIDTH
+from erika import glyph_halftone
+from erika.glyph_halftone import ZONES_X
+from erika.glyph_halftone import ZONES_Y
+from erika.glyph_halftone import glyph_coverage_profiles
+from erika.glyph_halftone import glyph_lines
+from erika.glyph_halftone import image_to_glyph_lines
+from erika.glyph_halftone import printable_characters
+
+
+class GlyphHalftoneTest(unittest.TestCase):
+
+    def test_printable_characters(self):
+        characters = printable_characters()
+        self.assertIn(" ", characters)
+        self.assertIn("M", characters)
+        self.assertIn("ä", characters)
+        self.assertNotIn("\n", characters)
+
+    def test_coverage_profiles(self):
+        characters, profiles = glyph_coverage_profiles()
+        self.assertEqual((len(characters), ZONES_X * ZONES_Y), profiles.shape)
+        self.assertEqual(1, profiles.mean(axis=1).max())
+        self.assertFalse(profiles[characters.index(" ")].any())
+
+        # underscore: ink at the bottom only
+        underscore = profiles[characters.index("_")].reshape(ZONES_Y, ZONES_X)
+        self.assertFalse(underscore[0].any())
+        self.assertTrue(underscore[-1].all())
+
+    def test_coverage_profiles_with_old_pillow(self):
+        """Pillow before 8.0 has a fixed-size default font, and neither getlength nor getbbox"""
+        # the bitmap font is the default for older Pillow, newer Pillow has load_default_imagefont for it
+        bitmap_font = getattr(ImageFont, 'load_default_imagefont', ImageFont.load_default)()
+
+        class OldPillowFont:
+            def getsize(self, text):
+                if hasattr(bitmap_font, 'getsize'):
+                    return bitmap_font.getsize(text)
+                return bitmap_font.getbbox(text)[2:]
+
+            def getmask(self, text, *args, **kwargs):
+                return bitmap_font.getmask(text, *args, **kwargs)
+
+        def load_default(**kwargs):
+            if kwargs:
+                raise TypeError("load_default() got an unexpected keyword argument 'size'")
+            return OldPillowFont()
+
+        with unittest.mock.patch.object(glyph_halftone.ImageFont, 'load_default', load_default):
+            characters, profiles = glyph_coverage_profiles.__wrapped__("M_ ")
+        self.assertEqual("M_ ", characters)
+        self.assertFalse(profiles[2].any())
+        underscore = profiles[1].reshape(ZONES_Y, ZONES_X)
+        self.assertFalse(underscore[0].any())
+        self.assertTrue(underscore[-1].any())
+
+    def test_each_cell_gets_the_best_matching_character(self):
+        characters, profiles = glyph_coverage_profiles()
+        line = "M_.|"
+        cells = [np.kron(profiles[characters.index(character)].reshape(ZONES_Y, ZONES_X),
+                         np.ones((MICROSTEPS_PER_CHARACTER_HEIGHT // ZONES_Y, MICROSTEPS_PER_CHARACTER_WIDTH // ZONES_X)))
+                 for character in line]
+        darkness = np.hstack(cells)
+        self.assertEqual([line], glyph_lines(darkness))
+
+        # white cells are left blank, partial cells are cut off
+        white = np.zeros((2 * MICROSTEPS_PER_CHARACTER_HEIGHT + 5, 3 * MICROSTEPS_PER_CHARACTER_WIDTH + 5))
+        self.assertEqual(["", ""], glyph_lines(white))
+        self.assertEqual([], glyph_lines(white[:MICROSTEPS_PER_CHARACTER_HEIGHT - 1]))
+
+    def test_image_to_glyph_lines(self):
+        lines = image_to_glyph_lines('tests/test_resources/ubuntu-logo32.png')
+        # 200 x 200 pixels
+        self.assertEqual(10, len(lines))
+        self.assertTrue(all(len(line) <= 20 for line in lines))
+
+        lines = image_to_glyph_lines('tests/test_resources/ubuntu-logo32.png', width=400)
+        self.assertEqual(20, len(lines))
+        self.assertEqual(40, max(len(line) for line in lines))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,15 @@
+import os
+import tempfile
 import unittest
+import unittest.mock
+import warnings
 import pytest
 
+import numpy as np
 import PIL
+from PIL import Image
+
+from erika import image_converter
 
 from erika.image_converter import *
 
@@ -96,6 +104,188 @@ def testHeight(self):
         grayscale_image = WrappedImage(root_path + 'test_image_grayscale_1.bmp')
         self.assertEqual(grayscale_image.width(), 20)
 
+    def testBitmapMatchesIsPixelSet(self):
+        image = WrappedImage(root_path + 'ubuntu-logo32.png')
+        self.assertEqual((image.height(), image.width()), image.bitmap.shape)
+        self.assertEqual(image.bitmap[5].tolist(), image.row(5))
+        for y, row in enumerate(image.rows()):
+            for x, pixel_set in enumerate(row):
+                self.assertEqual(pixel_set, image.is_pixel_set(x, y))
+        self.assertIs(bool, type(image.is_pixel_set(0, 0)))
+        # the bitmap is the only copy of the pixels
+        self.assertEqual(['bitmap'], [name for name, value in vars(image).items()
+                                      if isinstance(value, (list, np.ndarray))])
+
+    def testRunsOfSetPixels(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'runs.png')
+            image = Image.new('L', (6, 2), 255)
+            for x in [0, 2, 3, 5]:
+                image.putpixel((x, 0), 0)
+            image.save(file_path)
+
+            wrapped_image = WrappedImage(file_path)
+            self.assertEqual([(0, 1), (2, 4), (5, 6)], wrapped_image.runs(0))
+            self.assertEqual([], wrapped_image.runs(1))
+
+    def testImageStripsContainTheWholeImage(self):
+        """images are read strip by strip - decoding only the strips for uncompressed images"""
+        with tempfile.TemporaryDirectory() as directory:
+            source_image = Image.open(root_path + 'ubuntu-logo32.png')
+            for file_name, mode in [('image.bmp', 'RGB'), ('image_1.bmp', '1'), ('image.pgm', 'L'),
+                                    ('image_p.bmp', 'P'), ('image.tiff', 'RGBA'), ('image.png', 'RGBA')]:
+                file_path = os.path.join(directory, file_name)
+                source_image.convert(mode).save(file_path)
+                whole_bitmap = WrappedImage(file_path).bitmap
+
+                with warnings.catch_warnings(record=True) as caught_warnings:
+                    warnings.simplefilter('always')
+                    strips = ImageStrips(file_path, strip_height=37)
+                # only the PNG has to be decoded as a whole
+                self.assertEqual(file_name == 'image.png', bool(caught_warnings), file_name)
+                self.assertEqual(file_name != 'image.png', strips.decodes_strips_only, file_name)
+
+                with strips:
+                    self.assertEqual((200, 200), (strips.width(), strips.height()))
+                    tops = []
+                    for top, strip in strips:
+                        tops.append(top)
+                        self.assertTrue(np.array_equal(whole_bitmap[top:top + 37], strip.bitmap), file_name)
+                    self.assertEqual(list(range(0, 200, 37)), tops)
+
+    def testImageStripsOnlyDecodeTheNeededTiles(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'image.pgm')
+            Image.open(root_path + 'ubuntu-logo32.png').convert('L').save(file_path)
+            whole_image = np.asarray(Image.open(file_path))
+
+            with Image.open(file_path) as image:
+                rows = image_converter._read_rows(file_path, image, 10, 20)
+                self.assertTrue(np.array_equal(whole_image[10:20], np.asarray(rows)))
+                # the image itself is left alone
+                self.assertEqual((200, 200), image.size)
+
+            # same image, but split into several tiles of 50 rows each
+            with Image.open(file_path) as image:
+                codec_name, extents, offset, args = image.tile[0]
+                image.tile = [(codec_name, (0, top, 200, top + 50), offset + top * 200, (args, 0, 1))
+                              for top in range(0, 200, 50)]
+                rows = image_converter._read_rows(file_path, image, 60, 120)
+                self.assertTrue(np.array_equal(whole_image[60:120], np.asarray(rows)))
+
+            # compressed images can not be decoded partially
+            png_file_path = os.path.join(directory, 'image.png')
+            Image.open(file_path).save(png_file_path)
+            with Image.open(png_file_path) as image:
+                self.assertIsNone(image_converter._read_rows(png_file_path, image, 10, 20))
+
+    def testGrayscaleValuesAreOneBytePerPixel(self):
+        image = Image.new('RGB', (2, 1), (255, 255, 255))
+        image.putpixel((0, 0), (0, 10, 20))
+        for luminance in LUMINANCE_FORMULAS:
+            values = image_converter._grayscale_values(image, LUMINANCE_FORMULAS[luminance])
+            self.assertEqual(np.uint8, values.dtype)
+            self.assertEqual(255, values[0, 1], luminance)
+
+    def testAllImageModesAreSupported(self):
+        """a dark pixel followed by a light pixel, in several image modes"""
+        with tempfile.TemporaryDirectory() as directory:
+            for mode, dark, light in [('1', 0, 1),
+                                      ('L', 10, 200),
+                                      ('LA', (10, 255), (200, 0)),
+                                      ('I;16', 1000, 60000),
+                                      ('RGB', (0, 10, 20), (200, 220, 240)),
+                                      ('RGBA', (0, 10, 20, 255), (200, 220, 240, 0)),
+                                      ('CMYK', (0, 0, 0, 255), (0, 0, 0, 0))]:
+                image = Image.new(mode, (2, 1))
+                image.putpixel((0, 0), dark)
+                image.putpixel((1, 0), light)
+                file_path = os.path.join(directory, 'image.tiff')
+                image.save(file_path)
+                wrapped_image = WrappedImage(file_path)
+                self.assertEqual([True, False], wrapped_image.row(0), mode)
+
+            palette_image = Image.new('P', (2, 1))
+            palette_image.putpalette([0, 0, 0, 255, 255, 255])
+            palette_image.putpixel((1, 0), 1)
+            file_path = os.path.join(directory, 'image.png')
+            palette_image.save(file_path)
+            self.assertEqual([True, False], WrappedImage(file_path).row(0))
+
+    def testLuminanceFormulaIsConfigurable(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'green.png')
+            Image.new('RGB', (1, 1), (0, 255, 0)).save(file_path)
+
+            # average: 85, ITU-R 601: 149
+            self.assertTrue(WrappedImage(file_path).is_pixel_set(0, 0))
+            self.assertFalse(WrappedImage(file_path, luminance=LUMINANCE_ITU_R_601).is_pixel_set(0, 0))
+            self.assertTrue(WrappedImage(file_path, luminance=(1, 0, 1)).is_pixel_set(0, 0))
+
+    def testErrorDiffusionGivesTheSameResultAsPixelByPixel(self):
+        values = np.random.RandomState(42).randint(0, 256, size=(23, 31))
+        for dithering in [DITHERING_FLOYD_STEINBERG, DITHERING_ATKINSON]:
+            kernel = image_converter._ERROR_DIFFUSION_KERNELS[dithering]
+            expected_bitmap = error_diffusion_pixel_by_pixel(values, 128, kernel)
+            self.assertTrue(np.array_equal(expected_bitmap, image_converter._error_diffusion(values, 128, kernel)),
+                            dithering)
+
+    def testDitheringKeepsTheShadeOfGray(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'gray.png')
+            Image.new('L', (64, 64), 192).save(file_path)
+
+            self.assertFalse(WrappedImage(file_path).bitmap.any())
+            for dithering in [DITHERING_FLOYD_STEINBERG, DITHERING_BAYER]:
+                self.assertAlmostEqual(0.25, WrappedImage(file_path, dithering=dithering).bitmap.mean(), delta=0.01)
+            # Atkinson drops a quarter of the error - lighter shades get lighter
+            self.assertLess(WrappedImage(file_path, dithering=DITHERING_ATKINSON).bitmap.mean(), 0.25)
+
+            self.assertRaises(ValueError, WrappedImage, file_path, dithering="unknown")
+
+    def testBayerMatrix(self):
+        self.assertEqual([[0, 2], [3, 1]], image_converter._bayer_matrix(2).tolist())
+        matrix = image_converter._bayer_matrix(8)
+        self.assertEqual(list(range(64)), sorted(matrix.flatten().tolist()))
+
+    def testResizeToPageWidth(self):
+        image = WrappedImage(root_path + 'ubuntu-logo32.png', width=PAGE_WIDTH_MICROSTEPS)
+        self.assertEqual(PAGE_WIDTH_MICROSTEPS, image.width())
+        self.assertEqual(PAGE_WIDTH_MICROSTEPS, image.height())
+        self.assertEqual((PAGE_WIDTH_MICROSTEPS, PAGE_WIDTH_MICROSTEPS), image.bitmap.shape)
+
+        image = WrappedImage(root_path + 'ubuntu-logo32.png', width=100, dithering=DITHERING_ATKINSON)
+        self.assertEqual((100, 100), (image.width(), image.height()))
+
+    def testConvertedImagesAreCached(self):
+        with tempfile.TemporaryDirectory() as cache_directory:
+            image = WrappedImage(root_path + 'test_image_color.bmp', dithering=DITHERING_FLOYD_STEINBERG,
+                                 cache_directory=cache_directory)
+            self.assertEqual(1, len(os.listdir(cache_directory)))
+
+            with unittest.mock.patch.object(image_converter, '_convert', side_effect=AssertionError('not cached')):
+                cached_image = WrappedImage(root_path + 'test_image_color.bmp', dithering=DITHERING_FLOYD_STEINBERG,
+                                            cache_directory=cache_directory)
+            self.assertTrue(np.array_equal(image.bitmap, cached_image.bitmap))
+
+            # other parameters - other cache entry
+            WrappedImage(root_path + 'test_image_color.bmp', dithering=DITHERING_BAYER, cache_directory=cache_directory)
+            self.assertEqual(2, len(os.listdir(cache_directory)))
+
+
+def error_diffusion_pixel_by_pixel(values, threshold, kernel):
+    height, width = values.shape
+    errors = values.astype(float)
+    bitmap = np.zeros((height, width), dtype=bool)
+    for y in range(height):
+        for x in range(width):
+            bitmap[y, x] = errors[y, x] <= threshold
+            error = errors[y, x] - (0 if bitmap[y, x] else 255)
+            for delta_x, delta_y, share in kernel:
+                if 0 <= x + delta_x < width and y + delta_y < height:
+                    errors[y + delta_y, x + delta_x] += error * share
+    return bitmap
+
 
 def load_renamed_png_file_as_wrapped_image():
     WrappedImage(root_path + 'ubuntu-logo32.png.renamedwithextension.txt')
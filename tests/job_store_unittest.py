@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from erika.job_store import JOB_CANCELLED
+from erika.job_store import JOB_DONE
+from erika.job_store import JOB_PRINTING
+from erika.job_store import JOB_QUEUED
+from erika.job_store import JobStore
+from erika.job_store import JobStoreInUseException
+
+
+class JobStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "spool", "jobs.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_jobs_survive_reopening(self):
+        with JobStore(self.path) as job_store:
+            first = job_store.add(b"abc\x77def\x77", [4, 8], "network", "me")
+            second = job_store.add(b"\x77", [1], "twitter", "you")
+            third = job_store.add(b"\x77", [1], "twitter", "you")
+            job_store.mark_printing(second.job_id)
+            job_store.record_progress(second.job_id, 1)
+            job_store.mark_finished(third.job_id, JOB_CANCELLED)
+
+        with JobStore(self.path) as job_store:
+            pending_jobs = job_store.pending_jobs()
+
+        # the one printing comes first
+        self.assertEqual([second.job_id, first.job_id], [job.job_id for job in pending_jobs])
+        resumed, queued = pending_jobs
+        self.assertEqual((JOB_PRINTING, 1, "twitter", "you"),
+                         (resumed.state, resumed.sent_offset, resumed.source, resumed.sender))
+        self.assertEqual((JOB_QUEUED, 0, b"abc\x77def\x77", [4, 8]),
+                         (queued.state, queued.sent_offset, queued.payload, queued.line_ends))
+        self.assertEqual(first.submitted, queued.submitted)
+
+    def test_job_ids_are_not_reused(self):
+        with JobStore(self.path) as job_store:
+            job = job_store.add(b"", [], "network", "me")
+            job_store.mark_finished(job.job_id, JOB_DONE)
+            job_store.delete_finished_jobs()
+        with JobStore(self.path) as job_store:
+            self.assertGreater(job_store.add(b"", [], "network", "me").job_id, job.job_id)
+
+    def test_only_one_owner_at_a_time(self):
+        with JobStore(self.path) as job_store:
+            job_store.add(b"\x77", [1], "network", "me")
+            with self.assertRaises(JobStoreInUseException):
+                JobStore(self.path)
+        with JobStore(self.path) as job_store:
+            self.assertEqual(1, len(job_store.pending_jobs()))
+
+    def test_delete_finished_jobs(self):
+        with JobStore(":memory:") as job_store:
+            jobs = [job_store.add(b"", [], "network", "me") for i in range(5)]
+            for job in jobs[:4]:
+                job_store.mark_finished(job.job_id, JOB_DONE)
+            job_store.delete_finished_jobs(keep=2)
+            count, = job_store._connection.execute("SELECT COUNT(*) FROM jobs").fetchone()
+            self.assertEqual(3, count)
+            self.assertEqual([jobs[4].job_id], [job.job_id for job in job_store.pending_jobs()])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import unittest
+
+from erika.print_scheduler import PRIORITY_HIGH
+from erika.print_scheduler import PRIORITY_LOW
+from erika.print_scheduler import PRIORITY_NORMAL
+from erika.print_scheduler import PrintScheduler
+
+
+class Job:
+
+    def __init__(self, name, source, priority=PRIORITY_NORMAL):
+        self.name = name
+        self.source = source
+        self.priority = priority
+
+    def __repr__(self):
+        return self.name
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class PrintSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = PrintScheduler(time_slice=10, clock=self.clock)
+
+    def next_jobs(self):
+        jobs = []
+        while len(self.scheduler):
+            jobs.append(self.scheduler.next_job().name)
+        return jobs
+
+    def test_higher_priority_first(self):
+        self.scheduler.add(Job("image", "images", PRIORITY_LOW))
+        self.scheduler.add(Job("message", "network"))
+        self.scheduler.add(Job("menu", "menu", PRIORITY_HIGH))
+        self.assertEqual(["menu", "message", "image"], self.next_jobs())
+        self.assertIsNone(self.scheduler.next_job())
+
+    def test_fair_share_between_sources_and_order_within_a_source(self):
+        for i in range(3):
+            self.scheduler.add(Job("network {}".format(i), "network"))
+        for i in range(2):
+            self.scheduler.add(Job("twitter {}".format(i), "twitter"))
+        self.assertEqual(["network 0", "twitter 0", "network 1", "twitter 1", "network 2"],
+                         [job.name for job in self.scheduler.order()])
+
+        # the source that got less printing time goes first
+        self.scheduler.charge("network", 5)
+        self.assertEqual("twitter 0", self.scheduler.next_job().name)
+        self.scheduler.charge("twitter", 10)
+        self.assertEqual(["network 0", "network 1", "network 2", "twitter 1"], self.next_jobs())
+
+    def test_sources_do_not_save_up_printing_time_while_idle(self):
+        self.scheduler.add(Job("first", "network"))
+        self.scheduler.next_job()
+        self.scheduler.charge("network", 100)
+
+        self.scheduler.add(Job("tweet", "twitter"))
+        self.scheduler.add(Job("second", "network"))
+        self.assertEqual(["tweet", "second"], self.next_jobs())
+
+        # twitter starts at the same printing time as network - not at 0
+        self.scheduler.add(Job("another tweet", "twitter"))
+        self.scheduler.add(Job("third", "network"))
+        self.assertEqual(["another tweet", "third"], self.next_jobs())
+
+    def test_preemption(self):
+        image = Job("image", "images")
+        self.scheduler.add(image)
+        self.assertIs(image, self.scheduler.next_job())
+        self.scheduler.charge("images", 100)
+        self.assertFalse(self.scheduler.should_preempt(image, 100))
+
+        # same priority: only after a whole time slice - and only once the image got more printing time
+        message = Job("message", "network")
+        self.scheduler.add(message)
+        self.assertFalse(self.scheduler.should_preempt(image, 10))
+        self.scheduler.charge("images", 1)
+        self.assertFalse(self.scheduler.should_preempt(image, 9))
+        self.assertTrue(self.scheduler.should_preempt(image, 10))
+
+        # the interrupted job continues first within its source
+        self.scheduler.put_back(image)
+        self.scheduler.add(Job("another image", "images"))
+        self.assertEqual(["message", "image", "another image"], self.next_jobs())
+
+    def test_preemption_for_higher_priority(self):
+        message = Job("message", "network")
+        self.scheduler.add(message)
+        self.scheduler.next_job()
+        self.scheduler.add(Job("same source", "network"))
+        self.assertFalse(self.scheduler.should_preempt(message, 100))
+        self.scheduler.add(Job("menu", "menu", PRIORITY_HIGH))
+        self.assertTrue(self.scheduler.should_preempt(message, 0))
+
+    def test_remove(self):
+        job = Job("message", "network")
+        self.scheduler.add(job)
+        self.scheduler.remove(job)
+        self.scheduler.remove(job)
+        self.assertEqual(0, len(self.scheduler))
+        self.assertEqual([], self.scheduler.order())
+
+    def test_position_matches_order(self):
+        jobs = [Job("image", "images", PRIORITY_LOW), Job("menu", "menu", PRIORITY_HIGH)]
+        jobs += [Job("network {}".format(i), "network") for i in range(3)]
+        jobs += [Job("twitter {}".format(i), "twitter") for i in range(2)]
+        for job in jobs:
+            self.scheduler.add(job)
+        interrupted = self.scheduler.next_job()
+        self.scheduler.charge("network", 5)
+        self.scheduler.put_back(interrupted)
+        self.scheduler.remove(jobs[3])
+
+        order = self.scheduler.order()
+        self.assertEqual([order.index(job) if job in order else None for job in jobs],
+                         [self.scheduler.position(job) for job in jobs])
+        self.assertIsNone(self.scheduler.position(jobs[3]))
+
+    def test_latency_metrics(self):
+        for i in range(4):
+            self.scheduler.add(Job("message {}".format(i), "network"))
+        self.scheduler.add(Job("tweet", "twitter"))
+        for i in range(5):
+            self.clock.now += 1
+            self.scheduler.charge(self.scheduler.next_job().source, 1)
+
+        metrics = self.scheduler.latency_metrics()
+        self.assertEqual({"network", "twitter"}, set(metrics))
+        # network jobs waited 1, 3, 4 and 5 s, the tweet was picked after 2 s
+        self.assertEqual((4, 3.25, 3, 5, 5), tuple(metrics["network"]))
+        self.assertEqual((1, 2, 2, 2, 2), tuple(metrics["twitter"]))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,413 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from erika.async_erika import run_until_complete
+from erika.erica_encoder_decoder import DDR_ASCII
+from erika.erika_program import ErikaProgram
+from erika.erika_program import OpCode
+from erika.job_store import JOB_CANCELLED
+from erika.job_store import JOB_DONE
+from erika.job_store import JOB_PRINTING
+from erika.job_store import JOB_QUEUED
+from erika.job_store import JobStore
+from erika.print_spooler import MAX_MESSAGE_SIZE
+from erika.print_spooler import PROTOCOL_HEADER
+from erika.print_spooler import PrintSpooler
+from erika.print_scheduler import SOURCE_IMAGES
+from erika.print_scheduler import SOURCE_MENU
+from erika.print_scheduler import SOURCE_NETWORK
+from erika.print_scheduler import SOURCE_TWITTER
+from erika.print_spooler import UnknownJobException
+from erika.print_spooler import message_lines
+from erika.text_layout import TextLayout
+
+
+class RecordingAsyncErika:
+    """
+    Collects the bytes sent - sending takes until the test releases it, if paused. Can fail after some lines. Keys are
+    pressed by the test.
+    """
+
+    def __init__(self, lines_until_failure=None):
+        self.data = b""
+        self.running = asyncio.Event()
+        self.running.set()
+        self.lines_until_failure = lines_until_failure
+        self.keys = asyncio.Queue()
+
+    async def read(self):
+        return await self.keys.get()
+
+    async def write_bytes(self, data):
+        await self.running.wait()
+        if self.lines_until_failure is not None:
+            if self.lines_until_failure == 0:
+                raise ConnectionError("Erika was unplugged")
+            self.lines_until_failure -= 1
+        self.data += data
+
+    async def flush(self, wait_until_sent=False):
+        pass
+
+    def printed_lines(self):
+        ddr_ascii = DDR_ASCII()
+        return ["".join(ddr_ascii.try_decode("{:02X}".format(value)) for value in line)
+                for line in self.data.split(bytes.fromhex("77"))]
+
+
+class MessageLinesTest(unittest.TestCase):
+
+    def test_header_sanitization_and_wrapping(self):
+        lines = list(message_lines("Hi @erika\nabcdefgh{}", "me", TextLayout(9)))
+        self.assertRegex(lines[0], r"^\(\d{4}-")
+        self.assertEqual(["sent by", "me:", "Hi", "(at)erika", "abcdefgh(", ")"], lines[-6:])
+
+    def test_empty_lines_are_kept(self):
+        self.assertEqual(["a", "", "b"], list(message_lines("a\n\nb", "me", TextLayout(10)))[-3:])
+
+    def test_chunks(self):
+        self.assertEqual(["ab", "cd"], list(message_lines(["a", "b\nc", "d"], "me", TextLayout(10)))[-2:])
+
+
+class PrintSpoolerTest(unittest.TestCase):
+
+    def test_jobs_are_printed_in_order(self):
+        async def run():
+            erika = RecordingAsyncErika()
+            spooler = PrintSpooler(JobStore(":memory:"))
+            first = spooler.submit("first", "a")
+            second = spooler.submit("second", "b")
+            self.assertEqual((0, 1), (spooler.position(first), spooler.position(second)))
+
+            worker = asyncio.ensure_future(spooler.run_device_worker(erika))
+            while second.state != JOB_DONE:
+                await asyncio.sleep(0)
+            worker.cancel()
+            return erika.printed_lines()
+
+        lines = run_until_complete(run())
+        self.assertEqual(["first", "second"], [line for line in lines if line in ("first", "second")])
+
+    def test_cancel(self):
+        async def run():
+            erika = RecordingAsyncErika()
+            erika.running.clear()
+            spooler = PrintSpooler(JobStore(":memory:"))
+            printing = spooler.submit("one\ntwo", "a")
+            queued = spooler.submit("queued", "b")
+            worker = asyncio.ensure_future(spooler.run_device_worker(erika))
+            while printing.state != JOB_PRINTING:
+                await asyncio.sleep(0)
+
+            self.assertEqual(1, spooler.position(queued))
+            spooler.cancel(queued.job_id)
+            self.assertEqual(JOB_CANCELLED, queued.state)
+            self.assertIsNone(spooler.position(queued))
+
+            # stops at the end of the current line
+            spooler.cancel(printing.job_id)
+            erika.running.set()
+            while printing.state == JOB_PRINTING:
+                await asyncio.sleep(0)
+            worker.cancel()
+
+            self.assertEqual(JOB_CANCELLED, printing.state)
+            self.assertRaises(UnknownJobException, spooler.cancel, 42)
+            return erika.printed_lines()
+
+        lines = run_until_complete(run())
+        self.assertNotIn("one", lines)
+        self.assertNotIn("queued", lines)
+
+
+class PrintSpoolerSchedulingTest(unittest.TestCase):
+
+    def test_messages_interrupt_images_at_the_end_of_a_line(self):
+        async def run():
+            erika = RecordingAsyncErika()
+            erika.running.clear()
+            spooler = PrintSpooler(JobStore(":memory:"))
+            image = spooler.submit_lines(["i1", "i2", "i3"], "me", SOURCE_IMAGES)
+            worker = asyncio.ensure_future(spooler.run_device_worker(erika))
+            while image.state != JOB_PRINTING:
+                await asyncio.sleep(0)
+
+            message = spooler.submit_lines(["hello"], "you", SOURCE_NETWORK)
+            self.assertEqual(1, spooler.position(message))
+            erika.running.set()
+            while image.state != JOB_DONE:
+                await asyncio.sleep(0)
+            worker.cancel()
+
+            self.assertEqual(JOB_DONE, message.state)
+            self.assertEqual({SOURCE_IMAGES, SOURCE_NETWORK}, set(spooler.latency_metrics()))
+            return erika.printed_lines()
+
+        self.assertEqual(["", "", "hello", "i1", "i2", "i3", ""], run_until_complete(run()))
+
+    def test_device_session(self):
+        async def run():
+            erika = RecordingAsyncErika()
+            erika.running.clear()
+            spooler = PrintSpooler(JobStore(":memory:"))
+            message = spooler.submit_lines(["a", "b"], "you", SOURCE_NETWORK)
+            worker = asyncio.ensure_future(spooler.run_device_worker(erika))
+            while message.state != JOB_PRINTING:
+                await asyncio.sleep(0)
+
+            erika.running.set()
+            async with spooler.device_session() as session_erika:
+                self.assertIs(erika, session_erika)
+                await session_erika.write_bytes(DDR_ASCII().encode_bytes("menu"))
+                for i in range(10):
+                    await asyncio.sleep(0)
+                self.assertEqual(JOB_QUEUED, message.state)
+
+            while message.state != JOB_DONE:
+                await asyncio.sleep(0)
+            worker.cancel()
+            return erika.printed_lines()
+
+        self.assertEqual(["", "menua", "b", ""], run_until_complete(run()))
+
+    def test_device_session_given_up_while_waiting(self):
+        async def run():
+            spooler = PrintSpooler(JobStore(":memory:"))
+
+            async def use_device():
+                async with spooler.device_session():
+                    self.fail("no device worker is running")
+
+            session = asyncio.ensure_future(use_device())
+            await asyncio.sleep(0)
+            session.cancel()
+            await asyncio.sleep(0)
+            return spooler.scheduler.next_job()
+
+        self.assertIsNone(run_until_complete(run()))
+
+    def test_program(self):
+        async def run():
+            program = ErikaProgram()
+            for line in ["ab", "cd"]:
+                program.append(OpCode.PRINT_TEXT, line)
+                program.append(OpCode.CRLF)
+            erika = RecordingAsyncErika()
+            spooler = PrintSpooler(JobStore(":memory:"))
+            job = spooler.submit_program(program, "me")
+            self.assertEqual(SOURCE_IMAGES, job.source)
+            self.assertEqual([1, 4, 7], job.line_ends)
+            worker = asyncio.ensure_future(spooler.run_device_worker(erika))
+            while job.state != JOB_DONE:
+                await asyncio.sleep(0)
+            worker.cancel()
+            return erika.printed_lines()
+
+        self.assertEqual(["", "ab", "cd", ""], run_until_complete(run()))
+
+
+class PrintSpoolerRecoveryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.job_store_path = os.path.join(self.directory.name, "jobs.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_printing_resumes_after_the_last_line_sent(self):
+        async def print_until_unplugged():
+            with JobStore(self.job_store_path) as job_store:
+                spooler = PrintSpooler(job_store)
+                job = spooler.submit_lines(["abc", "def", "ghi"], "me", SOURCE_NETWORK)
+                spooler.submit_lines(["second"], "me", SOURCE_NETWORK)
+                erika = RecordingAsyncErika(lines_until_failure=3)
+                with self.assertRaises(ConnectionError):
+                    await spooler.run_device_worker(erika)
+                # put back in front, for the next try
+                self.assertEqual(0, spooler.position(job))
+                return erika.printed_lines()
+
+        async def print_after_restart():
+            with JobStore(self.job_store_path) as job_store:
+                spooler = PrintSpooler(job_store)
+                first, second = [spooler.job(job_id) for job_id in (1, 2)]
+                self.assertEqual(JOB_PRINTING, first.state)
+                self.assertEqual(JOB_QUEUED, second.state)
+                erika = RecordingAsyncErika()
+                worker = asyncio.ensure_future(spooler.run_device_worker(erika))
+                while second.state != JOB_DONE:
+                    await asyncio.sleep(0)
+                worker.cancel()
+                self.assertEqual(JOB_DONE, first.state)
+                self.assertEqual([], job_store.pending_jobs())
+                return erika.printed_lines()
+
+        before = run_until_complete(print_until_unplugged())
+        after = run_until_complete(print_after_restart())
+        # every job starts on a new line
+        self.assertEqual(["", "abc", "def", ""], before)
+        self.assertEqual(["ghi", "", "second", ""], after)
+
+
+class PrintSpoolerNetworkTest(unittest.TestCase):
+
+    def run_with_server(self, client_coroutine):
+        async def run():
+            erika = RecordingAsyncErika()
+            erika.running.clear()
+            spooler = PrintSpooler(JobStore(":memory:"))
+            server = await asyncio.start_server(spooler.handle_client, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            worker = asyncio.ensure_future(spooler.run_device_worker(erika))
+            try:
+                return await asyncio.wait_for(client_coroutine(port, spooler, erika), 10)
+            finally:
+                worker.cancel()
+                server.close()
+                await server.wait_closed()
+
+        return run_until_complete(run())
+
+    @staticmethod
+    async def send(port, data, read_all=True):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(data)
+        if read_all:
+            writer.write_eof()
+            answer = await reader.read()
+        else:
+            answer = await reader.readline()
+        writer.close()
+        return answer.decode("utf-8")
+
+    def test_many_clients_at_once_get_their_answer_immediately(self):
+        async def many_clients(port, spooler, erika):
+            # nothing gets printed, Erika is paused
+            return await asyncio.gather(*[self.send(port, PROTOCOL_HEADER + b"\nPRINT 5\nhello") for i in range(30)])
+
+        answers = self.run_with_server(many_clients)
+        self.assertEqual(30, len(answers))
+        self.assertTrue(all(answer.startswith("OK ") for answer in answers))
+        self.assertEqual(list(range(30)), sorted(int(answer.split()[2]) for answer in answers))
+
+    def test_unframed_message_is_read_until_the_end(self):
+        message = "x" * 10000
+
+        async def unframed(port, spooler, erika):
+            answer = await self.send(port, message.encode("utf-8"))
+            job = spooler.job(int(answer.split()[1]))
+            return answer, len(job.payload)
+
+        answer, printed_length = self.run_with_server(unframed)
+        self.assertEqual("OK 1 0\n", answer)
+        self.assertGreater(printed_length, len(message))
+
+    def test_unframed_message_starting_with_a_command_word_is_printed(self):
+        async def unframed(port, spooler, erika):
+            answer = await self.send(port, b"STATUS update: all systems go\nPRINT 5 copies")
+            job = spooler.job(int(answer.split()[1]))
+            return answer, job
+
+        answer, job = self.run_with_server(unframed)
+        self.assertEqual("OK 1 0\n", answer)
+        self.assertIn(DDR_ASCII().encode_bytes("STATUS update: all systems go"), job.payload)
+        self.assertIn(DDR_ASCII().encode_bytes("PRINT 5 copies"), job.payload)
+
+    def test_status_and_cancel(self):
+        async def status_and_cancel(port, spooler, erika):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(PROTOCOL_HEADER + b"\n")
+            answers = []
+            for command in [b"PRINT 3\nabc", b"PRINT 3\ndef", b"STATUS 2\n", b"CANCEL 2\n", b"STATUS 2\n",
+                            b"STATUS 3\n", b"PRINT x\n", b"HELLO 1\n", "PRINT 2\nä".encode("utf-8"),
+                            b"PRINT 1\n\xff", b"METRICS\n"]:
+                writer.write(command)
+                answers.append((await reader.readline()).decode("utf-8").strip())
+            writer.close()
+            return answers
+
+        answers = self.run_with_server(status_and_cancel)
+        self.assertEqual(["OK 1 0", "OK 2 1", "STATUS 2 {} 1".format(JOB_QUEUED), "CANCELLED 2",
+                          "STATUS 2 {} -".format(JOB_CANCELLED), "ERROR Unknown job 3"], answers[:6])
+        self.assertTrue(answers[6].startswith("ERROR Invalid command"))
+        self.assertTrue(answers[7].startswith("ERROR Invalid command"))
+        self.assertEqual("OK 3 1", answers[8])
+        self.assertEqual("ERROR Invalid bytes. You must send UTF-8.", answers[9])
+        # only the first job has started printing
+        self.assertRegex(answers[10], r"^METRICS network 1 \d+\.\d{3} ")
+
+    def test_too_big_messages_are_refused(self):
+        async def too_big(port, spooler, erika):
+            framed = await self.send(port, PROTOCOL_HEADER + "\nPRINT {}\n".format(MAX_MESSAGE_SIZE + 1).encode("utf-8"),
+                                     read_all=False)
+            unframed = await self.send(port, b"x" * (MAX_MESSAGE_SIZE + 1))
+            return framed, unframed
+
+        framed, unframed = self.run_with_server(too_big)
+        self.assertTrue(framed.startswith("ERROR"))
+        self.assertTrue(unframed.startswith("ERROR"))
+
+
+
+class PrintSpoolerSourcesTest(unittest.TestCase):
+
+    def test_network_twitter_and_menu_share_one_device(self):
+        """all sources go through one spooler: the menu goes first, then the source with less printing time so far"""
+        async def open_menu_on_key_press(spooler, erika):
+            while True:
+                await erika.read()
+                async with spooler.device_session(SOURCE_MENU) as device:
+                    await device.write_bytes(DDR_ASCII().encode_bytes("menu") + bytes.fromhex("77"))
+
+        async def run():
+            erika = RecordingAsyncErika()
+            erika.running.clear()
+            spooler = PrintSpooler(JobStore(":memory:"))
+            server = await spooler.start_server("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            worker = asyncio.ensure_future(spooler.run_device_worker(erika, open_menu_on_key_press))
+            try:
+                tweet = spooler.submit_lines(["tweet 1", "tweet 2"], "bird", SOURCE_TWITTER)
+                while tweet.state != JOB_PRINTING:
+                    await asyncio.sleep(0)
+                answer = await PrintSpoolerNetworkTest.send(port, PROTOCOL_HEADER + b"\nPRINT 7\nmessage")
+                message = spooler.job(int(answer.split()[1]))
+                erika.keys.put_nowait("m")
+                for i in range(10):
+                    await asyncio.sleep(0)
+
+                erika.running.set()
+                while tweet.state != JOB_DONE or message.state != JOB_DONE:
+                    await asyncio.sleep(0)
+                return erika.printed_lines(), spooler.latency_metrics()
+            finally:
+                worker.cancel()
+                server.close()
+                await server.wait_closed()
+
+        lines, metrics = run_until_complete(run())
+        # the tweet is interrupted after its first line, both for the menu and for the message
+        self.assertEqual(["", "menu"], lines[:2])
+        self.assertLess(lines.index("message"), lines.index("tweet 1"))
+        self.assertEqual(["tweet 1", "tweet 2", ""], lines[-3:])
+        self.assertEqual({SOURCE_MENU, SOURCE_NETWORK, SOURCE_TWITTER}, set(metrics))
+
+    def test_device_worker_stops_if_the_key_listener_fails(self):
+        async def broken_key_listener(spooler, erika):
+            raise ConnectionError("Erika was unplugged")
+
+        async def run():
+            spooler = PrintSpooler(JobStore(":memory:"))
+            await spooler.run_device_worker(RecordingAsyncErika(), broken_key_listener)
+
+        self.assertRaises(ConnectionError, run_until_complete, run())
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import subprocess
+import sys
+import unittest
+
+from erika import strategy_registry
+from erika.erika_image_renderer import ErikaImageRenderer
+from erika.erika_image_renderer import auto_candidates
+from erika.erika_mock import CharacterBasedErikaMock
+from erika.rendering_strategies.base import ErikaImageRenderingStrategy
+from erika.strategy_registry import AUTO_STRATEGY
+from erika.strategy_registry import UnknownStrategyException
+from erika.strategy_registry import register_strategy
+from tests.erika_mock_unittest import assert_print_output
+
+
+class StrategyRegistryTest(unittest.TestCase):
+
+    def tearDown(self):
+        strategy_registry._strategies.pop('Test', None)
+
+    def test_built_in_strategies_can_be_loaded(self):
+        for name in strategy_registry.strategy_names():
+            info = strategy_registry.strategy_info(name)
+            strategy_class = strategy_registry.load_strategy_class(name)
+            self.assertTrue(issubclass(strategy_class, ErikaImageRenderingStrategy), name)
+            self.assertEqual([info], strategy_registry.strategy_infos_for_class(strategy_class), name)
+            self.assertIsInstance(strategy_registry.create_strategy(name), strategy_class)
+
+    def test_strategies_are_only_imported_when_used(self):
+        code = ("import sys\n"
+                "import erika.cli\n"
+                "erika.cli.create_argument_parser().format_help()\n"
+                "print(sorted(name for name in sys.modules if name.startswith(('erika.rendering_strategies.', "
+                "'numpy', 'PIL'))))")
+        output = subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+        self.assertEqual("[]", output.strip())
+
+    def test_unknown_strategy(self):
+        self.assertRaises(UnknownStrategyException, strategy_registry.create_strategy, 'NoSuchStrategy')
+        self.assertRaises(ValueError, register_strategy, AUTO_STRATEGY, 'erika.rendering_strategies.line_by_line',
+                          'LineByLineErikaImageRenderingStrategy', [])
+
+    def test_registered_strategy_can_be_used_by_name(self):
+        register_strategy('Test', 'erika.rendering_strategies.interlaced', 'InterlacedErikaImageRenderingStrategy',
+                          ["just for testing"])
+        self.assertIn('Test', strategy_registry.strategy_names())
+        self.assertIn("    Test\n        * just for testing", strategy_registry.strategies_help())
+        self.assertIn('Test', auto_candidates())
+
+        with CharacterBasedErikaMock(3, 3, inside_unit_test=True, exception_if_overprinted=True) as my_erika:
+            ErikaImageRenderer(my_erika, 'Test').render_lines(["abc", "def", "ghi"])
+            assert_print_output(self, my_erika, ["abc", "def", "ghi"])
+
+    def test_capabilities_are_checked(self):
+        register_strategy('Test', 'erika.rendering_strategies.line_by_line', 'LineByLineErikaImageRenderingStrategy',
+                          ["images only"], character_based=False)
+        self.assertNotIn('Test', auto_candidates(character_based=True))
+
+        renderer = ErikaImageRenderer(CharacterBasedErikaMock(3, 3, inside_unit_test=True), 'Test')
+        self.assertRaises(Exception, renderer.render_lines, ["abc"])
+
+    def test_auto_candidates_start_with_strategies_that_go_line_by_line(self):
+        candidates = auto_candidates()
+        random_access = [strategy_registry.strategy_info(name).needs_random_access for name in candidates]
+        self.assertEqual(sorted(random_access), random_access)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import unittest
+
+from erika.erica_encoder_decoder import DDR_ASCII
+from erika.text_layout import TextLayout
+
+
+class TextLayoutTest(unittest.TestCase):
+
+    def test_sanitize(self):
+        layout = TextLayout(60)
+        self.assertEqual("Hi (at)erika, \"cafa\" - 5 μm EUR", layout.sanitize("Hi @erika, “cafá” – 5 µm €"))
+        self.assertEqual("ab\nc", layout.sanitize("a\U0001F600b\r\nc"))
+
+    def test_sanitized_text_is_printable(self):
+        layout = TextLayout(60)
+        text = "".join(chr(code_point) for code_point in range(0x3000))
+        # must not raise
+        DDR_ASCII().encode_bytes(layout.sanitize(text))
+
+    def test_transliterations_must_be_printable(self):
+        self.assertRaises(ValueError, TextLayout, 60, {"x": "<"})
+
+    def test_wraps_at_word_boundaries(self):
+        layout = TextLayout(10)
+        self.assertEqual(["The quick", "brown fox", "jumps over", "the lazy", "dog"],
+                         list(layout.lines("The quick brown fox jumps over the lazy dog")))
+
+    def test_breaks_words_longer_than_a_line(self):
+        layout = TextLayout(4)
+        self.assertEqual(["a", "bcde", "fghi", "j"], list(layout.lines("a bcdefghij")))
+
+    def test_line_breaks_and_spaces(self):
+        layout = TextLayout(5)
+        self.assertEqual(["", "  ab", "", "abcde", "   f"], list(layout.lines("\n  ab\n\nabcde   \n   f")))
+        self.assertEqual([""], list(layout.lines("")))
+
+    def test_chunks_give_the_same_lines_as_a_whole(self):
+        layout = TextLayout(7)
+        text = "Lorem ipsum dolor sit amet,\nconsectetur  adipiscing elit @erika\n\n" * 5
+        expected = list(layout.lines(text))
+        for chunk_size in range(1, 12):
+            chunks = (text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+            self.assertEqual(expected, list(layout.lines(chunks)), chunk_size)
+        self.assertTrue(all(len(line) <= 7 for line in expected))
+
+    def test_lines_are_produced_while_reading(self):
+        layout = TextLayout(5)
+
+        def chunks():
+            yield "abc def"
+            self.fail("should not be read yet")
+
+        self.assertEqual("abc", next(layout.lines(chunks())))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()